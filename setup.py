@@ -52,6 +52,12 @@ setuptools.setup(
         "console_scripts": [
             "effectivet3 = src.__predict__:main",
             "effectiveTrain = src.__train__:main",
+            "effectiveWorker = src.__worker__:main",
+            "effectiveSelect = src.__select__:main",
+            "effectiveEvaluate = src.__evaluate__:main",
+            "effectivePrepare = src.__prepare__:main",
+            "effectiveGolden = src.__golden__:main",
+            "effectiveSpool = src.__spool__:main",
         ],
     }
 )
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import traceback
+import numpy as np
+from multiprocessing import cpu_count
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from .sequtils import read_fasta
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import compile_spec, load_feature_spec
+from .execution import encode_parallel
+from .training.evaluation import cross_validate, METRICS
+
+
+CPU_COUNT = cpu_count()
+
+POS_FASTA_FILE = os.path.join("protein_sequences", "training_data", "t3se_positive.fasta")
+NEG_FASTA_FILE = os.path.join("protein_sequences", "training_data", "t3se_negative.fasta")
+
+DESCRIPTION = """Evaluates the hyperparameters and the features of a model by repeated stratified k-fold cross validation
+on the training data. Each repetition uses another seed for the folds and the light gradient boosting machine,
+the variance over the repetitions shows how stable the estimated performance is. The features are computed once
+and all folds are evaluated in parallel."""
+
+
+def parse_seeds(value: str) -> list:
+    return [int(seed) for seed in value.split(",")]
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-p', '--pos', required=False, type=str, default=POS_FASTA_FILE,
+                        help="(Optional) Path to the fasta-file containing positive protein sequences. Default: " + POS_FASTA_FILE)
+
+    parser.add_argument('-n', '--neg', required=False, type=str, default=NEG_FASTA_FILE,
+                        help="(Optional) Path to the fasta-file containing negative protein sequences. Default: " + NEG_FASTA_FILE)
+
+    parser.add_argument('-k', '--kfold', required=False, type=int, default=4,
+                        help="(Optional) Number of folds. Default: 4")
+
+    parser.add_argument('-s', '--seeds', required=False, type=parse_seeds, default=[0, 1, 2, 3, 4],
+                        help="(Optional) Comma-separated seeds, one repetition of the k-fold cross validation per seed.\n"
+                        + "Default: 0,1,2,3,4")
+
+    parser.add_argument('-P', '--params', required=False, type=str,
+                        default=os.path.join("src", "model", "optimized_hyperparameters.json"),
+                        help="(Optional) Json-file containing the hyperparameters of the light gradient boosting machine.\n"
+                        + "Default: the hyperparameters of the shipped model")
+
+    parser.add_argument('-e', '--estimators', required=False, type=int, default=40,
+                        help="(Optional) Number of estimators of the light gradient boosting machine. Default: 40 (as the shipped model)")
+
+    parser.add_argument('-f', '--featurespec', required=False, type=str, default=None,
+                        help="(Optional) Path to a feature specification. Default: the specification of the shipped model")
+
+    parser.add_argument('-c', '--cores', choices=list(range(1, CPU_COUNT+1)), required=False, type=int, default=CPU_COUNT,
+                        help="(Optional) The number of CPU-cores used to encode the sequences and to evaluate the folds in parallel. By default all available CPU cores are used.")
+
+    parser.add_argument('-o', '--ofile', required=False, type=str, default="evaluation_report.json",
+                        help="(Optional) Path of the json-file the report is saved to. Default: evaluation_report.json")
+
+    return parser.parse_args()
+
+
+def convert_seconds(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def print_report(report: dict) -> None:
+    dashes = "-"*72
+    print(f"\n{len(report['seeds'])} x {report['k_fold']}-fold cross validation\n{dashes}")
+    print(f"{'metric':<20}{'mean':>10}{'variance':>12}{'seed mean':>12}{'seed var.':>12}")
+    print(dashes)
+    for metric in METRICS:
+        folds, seeds = report["metrics"]["folds"][metric], report["metrics"]["seeds"][metric]
+        print(f"{metric:<20}{folds['mean']:>10.4f}{folds['variance']:>12.2e}{seeds['mean']:>12.4f}{seeds['variance']:>12.2e}")
+    print(dashes)
+    print(f"fit time per fold:   {report['timing']['fit_time']['mean']:.3f}s (max {report['timing']['fit_time']['max']:.3f}s)")
+    print(f"score time per fold: {report['timing']['score_time']['mean']:.3f}s")
+    print(f"{len(report['folds'])} folds on {report['num_processes']} processes took {report['wall_time']:.2f}s")
+
+
+def start(pargs):
+    start = time.time()
+    feature_spec = None
+    if pargs.featurespec is not None:
+        feature_spec = load_feature_spec(pargs.featurespec)
+    elif os.path.exists(os.path.join("src", "model", "feature_spec.json")):
+        feature_spec = load_feature_spec(os.path.join("src", "model", "feature_spec.json"))
+    positive_sequences = read_fasta.read_records(pargs.pos)
+    negative_sequences = read_fasta.read_records(pargs.neg)
+    labels = np.hstack((np.ones(len(positive_sequences)), np.zeros(len(negative_sequences))))
+    print("Computing encodings ...")
+    features = encode_parallel(SequenceRecords.concatenate((positive_sequences, negative_sequences)), compile_spec(feature_spec),
+                               num_cores=pargs.cores)
+    print("Number of samples | feature dimensions:", features.shape)
+
+    with open(pargs.params, 'r') as ifile:
+        parameters = json.load(ifile)
+    parameters = dict(parameters, n_estimators=pargs.estimators, verbose=-1,
+                      # neg count divided by pos count
+                      scale_pos_weight=(len(labels)-sum(labels)) / sum(labels))
+    report = cross_validate(features, labels, parameters, k_fold=pargs.kfold,
+                            seeds=pargs.seeds, num_cores=pargs.cores)
+    print_report(report)
+    with open(pargs.ofile, 'w') as ofile:
+        json.dump(report, ofile, indent=4)
+    print(f"\nEvaluation took {convert_seconds(time.time() - start)}\n")
+
+
+def main():
+    try:
+        args = parse_args()
+        start(args)
+        print('Successful execution of the evaluation!')
+        print('\n--> Please find the report here: ' + os.path.join(os.getcwd(), args.ofile))
+        sys.exit(0)
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import traceback
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from .predictor import load_encoder, load_model
+from .golden import (freeze, check, print_check, GOLDEN_FOLDER, BUNDLED_SETS, FUZZ_SIZE,
+                     FEATURE_BACKENDS, SCORE_BACKENDS, LABEL_BACKENDS)
+
+
+DESCRIPTION = """Golden-output harness of the encoders and the scorer. --freeze computes the 85 features with the original implementation
+(encoders/encode.py, including its quirks: DPC carries the dipeptide compositions from one sequence to the next, AaPropPatterns counts the
+POLAR motif NQST) and the probabilities of the model in src/model for the bundled fasta-files and fuzzed sequences, and saves them.
+Without --freeze every backend is compared with the frozen outputs bit by bit (or up to --max-ulp units in the last place) and timed,
+the speedup is relative to the reference implementation. Exits with status 1 if a backend does not reproduce the golden outputs.
+Feature backends: """ + ", ".join(FEATURE_BACKENDS) + """
+Probability backends: """ + ", ".join(SCORE_BACKENDS) + """
+Label backends (compared with the labels of the golden probabilities): """ + ", ".join(LABEL_BACKENDS)
+
+
+def parse_list(value: str) -> list:
+    return value.split(",")
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('--freeze', action="store_true",
+                        help="Set this flag to compute and save the golden outputs (overwrites the existing ones).")
+
+    parser.add_argument('-g', '--golden', required=False, type=str, default=GOLDEN_FOLDER,
+                        help="(Optional) Folder of the golden outputs. Default: " + GOLDEN_FOLDER)
+
+    parser.add_argument('-i', '--input', required=False, type=str, nargs='+', default=None,
+                        help="(Optional) Fasta-file(s) to freeze the outputs of with --freeze. Default: the bundled fasta-files\n"
+                        + "\n".join(BUNDLED_SETS))
+
+    parser.add_argument('--fuzz', required=False, type=int, default=FUZZ_SIZE,
+                        help=f"(Optional) Number of fuzzed sequences frozen with --freeze (lengths around the sequence region, gaps,\n"
+                        + f"non-standard residues, lowercase letters, POLAR motifs). Default: {FUZZ_SIZE}")
+
+    parser.add_argument('-s', '--seed', required=False, type=int, default=0,
+                        help="(Optional) Seed of the fuzzed sequences. Default: 0")
+
+    parser.add_argument('-b', '--backends', required=False, type=parse_list, default=None,
+                        help="(Optional) Comma-separated backends to check, e.g. compiled,quantized. Default: all")
+
+    parser.add_argument('-d', '--datasets', required=False, type=parse_list, default=None,
+                        help="(Optional) Comma-separated names of the datasets to check (fasta-file names without extension,\n"
+                        + "'fuzzed' for the fuzzed sequences). Default: all")
+
+    parser.add_argument('-u', '--max-ulp', required=False, type=int, default=0, dest="max_ulp",
+                        help="(Optional) Maximal distance of equivalent values in units in the last place. Default: 0 (bitwise)")
+
+    parser.add_argument('-r', '--repeat', required=False, type=int, default=1,
+                        help="(Optional) Number of runs of each backend, the shortest is reported. Default: 1")
+
+    parser.add_argument('-o', '--ofile', required=False, type=str, default=None,
+                        help="(Optional) Json-file the comparison and the timings of each backend are saved to.")
+
+    return parser.parse_args()
+
+
+def convert_seconds(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def start(pargs) -> bool:
+    start = time.time()
+    encoder, model = load_encoder(), load_model()
+    if pargs.freeze:
+        freeze(encoder, model, pargs.input, pargs.golden, num_fuzz=pargs.fuzz, seed=pargs.seed)
+        print(f"\nFreezing the golden outputs took {convert_seconds(time.time() - start)}")
+        return True
+    passed, rows = check(encoder, model, pargs.golden, backends=pargs.backends, datasets=pargs.datasets,
+                         max_ulp=pargs.max_ulp, repeat=pargs.repeat)
+    print_check(rows)
+    if pargs.ofile is not None:
+        with open(pargs.ofile, 'w') as ofile:
+            json.dump({"passed": passed, "max_ulp": pargs.max_ulp, "rows": rows}, ofile, indent=4)
+    print(f"\nChecking the golden outputs took {convert_seconds(time.time() - start)}")
+    return passed
+
+
+def main():
+    try:
+        args = parse_args()
+        if not start(args):
+            print("\nBackends FAILED to reproduce the golden outputs!")
+            sys.exit(1)
+        print('\nSuccessful execution of the golden-output harness!')
+        if args.freeze:
+            print('\n--> Please find the golden outputs here: ' + os.path.join(os.getcwd(), args.golden))
+        sys.exit(0)
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
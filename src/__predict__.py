@@ -2,7 +2,14 @@ import os
 import sys
 import time
 import traceback
-from .predictor import predictor
+from contextlib import redirect_stdout
+from .predictor import predictor, load_encoder, load_model
+from .pipe import pipe_main
+from .ensemble import ENSEMBLE_FILE, AGGREGATIONS
+from .execution import BACKENDS
+from .memory_budget import parse_memory_size, report_peak_memory
+from .cascade import parse_stages, CASCADE_STAGES
+from .telemetry import Telemetry
 from multiprocessing import cpu_count
 
 from argparse import ArgumentParser, RawTextHelpFormatter
@@ -16,16 +23,19 @@ CPU_COUNT = cpu_count()
 DESCRIPTION = """Classifies whether bacterial proteins are secreted by the Type III secretion system, 
 based on information contained in the protein sequence. Sequence- and amino acid property-based features"""
 
-CPU_CORES_HELP = """(Optional) The number of CPU-cores that you want to use for prediction. By default all available CPU cores are used.
+CPU_CORES_HELP = """(Optional) The maximal number of CPU-cores that you want to use for prediction. By default all available CPU cores are used.
 If your selected number of cores is above the available number of cores you will be provided with the
-number of accessible CPU-cores on your operating system, to provide a valid choice the this parameter."""
+number of accessible CPU-cores on your operating system, to provide a valid choice the this parameter.
+Serial, thread or process execution and the number of workers are chosen by a cost model calibrated once per machine."""
 
 
 TRUE_LABELS_HELP = """"(Optional) Path to the file containing the comma-separated true labels encoded as integers (0 for False (not-secreted) and 1 for True (secreted)).
 The labels must be in the same order as the protein sequences contained in the input fasta-file. If this command line parameter is set, i.e. not None
 then an additional file ("{output_file_name_as_set_in_the_command_line_argument}_metrics.json") containing all kinds of evaluation metrics for the prediction will be saved.
 So the json-file containing the evaluation metrics will be saved inside the same path as the outputfile name containing only the predictions but with "_metrics.json"
-concatenated to the filename.
+concatenated to the filename. The ROC- and precision-recall curves are saved next to it in compressed numpy format
+("{output_file_name}_curves.npz", load with numpy.load), the metrics file also contains the thresholds maximizing
+Youden's J statistic, the f1-score, the balanced accuracy and the Matthews correlation coefficient.
 
 E.g. if you have 10 protein sequences the first then your labels file should contain the following:
 
@@ -37,35 +47,121 @@ There must be no spaces in between the commas and trailing commas
 
 """
 
-# Original model was trained on this sequence region
-# so unless you have not trained a new model on a new sequence region
-# do not change this variable
-SEQ_RANGE = (1, 26)
-
-
 def parse_args():
     parser = ArgumentParser(description=DESCRIPTION,
                             formatter_class=RawTextHelpFormatter)
 
     # Fasta file containing sequences to predict
-    parser.add_argument('-f', '--file', required=True, type=str,
-                        help="(Required) Path to the input fasta-file, e.g. 'your_folder/your_file.fasta'")
+    parser.add_argument('-f', '--file', required=False, type=str, default=None,
+                        help="(Required) Path to the input fasta-file, e.g. 'your_folder/your_file.fasta'\n"
+                        + "(or given as positional argument), '-' reads the sequences from stdin (see PIPE MODE)")
+
+    parser.add_argument('input', nargs='?', type=str, default=None,
+                        help="Path to the input fasta-file as alternative to --file, '-' reads from stdin, e.g.\n"
+                        + "zcat *.faa.gz | effectivet3 - | sort -t$'\\t' -k2,2gr\n"
+                        + "PIPE MODE: if the input or the output is '-' or the output ends with '.gz', the sequences are read and\n"
+                        + "scored in micro-batches and one tab-separated line per sequence (identifier, probability, prediction) is\n"
+                        + "written as soon as its batch is scored (to stdout by default). gzip compressed input is detected,\n"
+                        + "messages are printed to stderr. Only available with the model in src/model (optionally --quantized).")
 
     # Output file path
-    parser.add_argument('-o', '--ofile', required=False, type=str, default='results.txt',
+    parser.add_argument('-o', '--ofile', required=False, type=str, default=None,
                         help='(Required) Provide the file path for the output file. --ofile path/{file_name}.json to '
-                        + 'save it in json-format or path/{file_name}.txt to save it in txt-format')
+                        + 'save it in json-format or path/{file_name}.txt to save it in txt-format\n'
+                        + "Default: results.txt, in pipe mode '-' (stdout)")
+
+    parser.add_argument('-z', '--gzip', action="store_true",
+                        help="Set this flag to gzip compress the output of the pipe mode (output files ending with '.gz' are always compressed)")
 
     # Number of cores to use for prediction
     parser.add_argument('-c', '--cores', choices=list(range(1, CPU_COUNT+1)), required=False, type=int, default=CPU_COUNT,
                         help=CPU_CORES_HELP)
 
+    parser.add_argument('-b', '--backend', required=False, type=str, choices=BACKENDS, default=None,
+                        help="(Optional) Execution with --cores > 1: 'thread' encodes and scores chunks of the sequences on a thread pool\n"
+                        + "sharing the model (no process start-up, suited to small and medium inputs), 'process' counts on a process pool\n"
+                        + "and scores in the main process, 'serial' uses a single core. Default: chosen by the cost model of this machine")
+
+    parser.add_argument('-M', '--max-memory', required=False, type=parse_memory_size, default=None, dest="max_memory",
+                        help="(Optional) Memory budget, e.g. 4G or 512M. The sequences are then streamed from the fasta-file in chunks, the\n"
+                        + "memory per sequence is measured on the first sequences and the chunk size, the number of workers and the output\n"
+                        + "buffer are chosen to stay below the budget. The peak memory is reported at the end.\n"
+                        + "Can not be combined with --explain, --manifest, --dump-features and --database.")
+
+    # Ensemble of models
+    parser.add_argument('-e', '--ensemble', required=False, type=str, nargs='?', default=None, const=ENSEMBLE_FILE,
+                        help="(Optional) Score the sequences with an ensemble of models defined in a json-file (see src/ensemble.py).\n"
+                        + "Without a file the ensemble '" + ENSEMBLE_FILE + "' of the six models of the feature selection and both models\n"
+                        + "of 'feature_selected_model_container' is used. The sequences are encoded once for all models. The probabilities\n"
+                        + "of each model are saved to '{output_file_name}_ensemble.tsv', the output file contains the aggregated probability.")
+
+    parser.add_argument('-a', '--aggregation', required=False, type=str, choices=AGGREGATIONS, default=None,
+                        help="(Optional) How to aggregate the probabilities of the ensemble: 'mean' probability or 'vote', i.e. the fraction\n"
+                        + "of models predicting secretion. Default: as set in the ensemble file")
+
+    # Feature contributions
+    parser.add_argument('-x', '--explain', action="store_true",
+                        help="Set this flag to save the contribution of each feature to the prediction of each protein sequence\n"
+                        + "(SHAP-values in log-odds space as computed by LightGBM) to '{output_file_name}_contributions.npy'.\n"
+                        + "The file contains a (features + 1) x sequences float32 matrix (last row: expected value of the model),\n"
+                        + "'{output_file_name}_contributions.json' the feature names and the protein identifiers.")
+
+    # Quantized scoring
+    parser.add_argument('-Q', '--quantized', action="store_true",
+                        help="Set this flag to score the sequences on quantized features: each feature is replaced by its bin between the\n"
+                        + "split thresholds of the model (uint8) and the trees are evaluated with integer comparisons. The features of\n"
+                        + "the composition encoders are binned directly from the uint8 counts. The bins need 1/8 of the memory of the\n"
+                        + "float features, the peak memory drops less (about 15%%, it is dominated by the counting). The scores\n"
+                        + "are identical to those of the float features, the probabilities may differ in the last bits. A memory\n"
+                        + "mode: the run time is dominated by the encoding and not shorter. Not available for ensembles.")
+
+    # Cascade scoring
+    parser.add_argument('--cascade', required=False, type=parse_stages, nargs='?', default=None,
+                        const=CASCADE_STAGES, metavar="STAGES",
+                        help="(Optional) Score on quantized features (see --quantized) with early decisions: after the given numbers of trees\n"
+                        + "(comma-separated, default " + ",".join(str(stage) for stage in CASCADE_STAGES) + ") the sequences whose label can not change anymore, as bounded\n"
+                        + "by the smallest and largest leaf values of the remaining trees, are not scored further. The labels are those of\n"
+                        + "the full model, the probabilities of undecided sequences as well, sequences decided early get the probability of\n"
+                        + "the deciding bound (below the threshold for negatives, above it for positives). Evaluates fewer trees on\n"
+                        + "input with mostly clear negatives, e.g. proteomes, the run time is dominated by the encoding and not shorter.\n"
+                        + "Not available for ensembles, --explain, --manifest and --dump-features.")
+
+    # Incremental scoring
+    parser.add_argument('-m', '--manifest', required=False, type=str, default=None,
+                        help="(Optional) Path to a run manifest (tab-separated: identifier, hash of the sequence region, hash of the features,\n"
+                        + "fingerprint of the model, probability). Sequences recorded in the manifest with the same sequence region, features\n"
+                        + "and model are not scored again, the manifest is then updated with the records of this run (created if missing).")
+
+    # Results database
+    parser.add_argument('-d', '--database', required=False, type=str, default=None,
+                        help="(Optional) Path to a SQLite database the predictions are additionally inserted into (created if missing).\n"
+                        + "Table 'predictions': identifier, sequence_number, probability, label, model_version, source_file and organism\n"
+                        + "(from the json-files in protein_sequences/bacterial_species_info if the identifier is found there),\n"
+                        + "indexed on identifier, probability and organism. Runs on several fasta-files can be collected in the same database.")
+
+    # Columnar export
+    parser.add_argument('-D', '--dump-features', required=False, type=str, default=None, dest="dump_features",
+                        help="(Optional) Directory the identifiers, features and probabilities are saved to in chunks of 100000 sequences\n"
+                        + "as soon as a chunk is scored: 'identifiers_{chunk}.npy', 'features_{chunk}.npy' (sequences x features, float64)\n"
+                        + "and 'probabilities_{chunk}.npy', all memory-mappable (numpy.load(file, mmap_mode='r')). 'index.json' lists the\n"
+                        + "chunks and the feature names, src/feature_dump.py:load_feature_dump loads a whole dump.")
+
+    # Telemetry
+    parser.add_argument('-P', '--progress', action="store_true",
+                        help="Set this flag to print a progress line to stderr every few seconds: scored sequences, sequences per second,\n"
+                        + "ETA, the chunks queued in front of counting and scoring and the utilization of the counting, completing\n"
+                        + "('finalize') and scoring workers.")
+
+    parser.add_argument('--metrics', required=False, type=str, default=None,
+                        help="(Optional) File the progress metrics are written to periodically (replaced atomically), in the Prometheus text\n"
+                        + "format if it ends with '.prom' (e.g. for the textfile collector of the node exporter), as json otherwise.")
+
     # True labels
     parser.add_argument('-l', '--truelabels', required=False, type=str, default=None,
                         help=TRUE_LABELS_HELP)
 
     # # Sequence range
-    # parser.add_argument('-r', '--range', required=False, type=str, default=SEQ_RANGE,
+    # parser.add_argument('-r', '--range', required=False, type=str, default=None,
     #                     help="(Optional) The range of amino acid sequences to use for prediction. "
     #                          "Default is the first 25 amino acids of the protein sequence. "
     #                          "Provide a tuple of integers, e.g. (1, 26) to use the first 25 amino acids (if first aa, i.e. methionine is excluded), "
@@ -76,7 +172,14 @@ def parse_args():
     parser.add_argument('-v', '--version', action='version', version='bastion3clone ' + __version__,
                         help="(Optional) Show program's version number and exit")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if (args.file is None) == (args.input is None):
+        parser.error("Provide the input fasta-file either with --file or as positional argument")
+    args.file = args.file if args.file is not None else args.input
+    args.pipe = args.file == "-" or args.ofile == "-" or (args.ofile is not None and args.ofile.endswith(".gz"))
+    if args.ofile is None:
+        args.ofile = "-" if args.pipe else "results.txt"
+    return args
 
 
 def convert_seconds(seconds):
@@ -86,17 +189,71 @@ def convert_seconds(seconds):
     return f"{days}d {hours}h {minutes}m {seconds}s"
 
 
+def make_telemetry(pargs):
+    if not pargs.progress and pargs.metrics is None:
+        return None
+    return Telemetry("effectivet3", show_progress=pargs.progress, metrics_file=pargs.metrics)
+
+
+def start_pipe(pargs):
+    start = time.time()
+    unsupported = [flag for flag, enabled in (("--ensemble", pargs.ensemble is not None), ("--explain", pargs.explain),
+                                              ("--manifest", pargs.manifest is not None), ("--database", pargs.database is not None),
+                                              ("--dump-features", pargs.dump_features is not None),
+                                              ("--truelabels", pargs.truelabels is not None)) if enabled]
+    if len(unsupported) != 0:
+        raise ValueError(", ".join(unsupported) + " can not be used in pipe mode")
+    telemetry = make_telemetry(pargs)
+    if telemetry is not None:
+        telemetry.begin("pipe")
+        telemetry.start()
+    try:
+        num_sequences = pipe_main(pargs.file, pargs.ofile, load_encoder(), load_model(),
+                                  quantized=pargs.quantized, compress=pargs.gzip, telemetry=telemetry,
+                                  cascade=pargs.cascade)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+    if num_sequences is None:
+        print("The output was closed, scoring stopped")
+    else:
+        print(f"Scored {num_sequences} sequences in {convert_seconds(time.time() - start)}")
+
+
 def start(pargs):
     start = time.time()
-    predictor(fasta_file=pargs.file, num_cores=pargs.cores, ofile_path=pargs.ofile,
-              seq_range=SEQ_RANGE, true_labels_file_name=pargs.truelabels)
-    print(f"\nPrediction took {convert_seconds(time.time() - start)}\n")
+    telemetry = make_telemetry(pargs)
+    if telemetry is not None:
+        telemetry.start()
+    try:
+        predictor(fasta_file=pargs.file, num_cores=pargs.cores, ofile_path=pargs.ofile,
+                  seq_range=None, true_labels_file_name=pargs.truelabels,
+                  ensemble_file=pargs.ensemble, aggregation=pargs.aggregation,
+                  explain_predictions=pargs.explain, quantized=pargs.quantized,
+                  manifest_file=pargs.manifest, database_file=pargs.database,
+                  dump_directory=pargs.dump_features, backend=pargs.backend, max_memory=pargs.max_memory,
+                  telemetry=telemetry, cascade=pargs.cascade)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+    print(f"\nPrediction took {convert_seconds(time.time() - start)}")
+    print(report_peak_memory() + "\n")
 
 
 def main():
+    args = parse_args()
+    if args.pipe:
+        # stdout is reserved for the results
+        with redirect_stdout(sys.stderr):
+            try:
+                start_pipe(args)
+                sys.exit(0)
+            except Exception as e:
+                print("Exception occurred: ", e)
+                traceback.print_exc()
+                sys.exit(1)
     try:
         # Start program
-        args = parse_args()
         start(args)
         file_path = os.path.join(os.getcwd(), args.ofile)
         print('Successful execution of the program!')
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import traceback
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from .sequtils.read_fasta import read_records
+from .sequtils.redundancy import reduce_redundancy, MIN_IDENTITY, NUM_PERMUTATIONS
+
+
+DESCRIPTION = """Reduces the redundancy of protein sequences for preparing training sets, as done with cd-hit / psi-cd-hit
+for 'protein_sequences/training_data'. The sequences are clustered greedily (longest first) by the chance corrected fraction
+of shared k-mers at each identity threshold in decreasing order, each threshold clusters the representatives of the previous
+one. Candidate pairs are found with an LSH index over MinHash sketches (high thresholds) or an inverted k-mer index (low thresholds).
+k-mer similarity approximates the sequence identity of an alignment, thresholds below """ + str(MIN_IDENTITY) + """ are not supported."""
+
+IDENTITIES = (0.9, 0.6)
+
+
+def parse_identities(value: str) -> tuple:
+    return tuple(float(identity) for identity in value.split(","))
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-i', '--input', required=True, type=str, nargs='+',
+                        help="Fasta-file(s) of protein sequences, each file is reduced separately")
+
+    parser.add_argument('-o', '--ofolder', required=False, type=str, default="prepared_sequences",
+                        help="(Optional) Folder to save the representative sequences and the clusters to. Default: prepared_sequences\n"
+                        + "For each input file and threshold '{name}_{identity}.fasta' (representatives) and '{name}_{identity}_clusters.tsv'\n"
+                        + "(identifier and representative of every input sequence) are written, e.g. 'positives_90.fasta'.")
+
+    parser.add_argument('-t', '--identities', required=False, type=parse_identities, default=IDENTITIES,
+                        help="(Optional) Sequence identity thresholds given as comma separated list. Default: 0.9,0.6\n"
+                        + f"Thresholds must be between {MIN_IDENTITY} and 1.")
+
+    parser.add_argument('-k', '--kmer', required=False, type=int, default=None,
+                        help="(Optional) k-mer size. By default 5 for thresholds >= 0.7 and 4 below (as the word sizes of cd-hit).")
+
+    parser.add_argument('--permutations', required=False, type=int, default=NUM_PERMUTATIONS,
+                        help=f"(Optional) Number of hash functions of the MinHash sketches. Default: {NUM_PERMUTATIONS}")
+
+    return parser.parse_args()
+
+
+def convert_seconds(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def raw_records(file: str) -> list:
+    """
+        Text of each record of a fasta file, in the order of ´read_records´.
+    """
+    with open(file, 'r') as ifile:
+        return ['>' + record if record.endswith('\n') else '>' + record + '\n'
+                for record in ifile.read().split('>')[1:]]
+
+
+def prepare(file: str, ofolder: str, identities: tuple, kmer: int, num_permutations: int) -> None:
+    records = read_records(file)
+    texts = raw_records(file)
+    name = os.path.splitext(os.path.basename(file))[0]
+    levels = reduce_redundancy(records, identities, kmer, num_permutations)
+    print(f"\n{file}: {len(records)} sequences")
+    for identity, (representatives, assignment) in zip(sorted(identities, reverse=True), levels):
+        suffix = f"{name}_{round(identity * 100)}"
+        with open(os.path.join(ofolder, suffix + ".fasta"), 'w') as ofile:
+            ofile.writelines(texts[idx] for idx in representatives)
+        with open(os.path.join(ofolder, suffix + "_clusters.tsv"), 'w') as ofile:
+            ofile.write("identifier\trepresentative\n")
+            ofile.writelines(f"{records.name(idx)}\t{records.name(rep)}\n" for idx, rep in enumerate(assignment))
+        print(f"  {identity:.0%} identity: {len(representatives)} representatives --> {suffix}.fasta")
+
+
+def start(pargs):
+    start = time.time()
+    os.makedirs(pargs.ofolder, exist_ok=True)
+    for file in pargs.input:
+        prepare(file, pargs.ofolder, pargs.identities, pargs.kmer, pargs.permutations)
+    print(f"\nRedundancy reduction took {convert_seconds(time.time() - start)}\n")
+
+
+def main():
+    try:
+        args = parse_args()
+        start(args)
+        print('Successful execution of the redundancy reduction!')
+        print('\n--> Please find the representative sequences here: ' + os.path.join(os.getcwd(), args.ofolder))
+        sys.exit(0)
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
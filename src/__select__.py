@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import traceback
+from multiprocessing import cpu_count
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from .training.feature_selection import select_features
+from .encoders.feature_spec import feature_names
+
+
+CPU_COUNT = cpu_count()
+
+# Folder containing the train/test splits used to obtain the 85 selected features
+SPLITS_FOLDER = os.path.join("data_feature_selection_process", "protein_sequences_train_test_splits_1to6")
+# Folder where to save the feature specification and the intermediate results
+FEATURE_SELECTION_FOLDER = os.path.join("src", "training", "feature_selection")
+
+DESCRIPTION = """Selects the most important features of the full feature space (513 features) using the mean absolute
+SHAP-values of light gradient boosting machines fit on several train/test splits and saves the selected features
+as feature specification ('feature_spec.json'), which can be passed to 'effectiveTrain --featurespec'."""
+
+# Original model was trained on this sequence region
+SEQ_RANGE = (1, 26)
+
+
+def parse_range(value: str) -> tuple:
+    start, end = value.split(",")
+    return int(start), int(end)
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-s', '--splits', required=False, type=str, default=SPLITS_FOLDER,
+                        help="(Optional) Folder containing the train/test splits named {pos|neg}_{train|test}_{number}.fasta\n"
+                        + "Default: " + SPLITS_FOLDER)
+
+    parser.add_argument('-o', '--ofolder', required=False, type=str, default=FEATURE_SELECTION_FOLDER,
+                        help="(Optional) Folder to save the feature specification and intermediate results to. Default: "
+                        + FEATURE_SELECTION_FOLDER)
+
+    parser.add_argument('-r', '--range', required=False, type=parse_range, default=SEQ_RANGE,
+                        help="(Optional) Sequence range to encode given as 'start,end', e.g. '1,26' (default) "
+                        + "uses the first 25 amino acids after the methionine.")
+
+    parser.add_argument('-k', '--numfeatures', required=False, type=int, default=85,
+                        help="(Optional) Number of features to select. Default: 85\n"
+                        + "If 0, the number of features with the highest mean balanced accuracy over the splits is chosen.")
+
+    parser.add_argument('-p', '--params', required=False, type=str,
+                        default=os.path.join("src", "model", "optimized_hyperparameters.json"),
+                        help="(Optional) Json-file containing the hyperparameters of the light gradient boosting machine.\n"
+                        + "Default: the hyperparameters of the shipped model")
+
+    parser.add_argument('-e', '--estimators', required=False, type=int, default=30,
+                        help="(Optional) Number of estimators of the light gradient boosting machine. Default: 30")
+
+    parser.add_argument('-c', '--cores', choices=list(range(1, CPU_COUNT+1)), required=False, type=int, default=CPU_COUNT,
+                        help="(Optional) The number of CPU-cores used to process the splits in parallel. By default all available CPU cores are used.")
+
+    parser.add_argument('--curve', action="store_true",
+                        help="Set this flag to save the balanced accuracy of models fit on the 1, 2, ..., k most important features "
+                        + "for each split ('bacc_scores_d{number}.npy')")
+
+    return parser.parse_args()
+
+
+def convert_seconds(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def start(pargs):
+    start = time.time()
+    with open(pargs.params, 'r') as ifile:
+        parameters = json.load(ifile)
+    feature_spec = select_features(pargs.splits, pargs.ofolder, parameters, seq_range=pargs.range,
+                                   n_estimators=pargs.estimators, num_features=pargs.numfeatures,
+                                   num_cores=pargs.cores, compute_curve=pargs.curve)
+    print(f"\n{len(feature_names(feature_spec))} features selected")
+    print(f"\nFeature selection took {convert_seconds(time.time() - start)}\n")
+
+
+def main():
+    try:
+        args = parse_args()
+        start(args)
+        print('Successful execution of the feature selection!')
+        print('\n--> Please find the feature specification here: ' + os.path.join(os.getcwd(), args.ofolder, "feature_spec.json"))
+        sys.exit(0)
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
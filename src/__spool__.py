@@ -0,0 +1,111 @@
+import os
+import time
+import signal
+import traceback
+from argparse import ArgumentParser, RawTextHelpFormatter
+from multiprocessing import cpu_count
+
+from .spool import SpoolDaemon, SPOOL_EXTENSIONS, SPOOL_POLL_INTERVAL, SPOOL_SETTLE_SECONDS
+from .execution import BACKENDS
+from .cascade import parse_stages, CASCADE_STAGES
+from .telemetry import Telemetry
+
+
+CPU_COUNT = cpu_count()
+
+DESCRIPTION = """Daemon scoring the fasta-files dropped into an inbox directory (""" + ", ".join(SPOOL_EXTENSIONS) + """, optionally .gz)
+with the model of Effective T3 loaded once and the workers kept warm between the files. Each file is claimed atomically
+(moved to '{inbox}/.claimed'), several daemons can watch the same inbox. The results ('{name}.results.tsv': identifier,
+probability, prediction) and a done marker ('{name}.done', json) are written to the outbox, the file is then moved to
+'{inbox}/.done'. Files that can not be scored are moved to '{inbox}/.failed' with an error marker ('{name}.error').
+Restarting the daemon continues where it stopped: claims of stopped daemons of this host are returned to the inbox and
+files with a done marker of the same content and model are not scored again. SIGTERM and Ctrl+C stop after the current file."""
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-i', '--inbox', required=True, type=str,
+                        help="(Required) Directory watched for fasta-files, the producer should write files under a hidden\n"
+                        + "or other name and rename them when complete (files are also claimed only after --settle seconds).")
+
+    parser.add_argument('-o', '--outbox', required=False, type=str, default=None,
+                        help="(Optional) Directory the results and the done markers are written to. Default: '{inbox}/results'")
+
+    parser.add_argument('-c', '--cores', required=False, type=int, default=CPU_COUNT,
+                        help="(Optional) Maximal number of CPU cores. The execution of each file is chosen by the cost model of\n"
+                        + "effectivet3, the pools of workers are started once and kept warm. Default: all available cores")
+
+    parser.add_argument('--backend', required=False, type=str, default=None, choices=BACKENDS,
+                        help="(Optional) Fixes serial, thread or process execution. Default: chosen per file by the cost model")
+
+    parser.add_argument('-Q', '--quantized', action="store_true",
+                        help="Set this flag to score the sequences on quantized features (see effectivet3 --help).")
+
+    parser.add_argument('--cascade', required=False, type=parse_stages, nargs='?', default=None,
+                        const=CASCADE_STAGES, metavar="STAGES",
+                        help="(Optional) Score with early decisions (see effectivet3 --help).")
+
+    parser.add_argument('--poll', required=False, type=float, default=SPOOL_POLL_INTERVAL,
+                        help=f"(Optional) Seconds between two scans of the empty inbox. Default: {SPOOL_POLL_INTERVAL}")
+
+    parser.add_argument('--settle', required=False, type=float, default=SPOOL_SETTLE_SECONDS,
+                        help=f"(Optional) Files modified less than this many seconds ago are not claimed. Default: {SPOOL_SETTLE_SECONDS}")
+
+    parser.add_argument('--delete', action="store_true",
+                        help="Set this flag to delete the scored files instead of moving them to '{inbox}/.done'.")
+
+    parser.add_argument('--once', action="store_true",
+                        help="Set this flag to score the files of the inbox and exit once it is empty (e.g. from cron).")
+
+    parser.add_argument('-P', '--progress', action="store_true",
+                        help="Set this flag to print a progress line to stderr every few seconds (scored sequences and files waiting in the inbox).")
+
+    parser.add_argument('--metrics', required=False, type=str, default=None,
+                        help="(Optional) File the progress metrics are written to periodically, in the Prometheus text format\n"
+                        + "if it ends with '.prom', as json otherwise.")
+
+    return parser.parse_args()
+
+
+def convert_seconds(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def start(pargs):
+    start = time.time()
+    if not os.path.isdir(pargs.inbox):
+        raise ValueError(f"The inbox '{pargs.inbox}' is not a directory")
+    telemetry = None
+    if pargs.progress or pargs.metrics is not None:
+        telemetry = Telemetry("effectiveSpool", show_progress=pargs.progress, metrics_file=pargs.metrics).start()
+    try:
+        daemon = SpoolDaemon(pargs.inbox, pargs.outbox, num_cores=min(pargs.cores, CPU_COUNT), backend=pargs.backend,
+                             quantized=pargs.quantized, cascade=pargs.cascade, delete_inputs=pargs.delete,
+                             poll_interval=pargs.poll, settle_seconds=pargs.settle, telemetry=telemetry)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: daemon.stop())
+        print(f"Watching '{pargs.inbox}', results are written to '{daemon.outbox}'" + (" (until the inbox is empty)" if pargs.once else ""))
+        num_files = daemon.run(once=pargs.once)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+    print(f"\nScored {num_files} file(s) in {convert_seconds(time.time() - start)}")
+
+
+def main():
+    try:
+        args = parse_args()
+        start(args)
+        print('\nSuccessful execution of the spool daemon!')
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+
+
+if __name__ == '__main__':
+    main()
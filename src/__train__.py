@@ -4,10 +4,15 @@ import json
 import time
 import pickle
 import traceback
-from typing import Any
+from typing import Any, List
 
 import numpy as np
-from .trainer import Trainer
+from multiprocessing import cpu_count
+from .trainer import Trainer, WARM_START_MODES
+from .encoders.feature_spec import load_feature_spec, save_feature_spec, DEFAULT_FEATURE_SPEC
+from .training.work_queue import DistributedExecutor, CLAIM_TIMEOUT
+from .training.evaluation import METRICS
+from .telemetry import Telemetry
 from argparse import ArgumentParser, RawTextHelpFormatter
 
 """
@@ -23,12 +28,16 @@ SAVED_MODELS_FOLDER = os.path.join("src", "training", "model_and_parameters")
 DESCRIPTION = """Trains the model and saves the optimized hyperparameters and the model 
 to the folder 'src/training/models_and_parameters/'."""
 
-# Original model was trained on this sequence region
-# if you train and new model and change the sequence region
-# make sure to adjust this variable at the top of the file __predict__.py
-# such that it has the same value
+# Original model was trained on this sequence region, the sequence region is saved
+# with the model in its feature specification ('feature_spec.json'), copy it
+# into src/model together with model.bin such that the prediction uses the same region
 SEQ_RANGE = (1, 26)
 
+# Model and hyperparameters used for prediction, the starting point of --warmstart
+MODEL_FOLDER = os.path.join("src", "model")
+
+CPU_COUNT = cpu_count()
+
 
 def parse_args():
     parser = ArgumentParser(description=DESCRIPTION,
@@ -44,6 +53,72 @@ def parse_args():
                         help="Set this flag to save feature importances and their "
                         + "labels to a file with the same filepath as the metrics file, but named 'feature_importances.json'")
 
+    parser.add_argument('-f', '--featurespec', required=False, type=str, default=None,
+                        help="(Optional) Path to a feature specification (.json or .yaml), e.g. as written by 'effectiveSelect'.\n"
+                        + "If set, the model is trained on the features and the sequence range of the specification instead of\n"
+                        + "the 85 features of Effective T3. The specification is saved next to the model ('feature_spec.json').")
+
+    parser.add_argument('-q', '--queue', required=False, type=str, default=None,
+                        help="(Optional) Directory on a shared file system used as work queue. If set, the cross validation "
+                        + "of the candidate parameters\nof both optimization steps is distributed to the workers polling this "
+                        + "directory.\nStart workers on other hosts with 'effectiveWorker --queue {directory}'.")
+
+    parser.add_argument('-w', '--workers', required=False, type=int, default=0,
+                        help="(Optional) Number of worker processes to start on this machine when --queue is set. Default: 0")
+
+    parser.add_argument('--claimtimeout', required=False, type=float, default=CLAIM_TIMEOUT,
+                        help="(Optional) Stop the training with an error when no worker claimed any of the queued candidates for\n"
+                        + f"this many seconds (e.g. no worker was started), 0 waits forever. Default: {CLAIM_TIMEOUT:g}")
+
+    parser.add_argument('-W', '--warmstart', required=False, choices=WARM_START_MODES, default=None,
+                        help="(Optional) Retrain the existing model (see --model) instead of optimizing the hyperparameters again:\n"
+                        + "'continue' adds --rounds trees to the trees of the model, 'refit' fits a new model with the saved\n"
+                        + "hyperparameters (see --params). The existing and the retrained model are compared on a held-out split\n"
+                        + "(see --holdout), the report is saved next to the model ('warm_start_report.json').\n"
+                        + "The features of the feature specification saved with the model are used unless --featurespec is set.")
+
+    parser.add_argument('-m', '--model', required=False, type=str, default=os.path.join(MODEL_FOLDER, "model.bin"),
+                        help="(Optional) Model to start from with --warmstart. Default: " + os.path.join(MODEL_FOLDER, "model.bin"))
+
+    parser.add_argument('--params', required=False, type=str, default=os.path.join(MODEL_FOLDER, "optimized_hyperparameters.json"),
+                        help="(Optional) Json-file with the hyperparameters of the model used with --warmstart.\n"
+                        + "Default: " + os.path.join(MODEL_FOLDER, "optimized_hyperparameters.json"))
+
+    parser.add_argument('--rounds', required=False, type=int, default=10,
+                        help="(Optional) Number of trees added by '--warmstart continue'. Default: 10")
+
+    parser.add_argument('--holdout', required=False, type=float, default=0.2,
+                        help="(Optional) Fraction of the sequences held out to compare the models with --warmstart. Default: 0.2")
+
+    parser.add_argument('--pool', required=False, type=str, default=None,
+                        help="(Optional) Fasta-file of a large pool of negative protein sequences (e.g. whole proteomes) for\n"
+                        + "hard-negative mining: a model trained with the hyperparameters of --params on the positives and the\n"
+                        + "negatives of --neg scores the streamed pool, the --hard highest scoring and --random randomly sampled\n"
+                        + "pool sequences replace the negatives and the model is retrained, --iterations times.\n"
+                        + "The selected negatives are saved next to the model ('mined_negatives.fasta').")
+
+    parser.add_argument('--iterations', required=False, type=int, default=3,
+                        help="(Optional) Number of hard-negative mining rounds with --pool. Default: 3")
+
+    parser.add_argument('--hard', required=False, type=int, default=2000,
+                        help="(Optional) Number of hard negatives kept from the pool. Default: 2000")
+
+    parser.add_argument('--random', required=False, type=int, default=2000,
+                        help="(Optional) Number of randomly sampled negatives kept from the pool. Default: 2000")
+
+    parser.add_argument('-c', '--cores', choices=list(range(1, CPU_COUNT+1)), required=False, type=int, default=CPU_COUNT,
+                        help="(Optional) The number of CPU-cores used to encode the protein sequences in chunks on a pool of processes\n"
+                        + "(the features equal those of serial encoding). By default all available CPU cores are used.")
+
+    parser.add_argument('-P', '--progress', action="store_true",
+                        help="Set this flag to print a progress line to stderr every few seconds: the current phase (encoding,\n"
+                        + "one-by-one optimization, genetic algorithm, mining round), processed items (sequences, parameters or\n"
+                        + "candidate evaluations) per second, ETA, candidates queued for the workers and their utilization.")
+
+    parser.add_argument('--metrics', required=False, type=str, default=None,
+                        help="(Optional) File the progress metrics are written to periodically (replaced atomically), in the Prometheus text\n"
+                        + "format if it ends with '.prom' (e.g. for the textfile collector of the node exporter), as json otherwise.")
+
     return parser.parse_args()
 
 
@@ -57,12 +132,14 @@ def convert_seconds(seconds):
     return f"{days}d {hours}h {minutes}m {seconds}s"
 
 
-def save_feature_importance(feature_importance: np.ndarray, feat_imp_path: str):
+def save_feature_importance(feature_importance: np.ndarray, feat_imp_path: str, feature_names: List[str] = None):
     """
         Save feature importances to a json file
     """
-    with open(os.path.join("src", "training", "feature_names.json"), 'r') as ifile:
-        feature_labels = np.array(json.load(ifile))
+    if feature_names is None:
+        with open(os.path.join("src", "training", "feature_names.json"), 'r') as ifile:
+            feature_names = json.load(ifile)
+    feature_labels = np.array(feature_names)
     # Sort from highest to lowest
     sorted_indices = np.argsort(feature_importance)[::-1]
     label_importance_dict = {str(lab): float(imp) for lab, imp in zip(
@@ -73,13 +150,15 @@ def save_feature_importance(feature_importance: np.ndarray, feat_imp_path: str):
 
 
 def save_model(model_path: str, param_path: str, feat_imp_path: str, model: Any,
-               parameters: dict, feature_importance: np.ndarray, save_feat_imp: bool = False) -> None:
+               parameters: dict, feature_importance: np.ndarray, save_feat_imp: bool = False,
+               feature_names: List[str] = None) -> None:
     """
         Save the model, the parameters and the feature importances (if specified)
     """
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
     if save_feat_imp:
         # Save feature importances
-        save_feature_importance(feature_importance, feat_imp_path)
+        save_feature_importance(feature_importance, feat_imp_path, feature_names)
     # Save model
     with open(model_path, 'wb') as ofile:
         pickle.dump(model, ofile)
@@ -91,14 +170,114 @@ def save_model(model_path: str, param_path: str, feat_imp_path: str, model: Any,
         json.dump(parameters, ofile, indent=4)
 
 
+def print_warm_start_report(report: dict) -> None:
+    dashes = "-"*56
+    print(f"\nHeld-out split: {report['num_holdout']} sequences (trained on {report['num_train']})\n{dashes}")
+    print(f"{'metric':<20}{'existing':>12}{'retrained':>12}{'delta':>12}")
+    print(dashes)
+    for metric in METRICS:
+        print(f"{metric:<20}{report['existing'][metric]:>12.4f}{report['retrained'][metric]:>12.4f}"
+              + f"{report['delta'][metric]:>+12.4f}")
+    print(dashes)
+
+
+def warm_start(pargs: dict, telemetry: Telemetry = None) -> None:
+    """
+        Retrain the existing model on the training data (see ´Trainer.retrain´)
+    """
+    feature_spec = dict(DEFAULT_FEATURE_SPEC, seq_range=list(SEQ_RANGE))
+    if pargs.featurespec is not None:
+        feature_spec = load_feature_spec(pargs.featurespec)
+    elif os.path.exists(os.path.join(os.path.dirname(pargs.model), "feature_spec.json")):
+        feature_spec = load_feature_spec(os.path.join(os.path.dirname(pargs.model), "feature_spec.json"))
+    with open(pargs.model, 'rb') as ifile:
+        existing_model = pickle.load(ifile)
+    with open(pargs.params, 'r') as ifile:
+        parameters = json.load(ifile)
+    trainer = Trainer(pargs.pos, pargs.neg, seq_range=feature_spec["seq_range"], feature_spec=feature_spec,
+                      telemetry=telemetry, num_cores=pargs.cores)
+    print(f"Warm-start training ({pargs.warmstart}) ...\n")
+    model, parameters, report = trainer.retrain(existing_model, parameters, mode=pargs.warmstart,
+                                                num_rounds=pargs.rounds, holdout=pargs.holdout)
+    print_warm_start_report(report)
+    save_model(os.path.join(SAVED_MODELS_FOLDER, "model.bin"),
+               os.path.join(SAVED_MODELS_FOLDER, "optimized_hyperparameters.json"),
+               os.path.join(SAVED_MODELS_FOLDER, "feature_importances.json"),
+               model, parameters, model.feature_importances_,
+               save_feat_imp=pargs.featureimportance,
+               feature_names=trainer.encoder.feature_names)
+    save_feature_spec(feature_spec, os.path.join(SAVED_MODELS_FOLDER, "feature_spec.json"))
+    with open(os.path.join(SAVED_MODELS_FOLDER, "warm_start_report.json"), 'w') as ofile:
+        json.dump(report, ofile, indent=4)
+    print("Done! Model, parameters and report saved!")
+
+
+def mine(pargs: dict, telemetry: Telemetry = None) -> None:
+    """
+        Train on hard negatives mined from a pool of negatives (see ´Trainer.mine_negatives´)
+    """
+    feature_spec = dict(DEFAULT_FEATURE_SPEC, seq_range=list(SEQ_RANGE))
+    if pargs.featurespec is not None:
+        feature_spec = load_feature_spec(pargs.featurespec)
+    with open(pargs.params, 'r') as ifile:
+        parameters = json.load(ifile)
+    trainer = Trainer(pargs.pos, pargs.neg, seq_range=feature_spec["seq_range"], feature_spec=feature_spec,
+                      telemetry=telemetry, num_cores=pargs.cores)
+    print("Hard-negative mining ...\n")
+    model, rounds = trainer.mine_negatives(pargs.pool, parameters, iterations=pargs.iterations,
+                                           num_hard=pargs.hard, num_random=pargs.random)
+    save_model(os.path.join(SAVED_MODELS_FOLDER, "model.bin"),
+               os.path.join(SAVED_MODELS_FOLDER, "optimized_hyperparameters.json"),
+               os.path.join(SAVED_MODELS_FOLDER, "feature_importances.json"),
+               model, parameters, model.feature_importances_,
+               save_feat_imp=pargs.featureimportance,
+               feature_names=trainer.encoder.feature_names)
+    save_feature_spec(feature_spec, os.path.join(SAVED_MODELS_FOLDER, "feature_spec.json"))
+    with open(os.path.join(SAVED_MODELS_FOLDER, "mined_negatives.fasta"), 'w') as ofile:
+        for idx in np.flatnonzero(trainer.labels == 0):
+            name, sequence = trainer.protein_sequences[int(idx)]
+            ofile.write(f">{name}\n{sequence}\n")
+    with open(os.path.join(SAVED_MODELS_FOLDER, "mining_report.json"), 'w') as ofile:
+        json.dump(rounds, ofile, indent=4)
+    print("Done! Model, parameters and mined negatives saved!")
+
+
 def start(pargs: dict) -> None:
     """
         Start the training program
     """
+    telemetry = None
+    if pargs.progress or pargs.metrics is not None:
+        telemetry = Telemetry("effectiveTrain", show_progress=pargs.progress, metrics_file=pargs.metrics).start()
+    try:
+        train(pargs, telemetry)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+
+
+def train(pargs: dict, telemetry: Telemetry = None) -> None:
+    """
+        Train the model (or retrain it, see ´warm_start´ and ´mine´) and save it
+    """
     start = time.time()
 
     print("\nLoading models and computing encodings ...\n")
-    trainer = Trainer(pargs.pos, pargs.neg, seq_range=SEQ_RANGE)
+    if pargs.warmstart is not None and pargs.pool is not None:
+        raise ValueError("--warmstart and --pool cannot be combined")
+    if pargs.warmstart is not None or pargs.pool is not None:
+        warm_start(pargs, telemetry) if pargs.warmstart is not None else mine(pargs, telemetry)
+        print(f"\nTraining took {convert_seconds(time.time() - start)}\n")
+        return
+    executor = None
+    if pargs.queue is not None:
+        executor = DistributedExecutor(pargs.queue, local_workers=pargs.workers,
+                                       claim_timeout=pargs.claimtimeout if pargs.claimtimeout > 0 else None)
+    feature_spec = dict(DEFAULT_FEATURE_SPEC, seq_range=list(SEQ_RANGE))
+    if pargs.featurespec is not None:
+        feature_spec = load_feature_spec(pargs.featurespec)
+    trainer = Trainer(pargs.pos, pargs.neg, seq_range=feature_spec["seq_range"], executor=executor,
+                      feature_spec=feature_spec, telemetry=telemetry, num_cores=pargs.cores)
     print("Training Model ...\n")
     model, parameters = trainer.train()
     save_model(os.path.join(SAVED_MODELS_FOLDER, "model.bin"),
@@ -107,7 +286,10 @@ def start(pargs: dict) -> None:
                os.path.join(SAVED_MODELS_FOLDER, "feature_importances.json"),
                model, parameters, model.feature_importances_,
                # Whether to save feature importances
-               save_feat_imp=pargs.featureimportance)
+               save_feat_imp=pargs.featureimportance,
+               feature_names=trainer.encoder.feature_names)
+    # The feature specification is required to encode the protein sequences for the new model
+    save_feature_spec(feature_spec, os.path.join(SAVED_MODELS_FOLDER, "feature_spec.json"))
     print("Done! Model and parameters saved!")
 
     print(f"\nTraining took {convert_seconds(time.time() - start)}\n")
@@ -124,7 +306,7 @@ def main():
         destination_path = os.path.join(os.getcwd(), "models")
         print('\nSuccessful execution of training!')
         print('\n--> Please find the saved models and optimized hyperparameters here: ' + folder_path)
-        print('\n\n move the model model.bin, from this folder into ',
+        print('\n\n move the model model.bin and feature_spec.json, from this folder into ',
               destination_path, "if you want to use the newly trained models for prediction.")
         sys.exit(0)
     except Exception as e:
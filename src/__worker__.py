@@ -0,0 +1,45 @@
+import sys
+import traceback
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from .training.work_queue import run_worker
+
+
+DESCRIPTION = """Worker evaluating candidate hyperparameters of a distributed training run.
+Polls the work queue directory passed to 'effectiveTrain --queue' and exits when the training has finished."""
+
+
+def parse_args():
+    parser = ArgumentParser(description=DESCRIPTION,
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-q', '--queue', required=True, type=str,
+                        help="(Required) Directory used as work queue, the same as passed to 'effectiveTrain --queue'")
+
+    parser.add_argument('-p', '--poll', required=False, type=float, default=0.5,
+                        help="(Optional) Seconds to wait before polling an empty queue again. Default: 0.5")
+
+    parser.add_argument('-t', '--idletimeout', required=False, type=float, default=None,
+                        help="(Optional) Exit after being idle for this many seconds. By default the worker runs until "
+                        + "the training has finished.")
+
+    parser.add_argument('-j', '--jobs', required=False, type=int, default=None,
+                        help="(Optional) Number of threads of LightGBM per candidate. Set it to the cores divided by the number of\n"
+                        + "workers when starting several workers on one host. Default: all cores")
+
+    return parser.parse_args()
+
+
+def main():
+    try:
+        args = parse_args()
+        run_worker(args.queue, poll_interval=args.poll, idle_timeout=args.idletimeout, n_jobs=args.jobs)
+        sys.exit(0)
+    except Exception as e:
+        print("Exception occurred: ", e)
+        traceback.print_exc()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
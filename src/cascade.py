@@ -0,0 +1,137 @@
+import math
+import threading
+import numpy as np
+from typing import Tuple
+
+from .encoders.feature_spec import CompiledEncoder
+from .metrics import DECISION_THRESHOLD
+from .quantized import QuantizedModel
+
+
+# Number of trees after which the undecided sequences are checked for an early decision
+CASCADE_STAGES: Tuple[int, ...] = (10, 15, 20, 25, 30, 35)
+# Distance in log-odds from the threshold a bound must keep for an early decision, covers the
+# rounding of the partial sums and of the sigmoid (both many orders of magnitude smaller)
+CASCADE_MARGIN: float = 1e-6
+
+
+def parse_stages(value: str) -> Tuple[int, ...]:
+    """
+        Stages of the cascade from comma-separated numbers of trees such as '10,20,30'.
+    """
+    try:
+        stages = tuple(int(stage) for stage in str(value).split(","))
+    except ValueError:
+        raise ValueError(f"Invalid stages '{value}', e.g. 10,20,30")
+    if any(stage < 1 for stage in stages):
+        raise ValueError(f"Invalid stages '{value}', the numbers of trees must be positive")
+    return stages
+
+
+class CascadeModel(QuantizedModel):
+    """
+        Scores protein sequences on quantized features (see ´quantized.QuantizedModel´) tree range by tree
+        range and stops early for sequences whose label is decided before all trees are evaluated.
+
+        After the first k trees (k of ´stages´) the remaining trees can add at least the sum of their smallest
+        leaf values and at most the sum of their largest leaf values to the partial score. A sequence whose
+        partial score plus the largest remaining contribution stays below the decision threshold (in log-odds)
+        can not become positive, one whose partial score plus the smallest remaining contribution stays above
+        can not become negative, the remaining trees are not evaluated for them. The labels are hence always
+        those of the full model. Undecided sequences are summed up tree by tree as LightGBM does, their
+        probabilities equal those of ´QuantizedModel´ bit by bit. Sequences decided early get the probability
+        of the bound that decided them: an upper bound of the probability for negatives, a lower bound for
+        positives.
+
+        Early decisions shorten the tree evaluation for input dominated by one label, e.g. proteomes, where most
+        sequences are clear negatives, not the encoding. The number of evaluated trees and of early decisions is
+        counted (see ´summary´).
+    """
+
+    def __init__(self, model: object, encoder: CompiledEncoder, stages: Tuple[int, ...] = CASCADE_STAGES,
+                 threshold: float = DECISION_THRESHOLD) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                model (object): the trained LGBMClassifier (binary objective, numerical splits only)
+                encoder (CompiledEncoder): encoder computing the features of the model
+                stages (Tuple[int, ...]): number of trees after which the sequences are checked
+                                          for an early decision, stages beyond the last tree are ignored
+                threshold (float): probability threshold of the positive label
+        """
+        super().__init__(model, encoder)
+        if not 0.0 < threshold < 1.0:
+            raise ValueError(f"The decision threshold must be between 0 and 1, got {threshold}")
+        if any(stage < 1 for stage in stages):
+            raise ValueError("The stages of the cascade must be positive numbers of trees, got "
+                             + ", ".join(str(stage) for stage in stages))
+        self.num_trees = len(self.roots)
+        self.stages = sorted({int(stage) for stage in stages if stage < self.num_trees}) + [self.num_trees]
+        # Smallest and largest contribution of the trees k, k + 1, ... (index k), 0 after the last tree
+        starts = self.leaf_offsets[:-1]
+        min_leaves = np.minimum.reduceat(self.leaf_values, starts)
+        max_leaves = np.maximum.reduceat(self.leaf_values, starts)
+        self.remaining_min = np.append(np.cumsum(min_leaves[::-1])[::-1], 0.0)
+        self.remaining_max = np.append(np.cumsum(max_leaves[::-1])[::-1], 0.0)
+        # Log-odds of the threshold: probability >= threshold if and only if score >= threshold_score
+        self.threshold = threshold
+        self.threshold_score = math.log(threshold / (1.0 - threshold)) / self.sigmoid
+        self.lock = threading.Lock()
+        self.reset_counts()
+
+    def raw_scores(self, bins: np.ndarray) -> np.ndarray:
+        """
+            Sum of the leaf values of all trees (log-odds) for undecided sequences and the
+            deciding bound of the score for sequences decided early.
+        """
+        scores = np.zeros(len(bins), dtype=np.float64)
+        active = np.arange(len(bins))
+        decided = np.zeros(len(self.stages), dtype=np.int64)
+        num_trees_evaluated, first = 0, 0
+        for stage, last in enumerate(self.stages):
+            active_bins = bins[active] if len(active) < len(bins) else bins
+            num_trees_evaluated += len(active) * (last - first)
+            # Sum up tree by tree (as LightGBM does), see ´QuantizedModel.raw_scores´
+            partial = scores[active]
+            for tree in range(first, last):
+                partial += self.tree_values(active_bins, tree)
+            scores[active] = partial
+            if last == self.num_trees:
+                decided[stage] = len(active)
+                break
+            upper, lower = partial + self.remaining_max[last], partial + self.remaining_min[last]
+            negative = upper < self.threshold_score - CASCADE_MARGIN
+            positive = lower > self.threshold_score + CASCADE_MARGIN
+            scores[active[negative]] = upper[negative]
+            scores[active[positive]] = lower[positive]
+            undecided = ~(negative | positive)
+            decided[stage] = len(active) - np.count_nonzero(undecided)
+            active, first = active[undecided], last
+            if len(active) == 0:
+                break
+        with self.lock:
+            self.num_sequences += len(bins)
+            self.num_trees_evaluated += num_trees_evaluated
+            self.decided += decided
+        return scores
+
+    def reset_counts(self) -> None:
+        with self.lock:
+            self.num_sequences = 0
+            self.num_trees_evaluated = 0
+            # Number of sequences decided after each stage (the last: evaluated with all trees)
+            self.decided = np.zeros(len(self.stages), dtype=np.int64)
+
+    def summary(self) -> str:
+        """
+            Early decisions and evaluated trees of the sequences scored so far.
+        """
+        with self.lock:
+            if self.num_sequences == 0:
+                return "Cascade: no sequences scored"
+            early = self.num_sequences - int(self.decided[-1])
+            stages = ", ".join(f"{count} after {stage} trees" for stage, count in zip(self.stages[:-1], self.decided[:-1]) if count)
+            return (f"Cascade: {early} of {self.num_sequences} sequences ({early / self.num_sequences:.1%}) decided early"
+                    + (f" ({stages})" if stages else "")
+                    + f", {self.num_trees_evaluated / self.num_sequences:.1f} of {self.num_trees} trees evaluated per sequence")
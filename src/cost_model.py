@@ -0,0 +1,221 @@
+import os
+import json
+import math
+import time
+import pickle
+import platform
+import numpy as np
+from multiprocessing import cpu_count
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Tuple
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+from .execution import init_worker, count_chunk, BACKENDS
+from .__init__ import __version__
+
+
+# Per machine calibration of the costs of the execution
+COST_MODEL_FILE: str = os.path.join(os.path.expanduser("~"), ".cache", "effectivet3", "cost_model.json")
+# Number of synthetic protein sequences the costs are measured on
+CALIBRATION_SIZE: int = 2000
+# Chunks are not made smaller than this (unless a backend is forced), each worker gets about CHUNKS_PER_WORKER chunks
+MIN_CHUNK_SIZE: int = 1000
+CHUNKS_PER_WORKER: int = 4
+
+# Costs measured by ´calibrate´
+COSTS = ("count_per_sequence", "count_per_residue", "finalize_per_sequence", "score_per_sequence", "thread_overhead",
+         "thread_efficiency", "process_overhead", "transfer_per_sequence")
+
+AMINO_ACIDS = np.frombuffer(b"ACDEFGHIKLMNPQRSTVWY", dtype=np.uint8)
+
+
+def machine_key() -> str:
+    """
+        Identifies the machine and the software the costs were measured with.
+    """
+    return "|".join([platform.node(), platform.machine(), str(cpu_count()), platform.python_version(),
+                     "numpy " + np.__version__, "effectivet3 " + __version__])
+
+
+def synthetic_records(num_sequences: int, length: int, seed: int = 0) -> SequenceRecords:
+    """
+        Random protein sequences of the 20 amino acids.
+    """
+    rng = np.random.default_rng(seed)
+    ends = np.arange(1, num_sequences + 1, dtype=np.int64) * length
+    names = np.frombuffer(b"".join(f"s{idx}".encode("ascii") for idx in range(num_sequences)), dtype=np.uint8)
+    name_lengths = np.array([len(f"s{idx}") for idx in range(num_sequences)], dtype=np.int64)
+    name_ends = np.cumsum(name_lengths)
+    return SequenceRecords(AMINO_ACIDS[rng.integers(0, len(AMINO_ACIDS), num_sequences * length)],
+                           ends - length, ends, names.copy(), name_ends - name_lengths, name_ends)
+
+
+def best_time(task: Callable, repeat: int = 3) -> float:
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        task()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def calibrate(encoder: CompiledEncoder, model: object) -> dict:
+    """
+        Measure the costs of encoding and scoring on this machine.
+
+        Args:
+            encoder (CompiledEncoder): encoder computing the features
+            model (object): the trained classifier (with ´predict_proba´)
+
+        Returns:
+            dict: seconds per sequence and per residue of the counting, seconds per sequence of completing
+            the features and of scoring, the overhead of starting a thread pool and a process pool, the
+            transfer costs per sequence to and from a process and the efficiency of threads
+    """
+    short = synthetic_records(CALIBRATION_SIZE, 25, seed=0)
+    long = synthetic_records(CALIBRATION_SIZE // 4, 400, seed=1)
+    residues = [int(encoder.windows(records).lengths.sum()) for records in (short, long)]
+    times = [best_time(lambda: encoder.count_sequences(records)) for records in (short, long)]
+    # time = number of sequences * per sequence + number of residues * per residue
+    per_residue, per_sequence = np.linalg.lstsq(np.array([[residues[0], len(short)], [residues[1], len(long)]], dtype=np.float64),
+                                                np.array(times), rcond=None)[0]
+    per_residue, per_sequence = max(float(per_residue), 0.0), max(float(per_sequence), times[0] / len(short) / 2)
+
+    counts = encoder.count_sequences(short)
+    features = encoder.finalize(*counts)[0]
+    finalize = best_time(lambda: encoder.finalize(*counts)) / len(short)
+    score = best_time(lambda: model.predict_proba(features)) / len(short)
+
+    def start_threads():
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(lambda chunk: count_chunk(chunk, [encoder]), (short[:1], short[1:2])))
+
+    def start_processes():
+        with ProcessPoolExecutor(1, initializer=init_worker, initargs=([encoder],)) as executor:
+            executor.submit(count_chunk, short[:1]).result()
+
+    def count_halves():
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(lambda chunk: count_chunk(chunk, [encoder]), (short[:len(short) // 2], short[len(short) // 2:])))
+
+    def transfer():
+        # Chunk to the process, counts back
+        pickle.loads(pickle.dumps(short))
+        pickle.loads(pickle.dumps(counts))
+
+    # Speedup of two threads relative to two workers that do not slow down each other
+    thread_efficiency = 1.0
+    if cpu_count() > 1:
+        thread_efficiency = float(np.clip(times[0] / (2 * best_time(count_halves)), 0.05, 1.0))
+    return {
+        "count_per_sequence": per_sequence,
+        "count_per_residue": per_residue,
+        "finalize_per_sequence": finalize,
+        "score_per_sequence": score,
+        "thread_overhead": best_time(start_threads),
+        "thread_efficiency": thread_efficiency,
+        "process_overhead": best_time(start_processes, repeat=2),
+        "transfer_per_sequence": best_time(transfer) / len(short),
+        "calibrated": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def load_costs(encoder: CompiledEncoder, model: object, file_path: str = COST_MODEL_FILE, recalibrate: bool = False) -> dict:
+    """
+        Costs of this machine from the cache file, they are measured (see ´calibrate´) and
+        cached if the machine is not in the file yet or ´recalibrate´ is set.
+    """
+    cache = dict()
+    if os.path.exists(file_path):
+        try:
+            with open(file_path, 'r') as ifile:
+                cache = json.load(ifile)
+        except ValueError:
+            cache = dict()
+    key = machine_key()
+    # Costs measured by an older version lack some of the costs
+    if key not in cache or recalibrate or not all(cost in cache[key] for cost in COSTS):
+        print("Calibrating the cost model of this machine ...")
+        cache[key] = calibrate(encoder, model)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as ofile:
+                json.dump(cache, ofile, indent=4)
+        except OSError as e:
+            print("The cost model could not be cached:", str(e))
+    return cache[key]
+
+
+class ExecutionPlan(object):
+    """
+        Backend, number of workers and chunk size chosen by ´plan_execution´.
+    """
+
+    def __init__(self, backend: str, num_workers: int, chunk_size: int, estimates: dict) -> None:
+        self.backend = backend
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        # backend -> estimated seconds of the best configuration of the backend
+        self.estimates = estimates
+
+    def __str__(self) -> str:
+        estimates = ", ".join(f"{backend} {seconds:.3f}s" for backend, seconds in self.estimates.items())
+        return (f"{self.backend} execution, {self.num_workers} worker(s), chunks of {self.chunk_size} sequences "
+                f"(estimated: {estimates})")
+
+
+def plan_execution(num_sequences: int, num_residues: int, num_cores: int, costs: dict,
+                   num_encoders: int = 1, num_models: int = 1, backends: Tuple[str, ...] = BACKENDS) -> ExecutionPlan:
+    """
+        Choose the fastest of serial, thread and process execution (see ´execution.execute´) and the
+        number of workers and the chunk size. Counting runs on the workers, completing the features
+        runs in the main process while the workers count the next chunks. Scoring runs on the workers
+        with threads and in the main process with processes.
+
+        Args:
+            num_sequences (int): number of protein sequences
+            num_residues (int): number of residues of the sequence regions that are encoded
+            num_cores (int): maximal number of workers
+            costs (dict): costs of this machine (see ´load_costs´)
+            num_encoders (int): number of encoders each sequence is encoded with
+            num_models (int): number of models each sequence is scored with
+            backends (Tuple[str, ...]): backends to choose from, without 'serial' (a backend forced by the user)
+                                        the chunks are made smaller than MIN_CHUNK_SIZE for at least two
+                                        workers, serial execution is chosen (and reported) only if there
+                                        are fewer than two sequences
+
+        Returns:
+            ExecutionPlan: the fastest configuration
+    """
+    counting = num_encoders * num_sequences * costs["count_per_sequence"] + num_residues * costs["count_per_residue"]
+    finalizing = num_encoders * num_sequences * costs["finalize_per_sequence"]
+    scoring = num_models * num_sequences * costs["score_per_sequence"]
+    serial = counting + finalizing + scoring
+    best = ("serial", 1, max(num_sequences, 1), serial if "serial" in backends else float("inf"))
+    estimates = {"serial": serial}
+    min_chunk_size = MIN_CHUNK_SIZE if "serial" in backends else 1
+    for num_workers in range(2, num_cores + 1):
+        chunk_size = max(min_chunk_size, math.ceil(num_sequences / (num_workers * CHUNKS_PER_WORKER)))
+        num_chunks = math.ceil(num_sequences / chunk_size)
+        workers = min(num_workers, num_chunks)
+        if workers < 2:
+            continue
+        # The main process waits for the first chunk, then the slowest stage determines the time
+        first_chunk = counting / num_chunks
+        candidates = {
+            "thread": costs["thread_overhead"] + first_chunk
+            + max((counting + scoring) / (workers * costs["thread_efficiency"]), finalizing),
+            "process": costs["process_overhead"] * workers + num_sequences * costs["transfer_per_sequence"]
+            + first_chunk + max(counting / workers, finalizing + scoring)
+        }
+        for backend, seconds in candidates.items():
+            if backend not in backends:
+                continue
+            estimates[backend] = min(estimates.get(backend, seconds), seconds)
+            if seconds < best[3]:
+                best = (backend, workers, chunk_size, seconds)
+    if best[0] == "serial" and "serial" not in backends:
+        print(f"{num_sequences} sequence(s) can not be split for several workers, falling back to serial execution "
+              + "instead of " + ", ".join(backends))
+    return ExecutionPlan(best[0], best[1], best[2], estimates)
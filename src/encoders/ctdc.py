@@ -11,6 +11,36 @@ import numpy as np
 from typing import Tuple
 
 
+CTDC_GROUP1 = {
+    'hydrophobicity_PRAM900101': 'RKEDQN',
+    'normwaalsvolume': 'GASTPDC',
+    'polarity':        'LIFWCMVY',
+    'polarizability':  'GASDT',
+    'charge':          'KR',
+    'secondarystruct': 'EALMQKRH',
+    'solventaccess':   'ALFCGIVW'
+}
+CTDC_GROUP2 = {
+    'hydrophobicity_PRAM900101': 'GASTPHY',
+    'normwaalsvolume': 'NVEQIL',
+    'polarity':        'PATGS',
+    'polarizability':  'CPNVEQIL',
+    'charge':          'ANCQGHILMFPSTWYV',
+    'secondarystruct': 'VIYCWFT',
+    'solventaccess':   'RKQEND'
+}
+CTDC_GROUP3 = {
+    'hydrophobicity_PRAM900101': 'CLVIMFW',
+    'normwaalsvolume': 'MHKFRYW',
+    'polarity':        'HQRKNED',
+    'polarizability':  'KMHFRYW',
+    'charge':          'DE',
+    'secondarystruct': 'GNPSD',
+    'solventaccess':   'MSPTHY'
+}
+CTDC_PROPERTIES = ('hydrophobicity_PRAM900101', 'normwaalsvolume', 'polarity',
+                   'polarizability', 'charge', 'secondarystruct', 'solventaccess')
+
 def Count(seq1: str, seq2: str) -> int:
     """
         Compute the total number of all amino acids in seq1 occurring in seq2.
@@ -28,7 +58,7 @@ def Count(seq1: str, seq2: str) -> int:
     return sum_
 
 
-def CTDC(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> np.ndarray:
+def CTDC(fastas: np.ndarray, seq_range: Tuple[int, int] = None, full: bool = False) -> np.ndarray:
     """
         C omposition T ransition D istribution C omposition
 
@@ -41,50 +71,21 @@ def CTDC(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> np.ndarray:
         Args:
             fastas (np.ndarray): array containing 2-sized list -> protein identifier | protein sequence
             seq_range (Tuple[int, int]): sequence region to compute the encoding for
+            full (bool): whether to compute the full CTDC encoding
 
         Returns:
             n x 1 dimensional np.ndarray where n is the number of protein sequences
-            the dimension is 1 because the feature selection is hard-coded to ensure
-            faster running time, the full code in comments is for reference, if
-            you want to compute the full CTDC encoding for some reason
-            -> the full encoding would return a n x 21 dimensional np.ndarray
+            the dimension is 1 because by default only the feature obtained by feature
+            selection is computed to ensure faster running time
+            -> the full encoding (´full´=True) returns a n x 21 dimensional np.ndarray
     """
-
-    # Remove the comment if you want to compute the full CTDC encoding ,now only
-    # the features from CTDC encoding as obtained by feature selection are computed
-
-    # group1 = {
-    #     'hydrophobicity_PRAM900101': 'RKEDQN',
-    #     'normwaalsvolume': 'GASTPDC',
-    #     'polarity':        'LIFWCMVY',
-    #     'polarizability':  'GASDT',
-    #     'charge':          'KR',
-    #     'secondarystruct': 'EALMQKRH',
-    #     'solventaccess':   'ALFCGIVW'
-    # }
-    # group2 = {
-    #     'hydrophobicity_PRAM900101': 'GASTPHY',
-    #     'normwaalsvolume': 'NVEQIL',
-    #     'polarity':        'PATGS',
-    #     'polarizability':  'CPNVEQIL',
-    #     'charge':          'ANCQGHILMFPSTWYV',
-    #     'secondarystruct': 'VIYCWFT',
-    #     'solventaccess':   'RKQEND'
-    # }
-    group3 = {
-        # 'hydrophobicity_PRAM900101': 'CLVIMFW',
-        # 'normwaalsvolume': 'MHKFRYW',
-        # 'polarity':        'HQRKNED',
-        # 'polarizability':  'KMHFRYW',
-        # 'charge':          'DE',
-        'secondarystruct': 'GNPSD',
-        # 'solventaccess':   'MSPTHY'
-    }
-    property = (  # 'hydrophobicity_PRAM900101', 'normwaalsvolume', 'polarity',
-        # 'polarizability', 'charge',
-        'secondarystruct',
-        # 'solventaccess'
-    )
+    if full:
+        groups = (CTDC_GROUP1, CTDC_GROUP2, CTDC_GROUP3)
+        property = CTDC_PROPERTIES
+    else:
+        # Only the feature from CTDC encoding as obtained by feature selection
+        groups = (CTDC_GROUP3,)
+        property = ('secondarystruct',)
 
     if seq_range is not None:
         for idx in range(len(fastas)):
@@ -96,14 +97,7 @@ def CTDC(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> np.ndarray:
         code = list()
         sequence = re.sub('-', '', sequence)
         for p in property:
-
-            # Remove comments below if you want to compute the full CTDC encoding
-
-            # c1 = Count(group1[p], sequence) / len(sequence)
-            # c2 = Count(group2[p], sequence) / len(sequence)
-            c3 = Count(group3[p], sequence) / len(sequence)
-            # code.append(c1)
-            # code.append(c2)
-            code.append(c3)
+            for group in groups:
+                code.append(Count(group[p], sequence) / len(sequence))
         features.append(code)
     return np.array(features)
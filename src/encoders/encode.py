@@ -1,10 +1,18 @@
 import numpy as np
-from typing import Tuple
+from typing import Tuple, Union
 from .aac import AAC
-from .ctdc import CTDC
+from .ctdc import CTDC, CTDC_PROPERTIES
 from .ctdt import CTDT
 from .dpc import DPC
-from .aaprop_patterns import AaPropPatterns
+from .aaprop_patterns import AaPropPatterns, PATTERN_LABELS
+from ..sequtils.records import SequenceRecords
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+# Names of the columns returned by ´full_encode´
+FULL_FEATURE_NAMES = (list(AMINO_ACIDS) + PATTERN_LABELS
+                      + [f"{p}.G{g}" for p in CTDC_PROPERTIES for g in (1, 2, 3)]
+                      + [f"{p}.{t}" for p in CTDC_PROPERTIES for t in ("Tr1221", "Tr1331", "Tr2332")]
+                      + [aa1 + aa2 for aa1 in AMINO_ACIDS for aa2 in AMINO_ACIDS])
 
 # Dipeptides used for DPC computation as obtained by feature selection using
 # shap-values of features obtained from the test set of trained light gradient boosting model
@@ -30,15 +38,18 @@ POLAR = "NQST"
 # Second set of dipeptides for DPC as obtained by feature selection using feature
 # importances of trained light gradient boosting model
 # -> hardcoded: see function ´src/encoders/ctdc.py´
-# uncomment code to obtain full ctdc encoding
+# (´full_encode´ below computes all features, ´feature_spec.compile_spec´ any selection of them)
+# Names of the columns returned by ´encode´
+FEATURE_NAMES = (DPC_FEATURE_SELECTION_1 + ["POLAR"] + DPC_FEATURE_SELECTION_2
+                 + ["secondarystruct.G3"] + DPC_FEATURE_SELECTION_3)
 
 
-def encode(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+def encode(fastas: Union[np.ndarray, SequenceRecords], seq_range: Tuple[int, int] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
          Encode protein sequences using sequence- and amino acid property-based features.
 
          Args:
-             fastas (np.ndarray): array containing the protein sequences
+             fastas (Union[np.ndarray, SequenceRecords]): array or records containing the protein sequences
              seq_range (Tuple[int, int]): sequence range to use for prediction (defaults to full-length)
              model_ (str): single model combination to use for prediction
              process_id (str): id of the process, in case this task is executed in parallel
@@ -52,6 +63,9 @@ def encode(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> Tuple[np.nd
              on different test sets
     """
 
+    # Records are only windowed, the array of the sequence regions is small
+    if isinstance(fastas, SequenceRecords):
+        fastas, seq_range = fastas.window(seq_range).to_array(), None
     # Only perform sequence region extraction once to improve computation time
     if seq_range is not None:
         for idx in range(len(fastas)):
@@ -72,37 +86,37 @@ def encode(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> Tuple[np.nd
     return fastas[:, 0], features
 
 
-# Obtain the full encoding including all features contained in the encoders module
-# copy the function body of ´full_encode´ and paste it into the ´encode´ function
-# if you want to train a model using all features to later use it for prediction
-# Note the model with less features was shown to perform better
-
-# NOTE REMOVE THE COMMENTS IN THE FUNCTION ´src/encoders/ctdc.py´ TO OBTAIN THE FULL CTDC ENCODING
-# FOR REASON OF EFFICIENCY THE FEATURE SELECTED ENCODING OF CTDC IS HARDCODED IN THE FUNCTION
+def full_encode(fastas: Union[np.ndarray, SequenceRecords], seq_range: Tuple[int, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Encode protein sequences using all features contained in the encoders module,
+        the columns are in the order of ´FULL_FEATURE_NAMES´.
 
-# def full_encode(fastas: np.ndarray, seq_range: Tuple[int, int] = None) -> Tuple[np.ndarray, np.ndarray]:
-#     """
-#         Encode protein sequences using sequence- and amino acid property-based features.
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): array or records containing the protein sequences
+            seq_range (Tuple[int, int]): sequence range to use for prediction (defaults to full-length)
 
-#         Args:
-#             fastas (np.ndarray): array containing the protein sequences
-#             seq_range (Tuple[int, int]): sequence range to use for prediction (defaults to full-length)
-#             model_ (str): single model combination to use for prediction
-#             process_id (str): id of the process, in case this task is executed in parallel
-#             result_dict (dict): dictionary to add the results to
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: containing the protein identifiers
+            and the encoded features of all input protein sequences
+            -> returns n x 513 dimensional np.ndarray
+    """
+    # Records are only windowed, the array of the sequence regions is small
+    if isinstance(fastas, SequenceRecords):
+        fastas, seq_range = fastas.window(seq_range).to_array(), None
+    # Only perform sequence region extraction once to improve computation time
+    if seq_range is not None:
+        for idx in range(len(fastas)):
+            if len(fastas[idx][1]) > seq_range[1]-1:
+                fastas[idx][1] = fastas[idx][1][seq_range[0]:seq_range[1]]
+    # Sequence-based features
+    aac = AAC(fastas, seq_range=None)
+    dpc = DPC(fastas, seq_range=None)
+    # Amino acid property (patterns) based features
+    aaprop = AaPropPatterns(fastas, seq_range=None)
+    ctdc = CTDC(fastas, seq_range=None, full=True)
+    ctdt = CTDT(fastas, seq_range=None)
+    # Combine all features
+    features = np.hstack((aac, aaprop, ctdc, ctdt, dpc))
+    # names, encodings
+    return fastas[:, 0], features
 
-#         Returns:
-#             Tuple[np.ndarray, np.ndarray]: containing the protein identifiers
-#             and the encoded features of all input protein sequences
-#     """
-#     # Sequence-based features
-#     aac = AAC(fastas, seq_range=seq_range)
-#     dpc = DPC(fastas, seq_range=seq_range)
-#     # Amino acid property (patterns) based features
-#     aaprop = AaPropPatterns(fastas, seq_range=seq_range)
-#     ctdc = CTDC(fastas, seq_range=seq_range)
-#     ctdt = CTDT(fastas, seq_range=seq_range)
-#     # Combine all features
-#     features = np.hstack((aac, aaprop, ctdc, ctdt, dpc))
-#     # names, encodings
-#     return fastas[:, 0], features
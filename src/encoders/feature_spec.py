@@ -0,0 +1,360 @@
+# --------------------------------------------------------------------
+# Original code copyright Nicolas Nemeth 2023
+# Covered by original MIT license
+# --------------------------------------------------------------------
+
+
+import os
+import json
+import yaml
+import numpy as np
+from typing import List, Tuple, Union
+
+from . import kernels
+from ..sequtils.records import SequenceRecords
+from .ctdc import CTDC_GROUP1, CTDC_GROUP2, CTDC_GROUP3, CTDC_PROPERTIES
+from .aaprop_patterns import PATTERN_LABELS, SELECTED_PATTERNS
+from .encode import (FULL_FEATURE_NAMES, DPC_FEATURE_SELECTION_1, DPC_FEATURE_SELECTION_2,
+                     DPC_FEATURE_SELECTION_3, POLAR)
+
+"""
+    A feature specification declares the features used by a model:
+
+    {
+        "seq_range": [1, 26],
+        "groups": [
+            {"encoder": "DPC", "columns": ["SS", "KR", ...]},
+            {"encoder": "AaPropPatterns", "columns": ["POLAR, POLAR", {"name": "POLAR", "pattern": ["N", "Q", "S", "T"]}]},
+            {"encoder": "CTDC", "columns": ["secondarystruct.G3"]},
+            ...
+        ]
+    }
+
+    The columns of the groups are concatenated in the given order. Columns are named as in
+    ´FULL_FEATURE_NAMES´, i.e. amino acids for AAC, dipeptides for DPC, '{property}.G{1|2|3}'
+    for CTDC, '{property}.Tr{1221|1331|2332}' for CTDT and pattern labels for AaPropPatterns.
+    Patterns can also be given explicitly as list of residue groups (one group per position).
+
+    ´compile_spec´ turns a specification into a ´CompiledEncoder´ computing only the
+    requested columns, with the exact same values as the functions of the encoders module.
+"""
+
+ENCODERS = ("AAC", "DPC", "CTDC", "CTDT", "AaPropPatterns")
+CTDT_TRANSITIONS = ("Tr1221", "Tr1331", "Tr2332")
+
+# Specification of the 85 features computed by ´encoders.encode.encode´
+# NOTE: ´encode´ passes the string POLAR as single pattern, so each of its
+# letters is one position of the pattern (the motif NQST)
+DEFAULT_FEATURE_SPEC = {
+    "seq_range": [1, 26],
+    "groups": [
+        {"encoder": "DPC", "columns": DPC_FEATURE_SELECTION_1},
+        {"encoder": "AaPropPatterns", "columns": [{"name": "POLAR", "pattern": list(POLAR)}]},
+        {"encoder": "DPC", "columns": DPC_FEATURE_SELECTION_2},
+        {"encoder": "CTDC", "columns": ["secondarystruct.G3"]},
+        {"encoder": "DPC", "columns": DPC_FEATURE_SELECTION_3}
+    ]
+}
+
+
+def encoder_of_feature(name: str) -> str:
+    """
+        Encoder computing a feature of ´FULL_FEATURE_NAMES´.
+    """
+    if len(name) == 1:
+        return "AAC"
+    if name in PATTERN_LABELS:
+        return "AaPropPatterns"
+    if ".G" in name:
+        return "CTDC"
+    if ".Tr" in name:
+        return "CTDT"
+    return "DPC"
+
+
+def full_spec(seq_range: Tuple[int, int] = None) -> dict:
+    """
+        Specification of all features, in the same order as ´encoders.encode.full_encode´.
+    """
+    return spec_from_feature_names(FULL_FEATURE_NAMES, seq_range)
+
+
+def spec_from_feature_names(feature_names: List[str], seq_range: Tuple[int, int] = None) -> dict:
+    """
+        Specification of the features of ´FULL_FEATURE_NAMES´ with the given names,
+        consecutive features of the same encoder are put into one group.
+
+        Args:
+            feature_names (List[str]): names of the features in the order of the columns
+            seq_range (Tuple[int, int]): sequence range to encode
+
+        Returns:
+            dict: the feature specification
+    """
+    unknown = [name for name in feature_names if name not in FULL_FEATURE_NAMES]
+    if len(unknown) != 0:
+        raise ValueError("Unknown features: " + ", ".join(unknown))
+    groups = list()
+    for name in feature_names:
+        encoder = encoder_of_feature(name)
+        if len(groups) == 0 or groups[-1]["encoder"] != encoder:
+            groups.append({"encoder": encoder, "columns": list()})
+        groups[-1]["columns"].append(name)
+    return {"seq_range": list(seq_range) if seq_range is not None else None, "groups": groups}
+
+
+def load_feature_spec(file_path: str) -> dict:
+    """
+        Load a feature specification from a json- or yaml-file.
+    """
+    with open(file_path, 'r') as ifile:
+        if os.path.splitext(file_path)[1].lower() in (".yaml", ".yml"):
+            spec = yaml.safe_load(ifile)
+        else:
+            spec = json.load(ifile)
+    # Validate the specification right away
+    compile_spec(spec)
+    return spec
+
+
+def save_feature_spec(spec: dict, file_path: str) -> None:
+    with open(file_path, 'w') as ofile:
+        if os.path.splitext(file_path)[1].lower() in (".yaml", ".yml"):
+            yaml.safe_dump(spec, ofile, sort_keys=False)
+        else:
+            json.dump(spec, ofile, indent=4)
+
+
+def feature_names(spec: dict) -> List[str]:
+    names = list()
+    for group in spec["groups"]:
+        for column in group["columns"]:
+            names.append(column["name"] if isinstance(column, dict) else column)
+    return names
+
+
+def column_keys(spec: dict) -> List[Tuple[str, Union[str, Tuple[str, ...]]]]:
+    """
+        Key of each column identifying the computed values, columns with the same key are
+        equal even if they are named differently (e.g. a pattern given by label or explicitly).
+    """
+    keys = list()
+    for group in spec["groups"]:
+        for column in group["columns"]:
+            if group["encoder"] == "AaPropPatterns":
+                keys.append((group["encoder"], tuple(_pattern(column))))
+            else:
+                keys.append((group["encoder"], column))
+    return keys
+
+
+def _pattern(column: Union[str, dict]) -> List[str]:
+    if isinstance(column, dict):
+        return list(column["pattern"])
+    if column not in PATTERN_LABELS:
+        raise ValueError("Unknown pattern: " + str(column))
+    return SELECTED_PATTERNS[PATTERN_LABELS.index(column)]
+
+
+def _validate_column(encoder: str, column: Union[str, dict]) -> None:
+    valid = True
+    if encoder == "AAC":
+        valid = isinstance(column, str) and len(column) == 1 and column in kernels.AMINO_ACIDS
+    elif encoder == "DPC":
+        valid = isinstance(column, str) and len(column) == 2 and all(aa in kernels.AMINO_ACIDS for aa in column)
+    elif encoder == "CTDC":
+        valid = (isinstance(column, str) and column.count(".G") == 1
+                 and column.split(".G")[0] in CTDC_PROPERTIES and column.split(".G")[1] in ("1", "2", "3"))
+    elif encoder == "CTDT":
+        valid = (isinstance(column, str) and column.count(".") == 1
+                 and column.split(".")[0] in CTDC_PROPERTIES and column.split(".")[1] in CTDT_TRANSITIONS)
+    elif encoder == "AaPropPatterns":
+        valid = len(_pattern(column)) > 0
+    if not valid:
+        raise ValueError(f"Invalid column of the {encoder} encoder in feature specification: {column}")
+
+
+def ratio_values(encoder: str, counts: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+    """
+        Features of the encoders other than DPC from their counts and denominators,
+        sequences without residues produce nan instead of raising a ZeroDivisionError.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if encoder == "AaPropPatterns":
+            return np.where(denominators > 0, counts / np.maximum(denominators, 1), 0)
+        return counts / denominators
+
+
+class CompiledEncoder(object):
+    """
+        Encoder computing the features of a feature specification.
+
+        All requested columns of the same encoder are computed together by the
+        vectorized kernels of ´encoders.kernels´ on the whole batch, unused columns are not computed.
+    """
+
+    def __init__(self, spec: dict) -> None:
+        self.spec = spec
+        self.seq_range = tuple(spec["seq_range"]) if spec.get("seq_range") is not None else None
+        self.feature_names = feature_names(spec)
+        # encoder -> list of (column, output position)
+        self.columns = {encoder: list() for encoder in ENCODERS}
+        position = 0
+        for group in spec["groups"]:
+            if group["encoder"] not in ENCODERS:
+                raise ValueError("Unknown encoder in feature specification: " + str(group["encoder"]))
+            for column in group["columns"]:
+                _validate_column(group["encoder"], column)
+                self.columns[group["encoder"]].append((column, position))
+                position += 1
+        self.num_features = position
+        # One column per dipeptide over all DPC groups, as in ´encoders.encode.encode´
+        dipeptides = [column for column, _ in self.columns["DPC"]]
+        if len(set(dipeptides)) != len(dipeptides):
+            raise ValueError("Dipeptides of the DPC groups in the feature specification must be unique, repeated: "
+                             + ", ".join(sorted({dp for dp in dipeptides if dipeptides.count(dp) > 1})))
+        # encoder -> output positions of its columns
+        self.positions = {encoder: [pos for _, pos in self.columns[encoder]] for encoder in ENCODERS}
+
+    def windows(self, sequences: Union[List[str], SequenceRecords]) -> Union[List[str], SequenceRecords]:
+        """
+            Extract the sequence region of each sequence (as ´encoders.encode.encode´ does,
+            sequences not longer than the end of the range are used as they are).
+        """
+        if isinstance(sequences, SequenceRecords):
+            return sequences.window(self.seq_range)
+        if self.seq_range is None:
+            return list(sequences)
+        start, end = self.seq_range
+        return [seq[start:end] if len(seq) > end-1 else seq for seq in sequences]
+
+    def batch(self, sequences: Union[List[str], SequenceRecords]) -> kernels.SequenceBatch:
+        windows = self.windows(sequences)
+        if isinstance(windows, SequenceRecords):
+            return kernels.SequenceBatch.from_records(windows)
+        return kernels.SequenceBatch.from_sequences(windows)
+
+    def count_sequences(self, sequences: Union[List[str], SequenceRecords]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Count the occurrences underlying each feature, i.e. residues of a group (AAC, CTDC),
+            transitions between groups (CTDT), pattern matches (AaPropPatterns) and dipeptides (DPC).
+
+            Args:
+                sequences (Union[List[str], SequenceRecords]): the protein sequences
+
+            Returns:
+                Tuple[np.ndarray, np.ndarray, np.ndarray]: n x ´num_features´ counts, lengths of the
+                sequence regions and lengths of the sequence regions without gap symbols. The counts are
+                at most the length of the sequence region, they are stored in the smallest unsigned integer
+                type holding the longest region of the batch (uint8 for the 25 residues of Effective T3)
+        """
+        batch = self.batch(sequences)
+        clean = batch.clean
+        count_dtype = np.min_scalar_type(int(batch.lengths.max(initial=0)))
+        counts = np.zeros((len(batch), self.num_features), dtype=count_dtype)
+        if len(self.columns["AAC"]) != 0:
+            counts[:, self.positions["AAC"]] = kernels.group_counts(clean, [aa for aa, _ in self.columns["AAC"]])
+        if len(self.columns["CTDC"]) != 0:
+            groups = list()
+            for column, _ in self.columns["CTDC"]:
+                prop, number = column.split(".G")
+                groups.append((CTDC_GROUP1, CTDC_GROUP2, CTDC_GROUP3)[int(number)-1][prop])
+            counts[:, self.positions["CTDC"]] = kernels.group_counts(clean, groups)
+        if len(self.columns["CTDT"]) != 0:
+            for prop in CTDC_PROPERTIES:
+                columns = [(column.split(".")[1], pos) for column, pos in self.columns["CTDT"]
+                           if column.split(".")[0] == prop]
+                if len(columns) == 0:
+                    continue
+                groups = (CTDC_GROUP1[prop], CTDC_GROUP2[prop], CTDC_GROUP3[prop])
+                counts[:, [pos for _, pos in columns]] = kernels.transition_counts(clean, groups, [tr for tr, _ in columns])
+        if len(self.columns["AaPropPatterns"]) != 0:
+            # Patterns are searched in the sequence region including gap symbols
+            patterns = [_pattern(column) for column, _ in self.columns["AaPropPatterns"]]
+            counts[:, self.positions["AaPropPatterns"]] = kernels.pattern_counts(batch, patterns)
+        if len(self.columns["DPC"]) != 0:
+            counts[:, self.positions["DPC"]] = kernels.dipeptide_counts(clean, [dp for dp, _ in self.columns["DPC"]])
+        return counts, batch.lengths, clean.lengths
+
+    def denominators(self, lengths: np.ndarray, clean_lengths: np.ndarray) -> np.ndarray:
+        """
+            n x ´num_features´ matrix, the number each count is divided by: the number of residues (AAC, CTDC),
+            of pairs of adjacent residues (CTDT, DPC: may be -1 for empty sequences) and of possible pattern
+            positions (AaPropPatterns, computed on the sequence region including gap symbols).
+        """
+        distinct, columns = self.denominator_columns(lengths, clean_lengths)
+        return distinct[:, columns]
+
+    def denominator_columns(self, lengths: np.ndarray, clean_lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            The distinct denominators of ´denominators´ without repeating them for every feature: an n x k int32
+            matrix (k: 3 + number of distinct pattern lengths) and the column of this matrix of each feature.
+        """
+        pattern_lengths = sorted({len(_pattern(column)) for column, _ in self.columns["AaPropPatterns"]})
+        distinct = np.empty((len(lengths), 3 + len(pattern_lengths)), dtype=np.int32)
+        distinct[:, 0] = clean_lengths
+        distinct[:, 1] = np.maximum(clean_lengths - 1, 0)
+        distinct[:, 2] = clean_lengths - 1
+        for column, pattern_length in enumerate(pattern_lengths):
+            distinct[:, 3 + column] = lengths - pattern_length + 1
+        columns = np.zeros(self.num_features, dtype=np.int64)
+        columns[self.positions["CTDT"]] = 1
+        columns[self.positions["DPC"]] = 2
+        columns[self.positions["AaPropPatterns"]] = [3 + pattern_lengths.index(len(_pattern(column)))
+                                                     for column, _ in self.columns["AaPropPatterns"]]
+        return distinct, columns
+
+    def finalize(self, counts: np.ndarray, lengths: np.ndarray, clean_lengths: np.ndarray,
+                 dpc_state: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Compute the features from the counts of ´count_sequences´, see ´encode_sequences´.
+        """
+        features = np.zeros(counts.shape, dtype=np.float64)
+        denominators = self.denominators(lengths, clean_lengths)
+        for encoder in ("AAC", "CTDC", "CTDT", "AaPropPatterns"):
+            positions = self.positions[encoder]
+            if len(positions) != 0:
+                features[:, positions] = ratio_values(encoder, counts[:, positions], denominators[:, positions])
+        if len(self.positions["DPC"]) != 0:
+            values, dpc_state = kernels.dpc_recurrence(counts[:, self.positions["DPC"]], clean_lengths - 1, dpc_state)
+            features[:, self.positions["DPC"]] = values
+        return features, dpc_state
+
+    def encode_sequences(self, sequences: Union[List[str], SequenceRecords],
+                         dpc_state: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Encode protein sequences.
+
+            Args:
+                sequences (Union[List[str], SequenceRecords]): the protein sequences
+                dpc_state (np.ndarray): dipeptide compositions of the sequence preceding the
+                                        batch (see ´kernels.dpc_recurrence´), None for a new batch
+
+            Returns:
+                Tuple[np.ndarray, np.ndarray]: n x ´num_features´ features and the
+                dipeptide compositions of the last sequence (state for the next batch)
+        """
+        return self.finalize(*self.count_sequences(sequences), dpc_state=dpc_state)
+
+    def encode(self, fastas: Union[np.ndarray, SequenceRecords]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Encode protein sequences, drop-in replacement of ´encoders.encode.encode´.
+
+            Args:
+                fastas (Union[np.ndarray, SequenceRecords]): the protein identifiers and sequences
+
+            Returns:
+                Tuple[np.ndarray, np.ndarray]: containing the protein identifiers
+                and the encoded features of all input protein sequences
+        """
+        if isinstance(fastas, SequenceRecords):
+            return fastas.names, self.encode_sequences(fastas)[0]
+        features, _ = self.encode_sequences([sequence for _, sequence in fastas])
+        return np.array([name for name, _ in fastas]), features
+
+
+def compile_spec(spec: dict = None) -> CompiledEncoder:
+    """
+        Compile a feature specification (by default the 85 features of Effective T3).
+    """
+    return CompiledEncoder(DEFAULT_FEATURE_SPEC if spec is None else spec)
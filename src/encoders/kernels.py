@@ -0,0 +1,198 @@
+# --------------------------------------------------------------------
+# Original code copyright Nicolas Nemeth 2023
+# Covered by original MIT license
+# --------------------------------------------------------------------
+
+
+import numpy as np
+from typing import List, Tuple
+
+from ..sequtils.records import SequenceRecords
+
+# Residue codes: the 20 amino acids, the gap symbol '-' (non-standard residues
+# are replaced by '-' when reading fasta-files) and any other character
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+GAP = 20
+OTHER = 21
+NUM_CODES = 22
+
+RESIDUE_CODES = np.full(256, OTHER, dtype=np.uint8)
+for _code, _aa in enumerate(AMINO_ACIDS):
+    RESIDUE_CODES[ord(_aa)] = _code
+RESIDUE_CODES[ord('-')] = GAP
+
+
+def residue_mask(residues: str) -> np.ndarray:
+    """
+        Boolean lookup table over the residue codes, True for the given residues.
+        Residues other than the 20 amino acids and '-' never occur in sequences read by
+        ´sequtils.read_fasta´ and are therefore ignored.
+    """
+    mask = np.zeros(NUM_CODES, dtype=bool)
+    for aa in residues:
+        if aa in AMINO_ACIDS or aa == '-':
+            mask[RESIDUE_CODES[ord(aa)]] = True
+    return mask
+
+
+class SequenceBatch(object):
+    """
+        Protein sequences (regions) of a batch concatenated into one array of residue codes.
+
+        The encoders of the module remove the gap symbol '-' before computing most features,
+        ´clean´ is the same batch with the gap symbols removed.
+    """
+
+    def __init__(self, codes: np.ndarray, lengths: np.ndarray) -> None:
+        self.codes = codes
+        self.lengths = lengths
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64) \
+            if len(lengths) != 0 else np.zeros(0, dtype=np.int64)
+        # Row (sequence) index of each residue
+        self.rows = np.repeat(np.arange(len(lengths)), lengths)
+        self._clean = None
+
+    @classmethod
+    def from_sequences(cls, sequences: List[str]) -> 'SequenceBatch':
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        # One byte per character, non-ascii characters are replaced by '?'
+        buffer = "".join(sequences).encode("ascii", errors="replace")
+        return cls(RESIDUE_CODES[np.frombuffer(buffer, dtype=np.uint8)], lengths)
+
+    @classmethod
+    def from_records(cls, records: SequenceRecords) -> 'SequenceBatch':
+        # Residues are taken directly from the byte buffer of the records
+        return cls(RESIDUE_CODES[records.residues()], records.lengths.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def clean(self) -> 'SequenceBatch':
+        if self._clean is None:
+            keep = self.codes != GAP
+            self._clean = SequenceBatch(self.codes[keep],
+                                        np.bincount(self.rows[keep], minlength=len(self)).astype(np.int64))
+        return self._clean
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Codes (first * NUM_CODES + second) and row indices of all pairs of adjacent residues.
+        """
+        same_row = self.rows[:-1] == self.rows[1:]
+        pair_codes = self.codes[:-1].astype(np.int64) * NUM_CODES + self.codes[1:]
+        return pair_codes[same_row], self.rows[:-1][same_row]
+
+
+def residue_histogram(batch: SequenceBatch) -> np.ndarray:
+    """
+        n x NUM_CODES matrix, counts of each residue code in each sequence.
+    """
+    return np.bincount(batch.rows * NUM_CODES + batch.codes,
+                       minlength=len(batch) * NUM_CODES).reshape(len(batch), NUM_CODES)
+
+
+def group_counts(batch: SequenceBatch, groups: List[str]) -> np.ndarray:
+    """
+        n x len(groups) matrix, total number of residues of each group in each sequence.
+    """
+    members = np.array([residue_mask(group) for group in groups], dtype=np.int64).reshape(-1, NUM_CODES)
+    return residue_histogram(batch) @ members.T
+
+
+def dipeptide_counts(batch: SequenceBatch, dipeptides: List[str]) -> np.ndarray:
+    """
+        n x len(dipeptides) matrix, (overlapping) occurrences of each dipeptide in each sequence,
+        a dipeptide given several times fills each of its columns.
+    """
+    codes = np.array([int(RESIDUE_CODES[ord(dp[0])]) * NUM_CODES + int(RESIDUE_CODES[ord(dp[1])]) for dp in dipeptides],
+                     dtype=np.int64)
+    # Repeated dipeptides are counted once and copied to each of their columns
+    unique_codes, column_of_unique = np.unique(codes, return_inverse=True)
+    if len(unique_codes) == len(codes):
+        unique_codes, column_of_unique = codes, None
+    column_of_pair = np.full(NUM_CODES * NUM_CODES, -1, dtype=np.int64)
+    column_of_pair[unique_codes] = np.arange(len(unique_codes))
+    pair_codes, rows = batch.pairs()
+    columns = column_of_pair[pair_codes]
+    del pair_codes
+    selected = columns >= 0
+    counts = np.bincount(rows[selected] * len(unique_codes) + columns[selected],
+                         minlength=len(batch) * len(unique_codes)).reshape(len(batch), len(unique_codes))
+    return counts if column_of_unique is None else counts[:, column_of_unique.reshape(-1)]
+
+
+def transition_counts(batch: SequenceBatch, groups: Tuple[str, str, str], transitions: List[str]) -> np.ndarray:
+    """
+        n x len(transitions) matrix, number of adjacent residue pairs changing between
+        two of the three groups, transitions are given as 'Tr1221', 'Tr1331' or 'Tr2332'.
+    """
+    group_of_code = np.full(NUM_CODES, -1, dtype=np.int64)
+    # Reverse order, such that the first group containing a residue wins
+    for number in (2, 1, 0):
+        group_of_code[residue_mask(groups[number])] = number
+    transition_ids = {"Tr1221": (0, 1), "Tr1331": (0, 2), "Tr2332": (1, 2)}
+    column_of_pair = np.full((3, 3), -1, dtype=np.int64)
+    for column, transition in enumerate(transitions):
+        first, second = transition_ids[transition]
+        column_of_pair[first, second] = column_of_pair[second, first] = column
+    pair_codes, rows = batch.pairs()
+    first_group = group_of_code[pair_codes // NUM_CODES]
+    second_group = group_of_code[pair_codes % NUM_CODES]
+    valid = (first_group >= 0) & (second_group >= 0)
+    columns = np.full(len(pair_codes), -1, dtype=np.int64)
+    columns[valid] = column_of_pair[first_group[valid], second_group[valid]]
+    selected = columns >= 0
+    return np.bincount(rows[selected] * len(transitions) + columns[selected],
+                       minlength=len(batch) * len(transitions)).reshape(len(batch), len(transitions))
+
+
+def pattern_counts(batch: SequenceBatch, patterns: List[List[str]]) -> np.ndarray:
+    """
+        n x len(patterns) matrix, number of positions at which each pattern (a list of
+        residue groups, one group per position) matches each sequence.
+    """
+    counts = np.zeros((len(batch), len(patterns)), dtype=np.int64)
+    positions = np.arange(len(batch.codes)) - batch.offsets[batch.rows] if len(batch) != 0 else np.zeros(0)
+    for column, pattern in enumerate(patterns):
+        num_starts = len(batch.codes) - len(pattern) + 1
+        if num_starts <= 0:
+            continue
+        match = np.ones(num_starts, dtype=bool)
+        for shift, group in enumerate(pattern):
+            match &= residue_mask(group)[batch.codes[shift:shift + num_starts]]
+        # The pattern must not reach into the next sequence
+        match &= positions[:num_starts] <= batch.lengths[batch.rows[:num_starts]] - len(pattern)
+        counts[:, column] = np.bincount(batch.rows[:num_starts][match], minlength=len(batch))
+    return counts
+
+
+def dpc_recurrence(counts: np.ndarray, denominators: np.ndarray,
+                   state: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Dipeptide compositions exactly as computed by ´encoders.dpc.DPC´: the composition of
+        a sequence is not reset between sequences, i.e. the composition of the previous
+        sequence is incremented by one for each dipeptide occurrence and then divided
+        by the number of dipeptides of the sequence (if it is not 0).
+
+        Args:
+            counts (np.ndarray): n x k matrix of dipeptide occurrences
+            denominators (np.ndarray): number of dipeptides (sequence length - 1) of each sequence
+            state (np.ndarray): composition of the sequence preceding the batch (zeros if None)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: n x k compositions and the composition
+            of the last sequence, which is the state for the next batch
+    """
+    values = np.empty(counts.shape, dtype=np.float64)
+    state = np.zeros(counts.shape[1], dtype=np.float64) if state is None else np.array(state, dtype=np.float64)
+    max_counts = counts.max(axis=1) if counts.shape[1] != 0 else np.zeros(len(counts), dtype=np.int64)
+    for idx in range(len(counts)):
+        # Increment one occurrence at a time, the rounding of the original
+        # implementation differs from adding the count at once
+        for occurrence in range(1, max_counts[idx]+1):
+            state[counts[idx] >= occurrence] += 1
+        if denominators[idx] != 0:
+            state /= denominators[idx]
+        values[idx] = state
+    return values, state
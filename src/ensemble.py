@@ -0,0 +1,156 @@
+import os
+import json
+import pickle
+import numpy as np
+from typing import Tuple, List, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import compile_spec, load_feature_spec, full_spec, column_keys, DEFAULT_FEATURE_SPEC
+from .metrics import DECISION_THRESHOLD
+
+
+# Default ensemble: the six models of the feature selection (full feature space)
+# and both models of the feature selected model container
+ENSEMBLE_FILE: str = os.path.join("src", "model", "ensemble.json")
+AGGREGATIONS = ("mean", "vote")
+
+
+def member_names(file_path: str = ENSEMBLE_FILE) -> List[str]:
+    """
+        Names of the members of an ensemble file, without loading the models.
+    """
+    with open(file_path, 'r') as ifile:
+        config = json.load(ifile)
+    return [member.get("name", os.path.splitext(os.path.basename(member["model"]))[0])
+            for member in config["members"]]
+
+
+class Ensemble(object):
+    """
+        Scores protein sequences under several models at once.
+
+        The features of all members are merged into one feature specification per sequence range,
+        such that each batch is encoded once. Every member then scores its columns of the shared
+        feature matrix.
+    """
+
+    def __init__(self, names: List[str], models: List[object], feature_specs: List[dict],
+                 aggregation: str = "mean") -> None:
+        """
+            Creates new instance.
+
+            Args:
+                names (List[str]): name of each member
+                models (List[object]): the trained classifiers (with ´predict_proba´)
+                feature_specs (List[dict]): feature specification of each member
+                aggregation (str): 'mean' -> mean probability of the members,
+                                   'vote' -> fraction of members predicting the positive class
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', choose one of: " + ", ".join(AGGREGATIONS))
+        self.names = names
+        self.models = models
+        self.aggregation = aggregation
+        # sequence range -> [union of the columns (key -> (encoder, column)), indices of the members]
+        encodings = dict()
+        self.columns = list()
+        for spec in feature_specs:
+            seq_range = tuple(spec["seq_range"]) if spec.get("seq_range") is not None else None
+            union, members = encodings.setdefault(seq_range, [dict(), list()])
+            group_columns = [(group["encoder"], column) for group in spec["groups"] for column in group["columns"]]
+            for key, column in zip(column_keys(spec), group_columns):
+                union.setdefault(key, column)
+            members.append(len(self.columns))
+            position = {key: idx for idx, key in enumerate(union)}
+            self.columns.append([position[key] for key in column_keys(spec)])
+        # One encoder per sequence range computing the union of the columns of its members
+        self.encoders = list()
+        for seq_range, (union, members) in encodings.items():
+            groups = list()
+            for encoder, column in union.values():
+                if len(groups) == 0 or groups[-1]["encoder"] != encoder:
+                    groups.append({"encoder": encoder, "columns": list()})
+                groups[-1]["columns"].append(column)
+            spec = {"seq_range": list(seq_range) if seq_range is not None else None, "groups": groups}
+            self.encoders.append((compile_spec(spec), members))
+
+    @classmethod
+    def load(cls, file_path: str = ENSEMBLE_FILE, aggregation: str = None) -> 'Ensemble':
+        """
+            Load an ensemble from a json-file of the form
+
+            {
+                "aggregation": "mean",
+                "seq_range": [1, 26],
+                "members": [
+                    {"name": "model_d1", "model": "path/model_d1.bin", "feature_spec": "full"},
+                    {"name": "model", "model": "src/model/model.bin", "feature_spec": "src/model/feature_spec.json"}
+                ]
+            }
+
+            "feature_spec" is the path of a feature specification, "full" for all 513 features
+            (´encoders.encode.FULL_FEATURE_NAMES´) or null for the 85 features of Effective T3.
+            "seq_range" is the sequence range of the members using "full" or null.
+
+            Args:
+                file_path (str): path of the json-file
+                aggregation (str): overrides the aggregation of the file
+
+            Returns:
+                Ensemble: the loaded ensemble
+        """
+        with open(file_path, 'r') as ifile:
+            config = json.load(ifile)
+        seq_range = config.get("seq_range", DEFAULT_FEATURE_SPEC["seq_range"])
+        names, models, feature_specs = member_names(file_path), list(), list()
+        for member in config["members"]:
+            with open(member["model"], 'rb') as ifile:
+                models.append(pickle.load(ifile))
+            if member.get("feature_spec") == "full":
+                feature_specs.append(full_spec(seq_range))
+            elif member.get("feature_spec") is not None:
+                feature_specs.append(load_feature_spec(member["feature_spec"]))
+            else:
+                feature_specs.append(dict(DEFAULT_FEATURE_SPEC, seq_range=seq_range))
+        return cls(names, models, feature_specs,
+                   aggregation=aggregation if aggregation is not None else config.get("aggregation", "mean"))
+
+    def predict_proba(self, fastas: Union[np.ndarray, SequenceRecords]) -> np.ndarray:
+        """
+            Probability of the positive class (secreted) under each member.
+
+            Args:
+                fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+
+            Returns:
+                np.ndarray: n x number of members matrix of probabilities
+        """
+        return self.score([encoder.encode(fastas)[1] for encoder, _ in self.encoders])
+
+    def score(self, features: List[np.ndarray]) -> np.ndarray:
+        """
+            Probability of the positive class under each member from the features of each
+            encoder of ´self.encoders´ (n x number of members matrix).
+        """
+        probas = np.empty((len(features[0]) if len(features) else 0, len(self.models)), dtype=np.float64)
+        for (encoder, members), encoder_features in zip(self.encoders, features):
+            for member in members:
+                probas[:, member] = self.models[member].predict_proba(encoder_features[:, self.columns[member]])[:, 1]
+        return probas
+
+    def aggregate(self, probas: np.ndarray) -> np.ndarray:
+        """
+            Aggregate the probabilities of the members ('mean' or 'vote', see constructor).
+        """
+        if self.aggregation == "vote":
+            return (probas >= DECISION_THRESHOLD).mean(axis=1)
+        return probas.mean(axis=1)
+
+    def predict(self, fastas: Union[np.ndarray, SequenceRecords]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Returns:
+                Tuple[np.ndarray, np.ndarray]: probabilities of each member (n x number of members)
+                and the aggregated probabilities (n)
+        """
+        probas = self.predict_proba(fastas)
+        return probas, self.aggregate(probas)
@@ -0,0 +1,226 @@
+import math
+import time
+import numpy as np
+from functools import partial
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+from .telemetry import Telemetry
+
+
+BACKENDS = ("serial", "thread", "process")
+# Chunks of ´encode_parallel´ are not made smaller than this, each process gets about ENCODE_CHUNKS_PER_WORKER chunks
+MIN_ENCODE_CHUNK_SIZE: int = 1000
+ENCODE_CHUNKS_PER_WORKER: int = 4
+
+# Encoders of the processes of the pool, set once per process by ´init_worker´
+_encoders: List[CompiledEncoder] = None
+
+
+def init_worker(encoders: List[CompiledEncoder]) -> None:
+    global _encoders
+    _encoders = encoders
+
+
+def count_chunk(chunk: SequenceRecords, encoders: List[CompiledEncoder] = None) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+        Counts of a chunk of protein sequences under each encoder (see ´CompiledEncoder.count_sequences´).
+    """
+    return [encoder.count_sequences(chunk) for encoder in (encoders if encoders is not None else _encoders)]
+
+
+def timed(worker: Callable, item) -> Tuple[object, float]:
+    """
+        Result of ´worker´ for the item and the seconds it took.
+    """
+    start = time.perf_counter()
+    return worker(item), time.perf_counter() - start
+
+
+def chunk_bounds(num_sequences: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+        Start and end of each chunk, a single empty chunk if there are no sequences.
+    """
+    if num_sequences == 0:
+        return [(0, 0)]
+    chunk_size = max(int(chunk_size), 1)
+    return [(start, min(start + chunk_size, num_sequences)) for start in range(0, num_sequences, chunk_size)]
+
+
+def nonempty(chunks: Iterator[SequenceRecords]) -> Iterator[SequenceRecords]:
+    """
+        The chunks of an iterator, a single empty chunk if there are none.
+    """
+    empty = True
+    for chunk in chunks:
+        empty = False
+        yield chunk
+    if empty:
+        yield SequenceRecords.from_pairs([])
+
+
+def ordered_results(executor: Executor, worker: Callable, items: Iterable, max_pending: int,
+                    telemetry: Telemetry = None, stage: str = None) -> Iterator:
+    """
+        Results of ´worker´ for each item in the order of the items, at most ´max_pending´
+        items are submitted to the executor ahead of the result consumed. The number of
+        pending items is reported as the queue depth of ´stage´ if telemetry is given.
+        Items not started yet are cancelled when the generator is closed early.
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(worker, item))
+            if telemetry is not None:
+                telemetry.set_queue_depth(stage, len(pending))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while len(pending) != 0:
+            if telemetry is not None:
+                telemetry.set_queue_depth(stage, len(pending))
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+    if telemetry is not None:
+        telemetry.set_queue_depth(stage, 0)
+
+
+def make_pool(backend: str, num_workers: int, encoders: List[CompiledEncoder]) -> Executor:
+    """
+        Pool of ´num_workers´ threads or processes for ´execute´, the processes are given the encoders once.
+    """
+    if backend == "thread":
+        return ThreadPoolExecutor(num_workers)
+    return ProcessPoolExecutor(num_workers, initializer=init_worker, initargs=(encoders,))
+
+
+def execute(fastas: Union[np.ndarray, SequenceRecords, Iterator[SequenceRecords]], encoders: List[CompiledEncoder],
+            score: Callable[[List[np.ndarray]], np.ndarray], backend: str = "serial",
+            num_workers: int = 1, chunk_size: int = None, finalizers: List[Callable] = None,
+            telemetry: Telemetry = None, executor: Executor = None) -> np.ndarray:
+    """
+        Encode and score protein sequences in chunks.
+
+        The counts of each chunk (see ´CompiledEncoder.count_sequences´) are computed by ´num_workers´
+        threads or processes. The features of the chunks are completed in the order of the chunks while
+        the workers count the next ones, the dipeptide compositions are carried from chunk to chunk
+        (see ´kernels.dpc_recurrence´). Hence the results do not depend on the backend, the number of
+        workers or the chunk size, they equal those of encoding all sequences at once.
+
+        The process backend scores the chunks in the main process. The thread backend also scores the
+        chunks on the pool, with the model shared by all threads: the counting kernels (numpy) and the
+        tree evaluation of LightGBM release the GIL, and no process has to be started or sent the model.
+
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords, Iterator[SequenceRecords]]): the protein sequences or an iterator
+                                                                                 over chunks of them (e.g. streamed
+                                                                                 by ´read_fasta.read_batches´)
+            encoders (List[CompiledEncoder]): encoders computing the features
+            score (Callable[[List[np.ndarray]], np.ndarray]): computes the results of a chunk
+                                                             from its features under each encoder
+            backend (str): 'serial', 'thread' or 'process'
+            num_workers (int): number of threads or processes
+            chunk_size (int): number of sequences per chunk, all sequences at once if None (ignored for an iterator)
+            finalizers (List[Callable]): complete the features of each encoder from the counts of a chunk and
+                                         the dipeptide compositions of the previous chunk, the encoders'
+                                         ´finalize´ if None (e.g. ´QuantizedModel.quantize_counts´)
+            telemetry (Telemetry): if set, the busy time of the stages, the queue depths and the number
+                                   of scored sequences are reported
+            executor (Executor): warm pool of the backend kept by the caller (see ´make_pool´), e.g. by a
+                                 daemon scoring many files, it is not shut down. A pool is started and shut
+                                 down for this call if None
+
+        Returns:
+            np.ndarray: the results of all chunks concatenated in the order of the sequences
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose one of: " + ", ".join(BACKENDS))
+    if isinstance(fastas, (np.ndarray, list, tuple)):
+        fastas = SequenceRecords.from_pairs(fastas)
+    if isinstance(fastas, SequenceRecords):
+        chunks = (fastas[start:end] for start, end in chunk_bounds(len(fastas), chunk_size or len(fastas)))
+    else:
+        chunks = nonempty(fastas)
+    shutdown = executor is None
+    if backend == "serial" or num_workers <= 1:
+        num_workers, executor = 1, None
+        counts = (timed(partial(count_chunk, encoders=encoders), chunk) for chunk in chunks)
+    else:
+        executor = make_pool(backend, num_workers, encoders) if executor is None else executor
+        # Processes count with the encoders they were started with (see ´init_worker´)
+        worker = partial(count_chunk, encoders=encoders) if backend == "thread" else count_chunk
+        counts = ordered_results(executor, partial(timed, worker), chunks, 2*num_workers, telemetry, "count")
+    if finalizers is None:
+        finalizers = [encoder.finalize for encoder in encoders]
+    score_on_pool = isinstance(executor, ThreadPoolExecutor)
+
+    def collect(result: np.ndarray, seconds: float) -> None:
+        results.append(result)
+        if telemetry is not None:
+            telemetry.record_busy("score", seconds, num_workers if score_on_pool else 1)
+            telemetry.advance(len(result))
+
+    results, pending = list(), deque()
+    try:
+        dpc_states = [None] * len(encoders)
+        for chunk_counts, seconds in counts:
+            start = time.perf_counter()
+            features = list()
+            for idx, (finalize, (encoder_counts, lengths, clean_lengths)) in enumerate(zip(finalizers, chunk_counts)):
+                encoder_features, dpc_states[idx] = finalize(encoder_counts, lengths, clean_lengths, dpc_states[idx])
+                features.append(encoder_features)
+            if telemetry is not None:
+                telemetry.record_busy("count", seconds, num_workers)
+                telemetry.record_busy("finalize", time.perf_counter() - start)
+            if not score_on_pool:
+                collect(*timed(score, features))
+                continue
+            pending.append(executor.submit(timed, score, features))
+            # Bound the number of completed feature matrices waiting to be scored
+            while len(pending) > 2*num_workers:
+                collect(*pending.popleft().result())
+            if telemetry is not None:
+                telemetry.set_queue_depth("score", len(pending))
+        while len(pending) != 0:
+            collect(*pending.popleft().result())
+            if telemetry is not None:
+                telemetry.set_queue_depth("score", len(pending))
+    finally:
+        # Cancel the chunks not started yet, e.g. after a failed chunk
+        if executor is not None:
+            counts.close()
+            for future in pending:
+                future.cancel()
+        if executor is not None and shutdown:
+            executor.shutdown()
+    return np.concatenate(results)
+
+
+def encode_parallel(fastas: Union[np.ndarray, SequenceRecords], encoder: CompiledEncoder, num_cores: int = 1,
+                    chunk_size: int = None, telemetry: Telemetry = None) -> np.ndarray:
+    """
+        Features of protein sequences counted in chunks on a pool of processes and completed in the order of
+        the chunks (see ´execute´), e.g. of training sets. The features equal those of ´CompiledEncoder.encode´.
+
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            encoder (CompiledEncoder): encoder computing the features
+            num_cores (int): maximal number of processes, fewer if there are less than MIN_ENCODE_CHUNK_SIZE
+                             sequences per process, serial encoding if 1
+            chunk_size (int): number of sequences per chunk, about ENCODE_CHUNKS_PER_WORKER chunks per process if None
+            telemetry (Telemetry): if set, advanced by the number of encoded sequences
+
+        Returns:
+            np.ndarray: n x ´num_features´ features
+    """
+    if not isinstance(fastas, SequenceRecords):
+        fastas = SequenceRecords.from_pairs(fastas)
+    num_workers = max(1, min(int(num_cores), math.ceil(len(fastas) / MIN_ENCODE_CHUNK_SIZE)))
+    if chunk_size is None:
+        chunk_size = max(MIN_ENCODE_CHUNK_SIZE, math.ceil(len(fastas) / (num_workers * ENCODE_CHUNKS_PER_WORKER)))
+    return execute(fastas, [encoder], lambda features: features[0], "process" if num_workers > 1 else "serial",
+                   num_workers, chunk_size, telemetry=telemetry)
@@ -0,0 +1,95 @@
+import os
+import json
+import numpy as np
+from typing import List, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+
+
+# Number of protein sequences encoded and explained at once
+EXPLAIN_BATCH_SIZE: int = 10000
+
+
+class ContributionWriter(object):
+    """
+        Streams feature contributions into a columnar, memory-mappable .npy-file.
+
+        The file holds a (number of features + 1) x (number of sequences) float32 matrix, i.e.
+        the contributions of one feature to all sequences are contiguous. The last row contains
+        the expected value (bias) of the model. The contributions are in log-odds space, the sum
+        of a column is the raw score of the sequence (sigmoid of it -> probability).
+        A json-file next to it contains the feature names and the sequence identifiers.
+    """
+
+    def __init__(self, ofile_path: str, feature_names: List[str], num_sequences: int) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                ofile_path (str): path of the output file of the prediction, the contributions
+                                  are saved to '{ofile_path without extension}_contributions.npy'
+                feature_names (List[str]): names of the features of the model
+                num_sequences (int): total number of sequences that will be written
+        """
+        file_path = os.path.splitext(ofile_path)[0]
+        self.npy_path = file_path + "_contributions.npy"
+        self.json_path = file_path + "_contributions.json"
+        self.feature_names = list(feature_names)
+        self.contributions = np.lib.format.open_memmap(self.npy_path, mode='w+', dtype=np.float32,
+                                                       shape=(len(feature_names) + 1, num_sequences))
+        self.identifiers = list()
+        self.position = 0
+
+    def write(self, identifiers: List[str], contributions: np.ndarray) -> None:
+        """
+            Append the contributions (sequences x (features + 1)) of a batch.
+        """
+        end = self.position + len(contributions)
+        self.contributions[:, self.position:end] = contributions.T
+        self.identifiers += [str(identifier) for identifier in identifiers]
+        self.position = end
+
+    def close(self) -> None:
+        self.contributions.flush()
+        del self.contributions
+        with open(self.json_path, 'w') as ofile:
+            json.dump({"contributions_file": os.path.basename(self.npy_path),
+                       "layout": "features x sequences, last row: expected value (bias)",
+                       "space": "log-odds",
+                       "feature_names": self.feature_names + ["bias"],
+                       "identifiers": self.identifiers}, ofile)
+
+
+def explain(fastas: Union[np.ndarray, SequenceRecords], encoder: CompiledEncoder, model: object,
+            ofile_path: str, batch_size: int = EXPLAIN_BATCH_SIZE) -> np.ndarray:
+    """
+        Computes the prediction probability and the contribution of each feature to the
+        prediction of each protein sequence (TreeSHAP as computed natively by LightGBM, ´pred_contrib´).
+        The sequences are processed in batches, the contributions of each batch are
+        written to the output right away (see ´ContributionWriter´).
+
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            encoder (CompiledEncoder): encoder computing the features of the model
+            model (object): the trained LGBMClassifier
+            ofile_path (str): path of the output file of the prediction
+            batch_size (int): number of sequences per batch
+
+        Returns:
+            np.ndarray: n x 1 probabilities of the positive label, i.e. secreted protein
+    """
+    if not isinstance(fastas, SequenceRecords):
+        fastas = SequenceRecords.from_pairs(fastas)
+    writer = ContributionWriter(ofile_path, encoder.feature_names, len(fastas))
+    probas = np.empty((len(fastas), 1), dtype=np.float64)
+    # Dipeptide compositions are carried from batch to batch (see ´kernels.dpc_recurrence´),
+    # such that the features equal those of encoding all sequences at once
+    dpc_state = None
+    for start in range(0, len(fastas), batch_size):
+        batch = fastas[start:start+batch_size]
+        features, dpc_state = encoder.encode_sequences(batch, dpc_state)
+        probas[start:start+len(batch), 0] = model.predict_proba(features)[:, 1]
+        writer.write(batch.names, model.predict(features, pred_contrib=True))
+    writer.close()
+    return probas
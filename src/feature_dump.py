@@ -0,0 +1,112 @@
+import os
+import json
+import numpy as np
+from typing import List, Tuple, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+from .quantized import QuantizedModel
+
+
+# Number of protein sequences per chunk of the dump
+FEATURE_DUMP_BATCH_SIZE: int = 100000
+INDEX_FILE: str = "index.json"
+
+
+class FeatureDumpWriter(object):
+    """
+        Writes identifiers, features and probabilities in columnar chunks to a directory.
+
+        Each chunk consists of one uncompressed .npy-file per column: 'identifiers_{chunk}.npy'
+        (unicode), 'features_{chunk}.npy' (rows x features, float64) and 'probabilities_{chunk}.npy'
+        (float64), which can be loaded memory-mapped (np.load(..., mmap_mode='r')). 'index.json' lists the
+        chunks, their numbers of rows and the feature names, it is rewritten after each chunk, such that
+        the chunks written so far can be read while the sequences are still being processed.
+    """
+
+    def __init__(self, directory: str, feature_names: List[str]) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                directory (str): output directory (created if missing)
+                feature_names (List[str]): names of the features
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index = {"feature_names": list(feature_names), "num_rows": 0, "chunks": list()}
+
+    def write(self, identifiers: List[str], features: np.ndarray, probabilities: np.ndarray) -> None:
+        """
+            Write the next chunk.
+        """
+        chunk = len(self.index["chunks"])
+        files = {column: f"{column}_{chunk:05d}.npy" for column in ("identifiers", "features", "probabilities")}
+        np.save(os.path.join(self.directory, files["identifiers"]), np.asarray(identifiers, dtype=str))
+        np.save(os.path.join(self.directory, files["features"]), np.ascontiguousarray(features, dtype=np.float64))
+        np.save(os.path.join(self.directory, files["probabilities"]), np.asarray(probabilities, dtype=np.float64))
+        self.index["chunks"].append(dict(files, num_rows=len(features)))
+        self.index["num_rows"] += len(features)
+        # Replace the index atomically, readers never see a partially written index
+        with open(os.path.join(self.directory, INDEX_FILE + ".tmp"), 'w') as ofile:
+            json.dump(self.index, ofile, indent=4)
+        os.replace(os.path.join(self.directory, INDEX_FILE + ".tmp"), os.path.join(self.directory, INDEX_FILE))
+
+
+def dump_features(fastas: Union[np.ndarray, SequenceRecords], encoder: CompiledEncoder, model: object,
+                  directory: str, quantized: bool = False, batch_size: int = FEATURE_DUMP_BATCH_SIZE) -> np.ndarray:
+    """
+        Computes the prediction probabilities of protein sequences in batches and writes the
+        identifiers, features and probabilities of each batch to the dump (see ´FeatureDumpWriter´).
+
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            encoder (CompiledEncoder): encoder computing the features of the model
+            model (object): the trained LGBMClassifier
+            directory (str): output directory of the dump
+            quantized (bool): whether to score on quantized features (see ´quantized.QuantizedModel´)
+            batch_size (int): number of sequences per batch, i.e. per chunk
+
+        Returns:
+            np.ndarray: n x 1 probabilities of the positive label, i.e. secreted protein
+    """
+    if not isinstance(fastas, SequenceRecords):
+        fastas = SequenceRecords.from_pairs(fastas)
+    writer = FeatureDumpWriter(directory, encoder.feature_names)
+    scorer = QuantizedModel(model, encoder) if quantized else None
+    probas = np.empty((len(fastas), 1), dtype=np.float64)
+    # Dipeptide compositions are carried from batch to batch (see ´kernels.dpc_recurrence´)
+    dpc_state = None
+    for start in range(0, len(fastas), batch_size):
+        batch = fastas[start:start+batch_size]
+        features, dpc_state = encoder.encode_sequences(batch, dpc_state)
+        if scorer is not None:
+            batch_probas = scorer.probabilities(scorer.quantize_features(features))[:, 1]
+        else:
+            batch_probas = model.predict_proba(features)[:, 1]
+        writer.write(batch.names, features, batch_probas)
+        probas[start:start+len(batch), 0] = batch_probas
+    return probas
+
+
+def load_feature_dump(directory: str, mmap_mode: str = 'r') -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """
+        Load a dump written by ´dump_features´.
+
+        Args:
+            directory (str): directory of the dump
+            mmap_mode (str): memory-map mode of the .npy-files (see np.load), None to read them into memory
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]: identifiers, features, probabilities and
+            feature names. A dump of a single chunk is returned memory-mapped, several chunks are concatenated.
+    """
+    with open(os.path.join(directory, INDEX_FILE), 'r') as ifile:
+        index = json.load(ifile)
+    columns = list()
+    for column in ("identifiers", "features", "probabilities"):
+        chunks = [np.load(os.path.join(directory, chunk[column]), mmap_mode=mmap_mode) for chunk in index["chunks"]]
+        if len(chunks) == 0:
+            chunks = [np.zeros((0, len(index["feature_names"])) if column == "features" else 0)]
+        columns.append(chunks[0] if len(chunks) == 1 else np.concatenate(chunks))
+    return columns[0], columns[1], columns[2], index["feature_names"]
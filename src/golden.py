@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+
+from .sequtils.read_fasta import read_records
+from .sequtils.records import SequenceRecords
+from .encoders.encode import encode, FEATURE_NAMES, AMINO_ACIDS
+from .encoders.feature_spec import CompiledEncoder
+from .execution import execute
+from .quantized import QuantizedModel, SIGMOID_MAX_ULP
+from .cascade import CascadeModel
+from .metrics import DECISION_THRESHOLD
+from .manifest import model_fingerprint
+from .__init__ import __version__
+
+"""
+    Golden outputs: the features of ´encoders.encode.encode´ (the original implementation, including its
+    quirks: ´DPC´ carries the dipeptide compositions from one sequence to the next, ´AaPropPatterns´ is given
+    the string POLAR, i.e. the motif NQST, as single pattern) and the probabilities of the model for the
+    bundled fasta-files and fuzzed sequences are frozen once. Every backend computing the features or the
+    probabilities (compiled kernels, chunked and parallel execution, quantized scoring, ...) is compared
+    against them bit by bit (distance in units in the last place) and timed against the reference. Backends
+    computing only the labels (cascade scoring) are compared against the labels of the golden probabilities.
+"""
+
+GOLDEN_FOLDER = os.path.join("protein_sequences", "golden_outputs")
+INDEX_FILE = "index.json"
+BUNDLED_SETS = [
+    os.path.join("protein_sequences", "test_data", "t3se_positive_negative.fasta"),
+    os.path.join("protein_sequences", "test_data", "t3se_positive_test.fasta"),
+    os.path.join("protein_sequences", "test_data", "t3se_negative_test.fasta"),
+    os.path.join("protein_sequences", "training_data", "t3se_positive.fasta"),
+    os.path.join("protein_sequences", "training_data", "t3se_negative.fasta"),
+    os.path.join("protein_sequences", "unprocessed_sequences", "t3se_all_positives.fasta"),
+    os.path.join("protein_sequences", "unprocessed_sequences", "t3se_all_negatives.fasta"),
+]
+# Fuzzed sequences are written to this fasta-file of the golden folder
+FUZZ_FILE = "fuzzed.fasta"
+FUZZ_SIZE: int = 2000
+# Chunk size of the chunked backends, odd such that the chunk boundaries fall anywhere
+GOLDEN_CHUNK_SIZE: int = 97
+# Characters of fuzzed sequences besides the 20 amino acids: gaps, non-standard residues,
+# stop codons and lowercase letters (replaced or converted when reading the fasta-file)
+FUZZ_EXTRA_CHARACTERS = "-XBZUOJ*" + AMINO_ACIDS.lower()
+
+
+def fuzz_sequences(num_sequences: int, seed: int, encoder: CompiledEncoder) -> List[Tuple[str, str]]:
+    """
+        Random protein sequences exercising the edge cases of the encoders: lengths around the borders
+        of the sequence region, gaps, non-standard residues, lowercase letters and repeats of the POLAR
+        motif (NQST). Every sequence region contains at least one amino acid, ´encoders.encode.encode´
+        divides by zero otherwise.
+    """
+    rng = np.random.default_rng(seed)
+    characters = np.array(list(AMINO_ACIDS + FUZZ_EXTRA_CHARACTERS))
+    weights = np.where(np.arange(len(characters)) < len(AMINO_ACIDS), 1.0, 0.25)
+    weights /= weights.sum()
+    start, end = encoder.seq_range if encoder.seq_range is not None else (0, 0)
+    borders = sorted({max(length, 1) for border in (start, end) for length in range(border - 2, border + 3)})
+    records = list()
+    while len(records) < num_sequences:
+        kind = rng.random()
+        if kind < 0.3:
+            length = int(rng.choice(borders))
+        elif kind < 0.7:
+            length = int(rng.integers(1, 2 * max(end, 30)))
+        else:
+            length = int(rng.integers(1, 1000))
+        if rng.random() < 0.1:
+            sequence = ("NQST" * (length // 4 + 1))[:length]
+        else:
+            sequence = "".join(rng.choice(characters, size=length, p=weights))
+        window = encoder.windows([sequence.upper()])[0]
+        if any(aa in AMINO_ACIDS for aa in window):
+            records.append((f"fuzz_{len(records)}", sequence))
+    return records
+
+
+def ulp_distance(reference: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+        Number of representable float64 values between each pair of values (0: identical bits,
+        +0.0 and -0.0 and two NaNs are equal, NaN and a number are maximally distant).
+    """
+    reference = np.ascontiguousarray(reference, dtype=np.float64)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+
+    def ordered(x: np.ndarray) -> np.ndarray:
+        # Map the bits to integers in the order of the floats
+        bits = x.view(np.int64)
+        return np.where(bits < 0, np.iinfo(np.int64).min - bits, bits)
+
+    a, b = ordered(reference), ordered(values)
+    # Unsigned difference, the signed one may overflow
+    distance = np.where(a >= b, a.view(np.uint64) - b.view(np.uint64), b.view(np.uint64) - a.view(np.uint64))
+    nan_reference, nan_values = np.isnan(reference), np.isnan(values)
+    distance[nan_reference & nan_values] = 0
+    distance[nan_reference != nan_values] = np.iinfo(np.uint64).max
+    return distance
+
+
+def compare(reference: np.ndarray, values: np.ndarray, max_ulp: int = 0) -> dict:
+    """
+        Maximal distance in units in the last place, number of values farther than ´max_ulp´
+        and position of the first of them.
+    """
+    values = np.asarray(values)
+    if values.shape != reference.shape:
+        return {"equal": False, "max_ulp": None, "mismatches": None,
+                "first_mismatch": f"shape {values.shape} instead of {reference.shape}"}
+    distance = ulp_distance(reference, values)
+    mismatches = np.argwhere(distance > max_ulp)
+    return {
+        "equal": len(mismatches) == 0,
+        "max_ulp": int(distance.max()) if distance.size != 0 else 0,
+        "mismatches": len(mismatches),
+        "first_mismatch": [int(idx) for idx in mismatches[0]] if len(mismatches) != 0 else None,
+    }
+
+
+# Backends computing the n x ´num_features´ features of protein sequences
+def reference_features(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return encode(records, encoder.seq_range)[1]
+
+
+def compiled_features(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return encoder.encode_sequences(records)[0]
+
+
+def chunked_features(backend: str, num_workers: int) -> Callable:
+    def features(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+        return execute(records, [encoder], lambda features: features[0], backend, num_workers, GOLDEN_CHUNK_SIZE)
+    return features
+
+
+# Backends computing the probabilities of the positive label of protein sequences
+def reference_probabilities(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return model.predict_proba(reference_features(records, encoder, model))[:, 1]
+
+
+def lightgbm_probabilities(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return model.predict_proba(encoder.encode_sequences(records)[0])[:, 1]
+
+
+def quantized_probabilities(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return QuantizedModel(model, encoder).predict_proba(records)[:, 1]
+
+
+FEATURE_BACKENDS: Dict[str, Callable] = {
+    "reference": reference_features,
+    "compiled": compiled_features,
+    "chunked": chunked_features("serial", 1),
+    "thread": chunked_features("thread", 2),
+    "process": chunked_features("process", 2),
+}
+SCORE_BACKENDS: Dict[str, Callable] = {
+    "reference": reference_probabilities,
+    "lightgbm": lightgbm_probabilities,
+    "quantized": quantized_probabilities,
+}
+# Distance in units in the last place a backend may keep from the golden outputs at least
+BACKEND_MAX_ULP: Dict[str, int] = {
+    # Identical scores, the sigmoid is vectorized with np.exp (see ´quantized.SIGMOID_MAX_ULP´)
+    "quantized": SIGMOID_MAX_ULP,
+}
+
+
+# Backends computing the labels (1.0: positive, 0.0: negative) of protein sequences
+def reference_labels(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return (reference_probabilities(records, encoder, model) >= DECISION_THRESHOLD).astype(np.float64)
+
+
+def cascade_labels(records: SequenceRecords, encoder: CompiledEncoder, model: object) -> np.ndarray:
+    return (CascadeModel(model, encoder).predict_proba(records)[:, 1] >= DECISION_THRESHOLD).astype(np.float64)
+
+
+LABEL_BACKENDS: Dict[str, Callable] = {
+    "reference": reference_labels,
+    "cascade": cascade_labels,
+}
+
+
+def file_hash(file: str) -> str:
+    with open(file, 'rb') as ifile:
+        return hashlib.sha256(ifile.read()).hexdigest()
+
+
+def dataset_name(fasta_file: str) -> str:
+    return os.path.splitext(os.path.basename(fasta_file))[0]
+
+
+def freeze(encoder: CompiledEncoder, model: object, fasta_files: List[str] = None,
+           golden_folder: str = GOLDEN_FOLDER, num_fuzz: int = FUZZ_SIZE, seed: int = 0) -> dict:
+    """
+        Compute the reference features (´encoders.encode.encode´) and probabilities (´predict_proba´
+        of the model on them) of each fasta-file and of ´num_fuzz´ fuzzed sequences (see ´fuzz_sequences´,
+        saved to FUZZ_FILE) and save them to '{golden_folder}/{name}.npz' (identifiers, features,
+        probabilities), the index of the datasets is saved to INDEX_FILE.
+
+        Args:
+            encoder (CompiledEncoder): encoder of the model, its sequence range and feature names are used
+            model (object): the trained LGBMClassifier
+            fasta_files (List[str]): the fasta-files, BUNDLED_SETS if None
+            golden_folder (str): folder the golden outputs are saved to
+            num_fuzz (int): number of fuzzed sequences, none if 0
+            seed (int): seed of the fuzzed sequences
+
+        Returns:
+            dict: the index
+    """
+    os.makedirs(golden_folder, exist_ok=True)
+    fasta_files = list(BUNDLED_SETS if fasta_files is None else fasta_files)
+    if num_fuzz > 0:
+        with open(os.path.join(golden_folder, FUZZ_FILE), 'w') as ofile:
+            ofile.writelines(f">{name}\n{sequence}\n" for name, sequence in fuzz_sequences(num_fuzz, seed, encoder))
+        fasta_files.append(os.path.join(golden_folder, FUZZ_FILE))
+    index = {
+        "version": __version__,
+        "model_fingerprint": model_fingerprint(model, encoder),
+        "seq_range": list(encoder.seq_range) if encoder.seq_range is not None else None,
+        "feature_names": list(encoder.feature_names),
+        "fuzz": {"num_sequences": num_fuzz, "seed": seed},
+        "datasets": dict()
+    }
+    for fasta_file in fasta_files:
+        name = dataset_name(fasta_file)
+        if name in index["datasets"]:
+            raise ValueError(f"Two fasta-files are named '{name}', the golden outputs are saved by name")
+        records = read_records(fasta_file)
+        features = reference_features(records, encoder, model)
+        probabilities = model.predict_proba(features)[:, 1]
+        np.savez_compressed(os.path.join(golden_folder, name + ".npz"), identifiers=records.names,
+                            features=features, probabilities=probabilities)
+        index["datasets"][name] = {
+            # Paths of the fasta-files of the golden folder are relative to it
+            "fasta": FUZZ_FILE if fasta_file == os.path.join(golden_folder, FUZZ_FILE) else fasta_file,
+            "sha256": file_hash(fasta_file),
+            "num_sequences": len(records),
+            "file": name + ".npz"
+        }
+        print(f"{name}: {len(records)} sequences frozen")
+    with open(os.path.join(golden_folder, INDEX_FILE), 'w') as ofile:
+        json.dump(index, ofile, indent=4)
+    return index
+
+
+def timed(backend: Callable, records: SequenceRecords, encoder: CompiledEncoder, model: object,
+          repeat: int) -> Tuple[np.ndarray, float]:
+    """
+        Output of a backend and the shortest of ´repeat´ runs in seconds.
+    """
+    seconds = list()
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        output = backend(records, encoder, model)
+        seconds.append(time.perf_counter() - start)
+    return np.asarray(output), min(seconds)
+
+
+def check(encoder: CompiledEncoder, model: object, golden_folder: str = GOLDEN_FOLDER, backends: List[str] = None,
+          datasets: List[str] = None, max_ulp: int = 0, repeat: int = 1) -> Tuple[bool, List[dict]]:
+    """
+        Compare the features and probabilities of each backend with the golden outputs and time them.
+
+        Args:
+            encoder (CompiledEncoder): encoder of the model
+            model (object): the trained LGBMClassifier, the probabilities are only compared if its
+                            fingerprint (see ´manifest.model_fingerprint´) equals the frozen one
+            golden_folder (str): folder of the golden outputs (see ´freeze´)
+            backends (List[str]): names of the backends of FEATURE_BACKENDS, SCORE_BACKENDS and LABEL_BACKENDS, all if None
+                                  (the reference backends are always run)
+            datasets (List[str]): names of the datasets, all if None
+            max_ulp (int): maximal distance in units in the last place of equivalent outputs (0: bit by bit),
+                           raised to BACKEND_MAX_ULP for the backends listed there
+            repeat (int): number of runs of each backend, the shortest is reported
+
+        Returns:
+            Tuple[bool, List[dict]]: whether all backends reproduced the golden outputs and one row per dataset,
+            output and backend (comparison, seconds and speedup over the reference backend)
+    """
+    with open(os.path.join(golden_folder, INDEX_FILE), 'r') as ifile:
+        index = json.load(ifile)
+    registries = (FEATURE_BACKENDS, SCORE_BACKENDS, LABEL_BACKENDS)
+    unknown = [name for name in (backends or []) if all(name not in registry for registry in registries)]
+    if len(unknown) != 0:
+        raise ValueError("Unknown backend(s) " + ", ".join(unknown) + ", choose from: "
+                         + ", ".join(sorted(set().union(*registries))))
+    if index["feature_names"] != list(encoder.feature_names) or index["feature_names"] != list(FEATURE_NAMES):
+        raise ValueError("The feature names (or their order) of the encoder differ from the golden outputs")
+    score_model = index["model_fingerprint"] == model_fingerprint(model, encoder)
+    if not score_model:
+        print("The model differs from the model of the golden outputs, only the features are compared")
+    passed, rows = True, list()
+    for name, dataset in index["datasets"].items():
+        if datasets is not None and name not in datasets:
+            continue
+        fasta_file = dataset["fasta"] if dataset["fasta"] != FUZZ_FILE else os.path.join(golden_folder, FUZZ_FILE)
+        if file_hash(fasta_file) != dataset["sha256"]:
+            raise ValueError(f"'{fasta_file}' changed since the golden outputs were frozen, freeze them again")
+        records = read_records(fasta_file)
+        golden = np.load(os.path.join(golden_folder, dataset["file"]))
+        if not np.array_equal(golden["identifiers"], records.names):
+            raise ValueError(f"The identifiers of '{fasta_file}' differ from the golden outputs")
+        labels = (golden["probabilities"] >= DECISION_THRESHOLD).astype(np.float64)
+        for output, registry, expected in (("features", FEATURE_BACKENDS, golden["features"]),
+                                           ("probabilities", SCORE_BACKENDS, golden["probabilities"]),
+                                           ("labels", LABEL_BACKENDS, labels)):
+            if output != "features" and not score_model:
+                continue
+            if output == "labels" and backends is not None and all(backend not in backends for backend in registry):
+                continue
+            reference_seconds = None
+            # The reference first, the speedup of the other backends is relative to it
+            for backend in sorted(registry, key=lambda backend: backend != "reference"):
+                if backends is not None and backend not in backends and backend != "reference":
+                    continue
+                values, seconds = timed(registry[backend], records, encoder, model, repeat)
+                if backend == "reference":
+                    reference_seconds = seconds
+                row = dict(dataset=name, output=output, backend=backend, num_sequences=len(records),
+                           **compare(expected, values, max(max_ulp, BACKEND_MAX_ULP.get(backend, 0))), seconds=seconds,
+                           speedup=reference_seconds / seconds if seconds > 0 else None)
+                passed &= row["equal"]
+                rows.append(row)
+    return passed, rows
+
+
+def print_check(rows: List[dict]) -> None:
+    dashes = "-"*110
+    print(f"\n{'dataset':<28}{'output':<15}{'backend':<12}{'sequences':>10}{'max ULP':>10}{'mismatches':>12}"
+          f"{'seconds':>11}{'speedup':>10}  result\n{dashes}")
+    for row in rows:
+        max_ulp = row["max_ulp"] if row["max_ulp"] is not None else "-"
+        mismatches = row["mismatches"] if row["mismatches"] is not None else "-"
+        speedup = f"{row['speedup']:.1f}x" if row["speedup"] is not None else "-"
+        result = "ok" if row["equal"] else f"FAILED (first at {row['first_mismatch']})"
+        print(f"{row['dataset'][:27]:<28}{row['output']:<15}{row['backend']:<12}{row['num_sequences']:>10}{max_ulp:>10}"
+              f"{mismatches:>12}{row['seconds']:>11.4f}{speedup:>10}  {result}")
+    print(dashes)
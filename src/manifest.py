@@ -0,0 +1,137 @@
+import os
+import hashlib
+import json
+import numpy as np
+from typing import Tuple, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+from .quantized import QuantizedModel
+
+
+# Number of protein sequences encoded at once
+INCREMENTAL_BATCH_SIZE: int = 10000
+MANIFEST_COLUMNS = ("identifier", "window_hash", "feature_hash", "model_fingerprint", "probability")
+
+
+def model_fingerprint(model: object, encoder: CompiledEncoder) -> str:
+    """
+        Hash of the trees of the model and of the feature specification it is applied with,
+        scores of a manifest are only reused for the same fingerprint.
+    """
+    digest = hashlib.sha256(model.booster_.model_to_string().encode("utf-8"))
+    digest.update(json.dumps(encoder.spec, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def window_hashes(fastas: SequenceRecords, encoder: CompiledEncoder) -> list:
+    """
+        Hash of the sequence region of each protein sequence the features are computed from.
+    """
+    windows = encoder.windows(fastas)
+    return [hashlib.sha1(windows.sequences[start:end].tobytes()).hexdigest()[:16]
+            for start, end in zip(windows.seq_starts, windows.seq_ends)]
+
+
+def feature_hashes(features: np.ndarray) -> list:
+    """
+        Hash of the features of each protein sequence (bit by bit).
+    """
+    features = np.ascontiguousarray(features, dtype=np.float64)
+    return [hashlib.sha1(row.tobytes()).hexdigest()[:16] for row in features]
+
+
+def read_manifest(file_path: str) -> list:
+    """
+        Read a run manifest, a tab-separated file with the columns MANIFEST_COLUMNS.
+
+        Returns:
+            list: one dict per protein sequence
+    """
+    rows = list()
+    with open(file_path, 'r') as ifile:
+        header = ifile.readline().rstrip("\n").split("\t")
+        if tuple(header) != MANIFEST_COLUMNS:
+            raise ValueError(f"'{file_path}' is no run manifest, expected the columns: " + ", ".join(MANIFEST_COLUMNS))
+        for line in ifile:
+            row = dict(zip(MANIFEST_COLUMNS, line.rstrip("\n").split("\t")))
+            row["probability"] = float(row["probability"])
+            rows.append(row)
+    return rows
+
+
+def write_manifest(file_path: str, rows: list) -> None:
+    with open(file_path, 'w') as ofile:
+        ofile.write("\t".join(MANIFEST_COLUMNS) + "\n")
+        for row in rows:
+            # repr of a float is exact, the probabilities are reused bit by bit
+            ofile.write("\t".join([row["identifier"].replace("\t", " "), row["window_hash"], row["feature_hash"],
+                                   row["model_fingerprint"], repr(float(row["probability"]))]) + "\n")
+
+
+def incremental_predict(fastas: Union[np.ndarray, SequenceRecords], encoder: CompiledEncoder, model: object,
+                        manifest_path: str, quantized: bool = False,
+                        batch_size: int = INCREMENTAL_BATCH_SIZE) -> Tuple[np.ndarray, dict]:
+    """
+        Computes the prediction probabilities of protein sequences, reusing the scores of a previous run.
+
+        The manifest records the identifier, the hash of the sequence region, the hash of the features
+        and the fingerprint of the model of each sequence with its probability. A sequence is only scored
+        if there is no record with the same sequence region, features and model fingerprint. The features
+        are compared in addition to the sequence regions, since the dipeptide compositions are carried from
+        one sequence to the next (see ´kernels.dpc_recurrence´): a changed sequence also changes the DPC-features
+        of the sequences following it, until its contribution vanished. All sequences are encoded (cheap),
+        the probabilities are identical to those of scoring all sequences on a single core.
+        The manifest is overwritten with the records of the new run.
+
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            encoder (CompiledEncoder): encoder computing the features of the model
+            model (object): the trained LGBMClassifier
+            manifest_path (str): path of the manifest of the previous run (created if missing)
+            quantized (bool): whether to score on quantized features (see ´quantized.QuantizedModel´)
+            batch_size (int): number of sequences encoded at once
+
+        Returns:
+            Tuple[np.ndarray, dict]: n x 1 probabilities of the positive label and the number of
+            sequences by status: 'reused', 'new' (unknown identifier), 'changed' (changed sequence region)
+            and 'context' (same sequence region, but other features or model)
+    """
+    if not isinstance(fastas, SequenceRecords):
+        fastas = SequenceRecords.from_pairs(fastas)
+    fingerprint = model_fingerprint(model, encoder)
+    previous = read_manifest(manifest_path) if os.path.exists(manifest_path) else list()
+    scores = {(row["window_hash"], row["feature_hash"]): row["probability"]
+              for row in previous if row["model_fingerprint"] == fingerprint}
+    windows = {row["identifier"]: row["window_hash"] for row in previous}
+    scorer = QuantizedModel(model, encoder) if quantized else None
+
+    probas = np.empty((len(fastas), 1), dtype=np.float64)
+    rows = list()
+    stats = dict(reused=0, new=0, changed=0, context=0)
+    dpc_state = None
+    for start in range(0, len(fastas), batch_size):
+        batch = fastas[start:start+batch_size]
+        features, dpc_state = encoder.encode_sequences(batch, dpc_state)
+        keys = list(zip(window_hashes(batch, encoder), feature_hashes(features)))
+        score = np.array([key not in scores for key in keys], dtype=bool)
+        batch_probas = np.empty(len(batch), dtype=np.float64)
+        if score.any() and scorer is not None:
+            batch_probas[score] = scorer.probabilities(scorer.quantize_features(features[score]))[:, 1]
+        elif score.any():
+            batch_probas[score] = model.predict_proba(features[score])[:, 1]
+        for idx, (identifier, key) in enumerate(zip(batch.names, keys)):
+            if not score[idx]:
+                batch_probas[idx] = scores[key]
+                stats["reused"] += 1
+            elif identifier not in windows:
+                stats["new"] += 1
+            elif windows[identifier] != key[0]:
+                stats["changed"] += 1
+            else:
+                stats["context"] += 1
+            rows.append(dict(identifier=str(identifier), window_hash=key[0], feature_hash=key[1],
+                             model_fingerprint=fingerprint, probability=batch_probas[idx]))
+        probas[start:start+len(batch), 0] = batch_probas
+    write_manifest(manifest_path, rows)
+    return probas, stats
@@ -0,0 +1,187 @@
+import os
+import re
+import sys
+import tracemalloc
+import numpy as np
+from typing import Callable, List, Tuple
+
+from .sequtils.read_fasta import read_batches
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import CompiledEncoder
+from .cost_model import ExecutionPlan
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# Part of the budget kept free for allocations that are not planned, e.g. of the interpreter
+MEMORY_SAFETY_MARGIN: float = 0.1
+# Chunks are not made smaller than this, the budget is too small otherwise
+MIN_BUDGET_CHUNK_SIZE: int = 100
+# Number of sequences the memory of the processing is measured on
+MEMORY_SAMPLE_SIZE: int = 2000
+# Maximal number of result lines buffered before they are written
+OUTPUT_BUFFER_LINES: int = 100000
+# Bytes per buffered line of the results file
+OUTPUT_LINE_BYTES: int = 64
+
+UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_memory_size(value: str) -> int:
+    """
+        Number of bytes of a size such as '512M', '2G' or '1.5GB' (binary units), plain numbers are bytes.
+    """
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([KMGT]?)I?B?\s*", str(value).upper())
+    if match is None:
+        raise ValueError(f"Invalid memory size '{value}', e.g. 512M or 2G")
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+def format_size(num_bytes: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+
+
+def peak_rss(children: bool = False) -> int:
+    """
+        Peak resident set size in bytes of this process (or the largest of its terminated
+        child processes, e.g. the workers), None if it can not be determined.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Bytes on macOS, kilobytes on Linux
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def current_rss() -> int:
+    """
+        Resident set size in bytes of this process, the peak if the current size can not be determined.
+    """
+    try:
+        with open("/proc/self/statm", 'r') as ifile:
+            return int(ifile.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss() or 0
+
+
+def estimate_input(fasta_file: str, encoders: List[CompiledEncoder],
+                   sample_size: int = MEMORY_SAMPLE_SIZE) -> Tuple[SequenceRecords, int, int]:
+    """
+        The first ´sample_size´ sequences of a fasta-file and estimates of the number of sequences and of the
+        number of residues of the encoded sequence regions of the file, extrapolated from the size of the file.
+    """
+    sample = next(read_batches(fasta_file, sample_size))
+    # Characters of the records of the sample in the file ('>', identifier, line break, sequence, line break)
+    sample_bytes = int(sample.lengths.sum() + (sample.id_ends - sample.id_starts).sum()) + 3 * len(sample)
+    scale = max(os.path.getsize(fasta_file) / max(sample_bytes, 1), 1.0)
+    num_residues = sum(int(encoder.windows(sample).lengths.sum()) for encoder in encoders)
+    return sample, int(np.ceil(len(sample) * scale)), int(np.ceil(num_residues * scale))
+
+
+def bytes_per_sequence(sample: SequenceRecords, encoders: List[CompiledEncoder], score: Callable,
+                       finalizers: List[Callable] = None) -> float:
+    """
+        Memory per sequence of reading, counting, completing the features and scoring a chunk, measured
+        on a sample (peak of the allocations traced by tracemalloc, which include those of numpy).
+    """
+    finalizers = finalizers if finalizers is not None else [encoder.finalize for encoder in encoders]
+    tracemalloc.start()
+    try:
+        chunk = SequenceRecords.from_pairs(list(sample))
+        features = [finalize(*encoder.count_sequences(chunk), None)[0] for encoder, finalize in zip(encoders, finalizers)]
+        score(features)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / max(len(sample), 1)
+
+
+class MemoryPlan(object):
+    """
+        Execution plan fitted into a memory budget by ´fit_to_budget´.
+    """
+
+    def __init__(self, plan: ExecutionPlan, budget: int, baseline: int, per_sequence: float,
+                 output_buffer: int, estimate: int) -> None:
+        self.plan = plan
+        self.budget = budget
+        # Resident memory before the sequences are processed (interpreter, models)
+        self.baseline = baseline
+        self.per_sequence = per_sequence
+        # Number of result lines buffered before they are written
+        self.output_buffer = output_buffer
+        # Estimated peak memory
+        self.estimate = estimate
+
+    def __str__(self) -> str:
+        return (f"{self.plan.backend} execution, {self.plan.num_workers} worker(s), chunks of {self.plan.chunk_size} sequences, "
+                f"output buffer of {self.output_buffer} lines (estimated peak {format_size(self.estimate)} of "
+                f"{format_size(self.budget)}, {format_size(self.baseline)} baseline, {format_size(self.per_sequence)} per sequence)")
+
+
+def chunks_in_memory(backend: str, num_workers: int) -> int:
+    """
+        Maximal number of chunks in memory at once in the main process (see ´execution.execute´): the chunk
+        being read and the chunk being completed, plus the chunks submitted to and returned by the workers.
+    """
+    if backend == "serial" or num_workers <= 1:
+        return 2
+    if backend == "thread":
+        # Counting and scoring chunks pending on the pool
+        return 4 * num_workers + 2
+    return 2 * num_workers + 2
+
+
+def fit_to_budget(plan: ExecutionPlan, budget: int, baseline: int, per_sequence: float,
+                  num_sequences: int, num_outputs: int = 1) -> MemoryPlan:
+    """
+        Reduce the chunk size and, if necessary, the number of workers of an execution plan such that the
+        chunks in memory at once (see ´chunks_in_memory´), the results of all sequences and the output buffer
+        fit into the budget. Each worker process is assumed to need the baseline memory of the main process.
+
+        Args:
+            plan (ExecutionPlan): plan chosen by the cost model
+            budget (int): memory budget in bytes
+            baseline (int): resident memory of the main process before processing the sequences
+            per_sequence (float): memory per sequence of processing a chunk (see ´bytes_per_sequence´)
+            num_sequences (int): (estimated) number of sequences
+            num_outputs (int): number of probabilities per sequence
+
+        Returns:
+            MemoryPlan: the fitted plan
+    """
+    # Results are collected per chunk and concatenated, i.e. they are held twice at the end
+    results = 2 * 8 * num_outputs * num_sequences
+    output_buffer = min(OUTPUT_BUFFER_LINES, max(num_sequences, 1))
+    available = budget * (1 - MEMORY_SAFETY_MARGIN) - baseline - results - output_buffer * OUTPUT_LINE_BYTES
+    for num_workers in range(plan.num_workers, 0, -1):
+        backend = plan.backend if num_workers > 1 else "serial"
+        workers_memory = num_workers * baseline if backend == "process" else 0
+        num_chunks = chunks_in_memory(backend, num_workers)
+        chunk_size = int((available - workers_memory) / (num_chunks * per_sequence)) if available > workers_memory else 0
+        if chunk_size >= min(MIN_BUDGET_CHUNK_SIZE, max(num_sequences, 1)):
+            chunk_size = min(chunk_size, plan.chunk_size, max(num_sequences, 1))
+            estimate = baseline + results + output_buffer * OUTPUT_LINE_BYTES + workers_memory \
+                + num_chunks * chunk_size * per_sequence
+            return MemoryPlan(ExecutionPlan(backend, num_workers, chunk_size, plan.estimates), budget, baseline,
+                              per_sequence, output_buffer, int(estimate))
+    needed = (baseline + results + output_buffer * OUTPUT_LINE_BYTES
+              + chunks_in_memory("serial", 1) * MIN_BUDGET_CHUNK_SIZE * per_sequence) / (1 - MEMORY_SAFETY_MARGIN)
+    raise ValueError(f"The memory budget of {format_size(budget)} is too small, at least {format_size(needed)} are needed")
+
+
+def report_peak_memory() -> str:
+    """
+        Peak resident memory of this process and of its largest terminated child process (e.g. a worker).
+    """
+    main, workers = peak_rss(), peak_rss(children=True)
+    if main is None:
+        return "Peak memory: not available on this platform"
+    return f"Peak memory: {format_size(main)}" + (f" (largest child process, e.g. a worker, {format_size(workers)})" if workers else "")
@@ -0,0 +1,185 @@
+import numpy as np
+from typing import Tuple
+
+
+DECISION_THRESHOLD: float = 0.5
+
+
+class ThresholdSweep(object):
+    """
+        Confusion matrices of a binary classifier at every distinct score threshold.
+
+        The scores are sorted once (descending), the numbers of true and false positives
+        at each threshold are the cumulative sums of the labels in this order, a sequence
+        is predicted positive if its score is larger-equal than the threshold.
+        All metrics are derived from these cumulative counts without rescanning the data.
+    """
+
+    def __init__(self, y_true: np.ndarray, y_score: np.ndarray) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                y_true (np.ndarray): true labels (0 or 1)
+                y_score (np.ndarray): predicted probabilities of the positive class
+        """
+        y_true = np.asarray(y_true).ravel().astype(bool)
+        y_score = np.asarray(y_score, dtype=np.float64).ravel()
+        if len(y_true) != len(y_score):
+            raise ValueError(f"Number of labels ({len(y_true)}) and scores ({len(y_score)}) differ")
+        order = np.argsort(-y_score, kind="mergesort")
+        self.y_true = y_true[order]
+        self.y_score = y_score[order]
+        # Last position of each distinct score, i.e. the position of the threshold
+        distinct = np.flatnonzero(np.diff(self.y_score)) if len(y_score) > 1 else np.zeros(0, dtype=np.int64)
+        ends = np.concatenate((distinct, [len(y_score)-1])) if len(y_score) != 0 else np.zeros(0, dtype=np.int64)
+        # Descending thresholds
+        self.thresholds = self.y_score[ends]
+        positives = np.cumsum(self.y_true, dtype=np.int64)
+        self.tp = positives[ends] if len(ends) else np.zeros(0, dtype=np.int64)
+        self.fp = ends + 1 - self.tp
+        self.num_pos = int(positives[-1]) if len(positives) else 0
+        self.num_neg = len(y_true) - self.num_pos
+        self.fn = self.num_pos - self.tp
+        self.tn = self.num_neg - self.fp
+
+    def confusion_matrix(self, threshold: float = DECISION_THRESHOLD) -> Tuple[int, int, int, int]:
+        """
+            Returns:
+                Tuple[int, int, int, int]: tn, fp, fn, tp when predicting scores larger-equal than ´threshold´ positive
+        """
+        # Number of scores larger-equal than the threshold (scores are sorted descending)
+        num_predicted = int(np.searchsorted(-self.y_score, -threshold, side="right"))
+        tp = int(np.count_nonzero(self.y_true[:num_predicted]))
+        fp = num_predicted - tp
+        return self.num_neg - fp, fp, self.num_pos - tp, tp
+
+    def roc_curve(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Returns:
+                Tuple[np.ndarray, np.ndarray, np.ndarray]: false positive rates, true positive rates and
+                thresholds, starting at (0, 0) with threshold inf
+        """
+        fpr = np.concatenate(([0], self.fp)) / self.num_neg if self.num_neg else np.full(len(self.fp)+1, np.nan)
+        tpr = np.concatenate(([0], self.tp)) / self.num_pos if self.num_pos else np.full(len(self.tp)+1, np.nan)
+        return fpr, tpr, np.concatenate(([np.inf], self.thresholds))
+
+    def precision_recall_curve(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Returns:
+                Tuple[np.ndarray, np.ndarray, np.ndarray]: precision, recall and thresholds in
+                descending order of the thresholds
+        """
+        precision = self.tp / np.maximum(self.tp + self.fp, 1)
+        recall = self.tp / self.num_pos if self.num_pos else np.zeros(len(self.tp))
+        return precision, recall, self.thresholds
+
+    def roc_auc(self) -> float:
+        if self.num_pos == 0 or self.num_neg == 0:
+            return float("nan")
+        fpr, tpr, _ = self.roc_curve()
+        return float(np.trapezoid(tpr, fpr)) if hasattr(np, "trapezoid") else float(np.trapz(tpr, fpr))
+
+    def average_precision(self) -> float:
+        precision, recall, _ = self.precision_recall_curve()
+        return float(np.sum(np.diff(np.concatenate(([0], recall))) * precision))
+
+    def optimal_thresholds(self) -> dict:
+        """
+            Thresholds maximizing Youden's J statistic (tpr - fpr), the f1-score,
+            the balanced accuracy and the Matthews correlation coefficient.
+        """
+        tp, fp, fn, tn = (counts.astype(np.float64) for counts in (self.tp, self.fp, self.fn, self.tn))
+        tpr = tp / max(self.num_pos, 1)
+        tnr = tn / max(self.num_neg, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f1 = np.nan_to_num(2 * tp / (2 * tp + fp + fn))
+            mcc = np.nan_to_num((tp * tn - fp * fn) / np.sqrt((tp + fp) * (tp + fn) * (tn + fp) * (tn + fn)))
+        results = dict()
+        for name, values in (("youden", tpr + tnr - 1), ("f1", f1),
+                             ("balanced_accuracy", (tpr + tnr) / 2), ("matthews_corrcoef", mcc)):
+            if len(values) == 0:
+                continue
+            best = int(np.argmax(values))
+            results[name] = {"threshold": float(self.thresholds[best]), "value": float(values[best]),
+                             "tpr": float(tpr[best]), "fpr": float(1 - tnr[best])}
+        return results
+
+
+def log_loss(y_true: np.ndarray, y_score: np.ndarray) -> float:
+    y_true = np.asarray(y_true, dtype=np.float64).ravel()
+    # Clip as scikit-learn does
+    eps = np.finfo(np.float64).eps
+    y_score = np.clip(np.asarray(y_score, dtype=np.float64).ravel(), eps, 1 - eps)
+    return float(-np.mean(y_true * np.log(y_score) + (1 - y_true) * np.log(1 - y_score)))
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    # Undefined ratios are 0 (as the zero_division default of scikit-learn)
+    return float(numerator / denominator) if denominator != 0 else 0.0
+
+
+def threshold_metrics(tn: int, fp: int, fn: int, tp: int) -> dict:
+    """
+        Metrics of a confusion matrix.
+    """
+    total = tn + fp + fn + tp
+    precision, recall = _ratio(tp, tp + fp), _ratio(tp, tp + fn)
+    neg_precision, specificity = _ratio(tn, tn + fn), _ratio(tn, tn + fp)
+    f1 = _ratio(2 * tp, 2 * tp + fp + fn)
+    neg_f1 = _ratio(2 * tn, 2 * tn + fn + fp)
+    num_pos, num_neg = tp + fn, tn + fp
+    mcc_denominator = float(tp + fp) * (tp + fn) * (tn + fp) * (tn + fn)
+    # Balanced accuracy only averages the recall of the classes present
+    recalls = [r for r, n in ((recall, num_pos), (specificity, num_neg)) if n > 0]
+    return {
+        'accuracy': _ratio(tp + tn, total),
+        'precision': precision,
+        'recall': recall,
+        'specificity': specificity,
+        'f1_score': f1,
+        'balanced_accuracy': float(np.mean(recalls)) if len(recalls) else 0.0,
+        'matthews_corrcoef': _ratio(float(tp) * tn - float(fp) * fn, np.sqrt(mcc_denominator)),
+        'confusion_matrix': [[int(tn), int(fp)], [int(fn), int(tp)]],
+        'f1_weighted': _ratio(f1 * num_pos + neg_f1 * num_neg, total),
+        'f1_macro': (f1 + neg_f1) / 2,
+        'f1_micro': _ratio(tp + tn, total),
+        'precision_weighted': _ratio(precision * num_pos + neg_precision * num_neg, total),
+    }
+
+
+def compute_metrics(y_true: np.ndarray, y_score: np.ndarray,
+                    threshold: float = DECISION_THRESHOLD) -> Tuple[dict, dict]:
+    """
+        Compute all evaluation metrics from a single sort of the scores.
+
+        Args:
+            y_true (np.ndarray): true labels (0 or 1)
+            y_score (np.ndarray): predicted probabilities of the positive class
+            threshold (float): decision threshold of the threshold dependent metrics
+
+        Returns:
+            Tuple[dict, dict]: the metrics (json serializable) and the curves (arrays: roc_fpr, roc_tpr,
+            roc_thresholds, pr_precision, pr_recall, pr_thresholds)
+    """
+    sweep = ThresholdSweep(y_true, y_score)
+    metrics_dict = threshold_metrics(*sweep.confusion_matrix(threshold))
+    metrics_dict.update({
+        'decision_threshold': threshold,
+        'roc_auc': sweep.roc_auc(),
+        'average_precision': sweep.average_precision(),
+        'log_loss': log_loss(sweep.y_true, sweep.y_score),
+        'optimal_thresholds': sweep.optimal_thresholds()
+    })
+    fpr, tpr, roc_thresholds = sweep.roc_curve()
+    precision, recall, pr_thresholds = sweep.precision_recall_curve()
+    curves = dict(roc_fpr=fpr, roc_tpr=tpr, roc_thresholds=roc_thresholds,
+                  pr_precision=precision, pr_recall=recall, pr_thresholds=pr_thresholds)
+    return metrics_dict, curves
+
+
+def save_curves(file_path: str, curves: dict) -> None:
+    """
+        Save the curves returned by ´compute_metrics´ to a compressed .npz-file.
+    """
+    np.savez_compressed(file_path, **curves)
@@ -0,0 +1,198 @@
+import io
+import os
+import sys
+import gzip
+import time
+import queue
+import threading
+from typing import BinaryIO, Iterator, TextIO, Tuple
+
+from .sequtils.read_fasta import fasta_records
+from .sequtils.records import SequenceRecords, RecordsBuilder
+from .encoders.feature_spec import CompiledEncoder
+from .quantized import QuantizedModel
+from .cascade import CascadeModel
+from .metrics import DECISION_THRESHOLD
+from .telemetry import Telemetry
+
+
+# At most this many records are scored at once ...
+PIPE_BATCH_SIZE: int = 1000
+# ... and a batch is scored at the latest this many seconds after its first record was read
+PIPE_FLUSH_INTERVAL: float = 0.5
+# Number of batches read ahead of the scoring, the reader blocks (and so does the
+# process writing to the pipe) once they are buffered
+PIPE_READ_AHEAD: int = 4
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_input(stream: BinaryIO) -> TextIO:
+    """
+        Text stream of a binary input stream, gzip compressed input is decompressed.
+    """
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def read_ahead(lines: TextIO, records: queue.Queue, stop: threading.Event) -> None:
+    """
+        Put the records of a fasta stream into a bounded queue, followed by None
+        (or the exception that occurred), until ´stop´ is set.
+    """
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                records.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for record in fasta_records(lines):
+            if not put(record):
+                return
+        put(None)
+    except BaseException as e:
+        put(e)
+
+
+def micro_batches(records: queue.Queue, batch_size: int = PIPE_BATCH_SIZE,
+                  flush_interval: float = PIPE_FLUSH_INTERVAL) -> Iterator[SequenceRecords]:
+    """
+        Batches of the records of the queue filled by ´read_ahead´. A batch is complete once it
+        contains ´batch_size´ records or ´flush_interval´ seconds after its first record arrived,
+        such that the results of a slow producer are not held back.
+    """
+    done = False
+    while not done:
+        builder = RecordsBuilder()
+        record = records.get()
+        deadline = time.monotonic() + flush_interval
+        while True:
+            if record is None:
+                done = True
+                break
+            if isinstance(record, BaseException):
+                raise record
+            builder.append(*record)
+            if len(builder.seq_ends) == batch_size:
+                break
+            try:
+                record = records.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+        if len(builder.seq_ends) != 0:
+            yield builder.build()
+
+
+def pipe_predict(input_stream: BinaryIO, output_stream: BinaryIO, encoder: CompiledEncoder, model: object,
+                 quantized: bool = False, compress: bool = False, batch_size: int = PIPE_BATCH_SIZE,
+                 flush_interval: float = PIPE_FLUSH_INTERVAL, telemetry: Telemetry = None,
+                 cascade: Tuple[int, ...] = None) -> int:
+    """
+        Score the protein sequences of a fasta stream (e.g. stdin) and write one tab-separated line
+        per sequence (identifier, probability, prediction) to the output stream (e.g. stdout).
+
+        The records are read by a thread into a queue holding PIPE_READ_AHEAD batches, scored in
+        micro-batches (see ´micro_batches´) and the results of each batch are flushed as soon as it is
+        scored. If the consumer of the output is slow, writing blocks, the queue fills up and the reader
+        stops reading, i.e. the producer of the input is slowed down as well (back-pressure). The
+        dipeptide compositions are carried from batch to batch (see ´kernels.dpc_recurrence´), hence
+        the probabilities equal those of scoring the whole file.
+
+        Args:
+            input_stream (BinaryIO): fasta stream, gzip compressed or not
+            output_stream (BinaryIO): stream the results are written to
+            encoder (CompiledEncoder): encoder computing the features of the model
+            model (object): the trained LGBMClassifier
+            quantized (bool): whether to score on quantized features (see ´quantized.QuantizedModel´)
+            compress (bool): whether to gzip compress the output (flushed after each batch)
+            batch_size (int): maximal number of sequences per batch
+            flush_interval (float): maximal number of seconds a record waits for its batch to fill up
+            telemetry (Telemetry): if set, advanced by the number of scored sequences, the number of records
+                                   read ahead is reported as queue depth of 'score'
+            cascade (Tuple[int, ...]): if set, the stages of cascade scoring on quantized features
+                                       (see ´cascade.CascadeModel´)
+
+        Returns:
+            int: number of scored sequences
+    """
+    records = queue.Queue(maxsize=PIPE_READ_AHEAD * batch_size)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_ahead, args=(open_input(input_stream), records, stop), daemon=True)
+    reader.start()
+    try:
+        return score_batches(records, output_stream, encoder, model, quantized, compress, batch_size, flush_interval,
+                             telemetry, cascade)
+    finally:
+        # The reader stops once the output is closed early (e.g. by 'head')
+        stop.set()
+        reader.join(timeout=1.0)
+
+
+def score_batches(records: queue.Queue, output_stream: BinaryIO, encoder: CompiledEncoder, model: object,
+                  quantized: bool, compress: bool, batch_size: int, flush_interval: float,
+                  telemetry: Telemetry = None, cascade: Tuple[int, ...] = None) -> int:
+    """
+        Score the micro-batches of the records of the queue and write the results (see ´pipe_predict´).
+    """
+    output = gzip.GzipFile(fileobj=output_stream, mode='wb') if compress else output_stream
+    scorer = None
+    if cascade is not None:
+        scorer = CascadeModel(model, encoder, cascade)
+    elif quantized:
+        scorer = QuantizedModel(model, encoder)
+    num_sequences = 0
+    dpc_state = None
+    for batch in micro_batches(records, batch_size, flush_interval):
+        start = time.perf_counter()
+        features, dpc_state = encoder.encode_sequences(batch, dpc_state)
+        if scorer is not None:
+            probas = scorer.probabilities(scorer.quantize_features(features))[:, 1]
+        else:
+            probas = model.predict_proba(features)[:, 1]
+        output.write("".join(f"{name}\t{proba:.6f}\t{proba >= DECISION_THRESHOLD}\n"
+                             for name, proba in zip(batch.names, probas)).encode("utf-8"))
+        output.flush()
+        if compress:
+            output_stream.flush()
+        num_sequences += len(batch)
+        if telemetry is not None:
+            telemetry.record_busy("score", time.perf_counter() - start)
+            telemetry.set_queue_depth("score", records.qsize())
+            telemetry.advance(len(batch))
+    if compress:
+        output.close()
+    output_stream.flush()
+    return num_sequences
+
+
+def pipe_main(input_path: str, output_path: str, encoder: CompiledEncoder, model: object,
+              quantized: bool = False, compress: bool = False, telemetry: Telemetry = None,
+              cascade: Tuple[int, ...] = None) -> int:
+    """
+        Run ´pipe_predict´ on stdin ('-') or a file and stdout ('-') or a file, output files
+        ending with '.gz' are compressed. A consumer closing the pipe early (e.g. 'head')
+        ends the scoring without an error, the number of scored sequences is then None.
+    """
+    # sys.stdout may be redirected to stderr for the messages, the results go to the real stdout
+    input_stream = sys.stdin.buffer if input_path == "-" else open(input_path, 'rb')
+    output_stream = sys.__stdout__.buffer if output_path == "-" else open(output_path, 'wb')
+    compress = compress or output_path.endswith(".gz")
+    try:
+        return pipe_predict(input_stream, output_stream, encoder, model, quantized=quantized, compress=compress,
+                            telemetry=telemetry, cascade=cascade)
+    except BrokenPipeError:
+        # Python flushes stdout at exit again, point it to devnull to avoid a second error
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.__stdout__.fileno())
+        return None
+    finally:
+        if input_path != "-":
+            input_stream.close()
+        if output_path != "-":
+            output_stream.close()
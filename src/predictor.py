@@ -1,138 +1,290 @@
 import os
 import re
 import sys
-import uuid
 import json
 import pickle
 import numpy as np
-# Parallelize feature computation and prediction
-from multiprocessing import Process, Manager
-from typing import Tuple, List, Callable
-from sklearn import metrics
+from typing import Callable, Tuple, List, Union
 
 from .sequtils import read_fasta
-from .encoders.encode import encode
-
-
-# Number of protein sequences required for multiprocessing
-# to work if activated, regardless of the input parameter to num_core
-PARALLELIZATION_THRESHOLD: int = 100
-DECISION_THRESHOLD: float = 0.5
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import compile_spec, load_feature_spec, CompiledEncoder
+from .ensemble import Ensemble, member_names
+from .metrics import compute_metrics, save_curves, DECISION_THRESHOLD
+from .explain import explain
+from .quantized import QuantizedModel
+from .cascade import CascadeModel
+from .manifest import incremental_predict, model_fingerprint
+from .results_store import ResultsStore
+from .feature_dump import dump_features
+from .execution import execute, BACKENDS
+from .cost_model import load_costs, plan_execution, ExecutionPlan
+from .memory_budget import estimate_input, bytes_per_sequence, current_rss, fit_to_budget, OUTPUT_BUFFER_LINES
+from .telemetry import Telemetry
+from .__init__ import __version__
 
 
 def predictor(fasta_file: str, num_cores: int, ofile_path: str = "results.txt",
-              seq_range: Tuple[int, int] = None, true_labels_file_name: str = None) -> None:
+              seq_range: Tuple[int, int] = None, true_labels_file_name: str = None,
+              ensemble_file: str = None, aggregation: str = None, explain_predictions: bool = False,
+              quantized: bool = False, manifest_file: str = None, database_file: str = None,
+              dump_directory: str = None, backend: str = None, max_memory: int = None,
+              telemetry: Telemetry = None, cascade: Tuple[int, ...] = None) -> None:
     """
         Computes the prediction for protein sequences and writes the results to a .txt file
 
         Args:
             fasta_file (str): input fasta file containing the protein sequences
             ofile_path (str): path for the output file containing the results
-            seq_range (Tuple[int, int]): the sequence range to use for prediction,
-                                         if None then full-length is chosen
-            num_cores (int): number of cores to use for prediction, NB: the number of cores
-                             only takes effect when the number of protein sequences is significantly
-                             higher than the number of input protein sequences. This is due to the fact
-                             that the overhead of initializing and running multiple processes only
-                             justifies when the data is large enough. Is only used when number of
-                             protein sequences exceeds PARALLELIZATION_THRESHOLD, otherwise this parameter is ignored
+            seq_range (Tuple[int, int]): the sequence range to use for prediction, if None then
+                                         the range of the feature specification of the model is chosen
+            num_cores (int): maximal number of cores to use for prediction, whether the sequences are processed
+                             serially, by threads or by processes and by how many is chosen by a cost model
+                             calibrated once per machine (see ´cost_model.plan_execution´), the results
+                             do not depend on it
+            ensemble_file (str): if set, the sequences are scored by the ensemble of models defined in
+                                 this file (see ´ensemble.Ensemble.load´) instead of the model in src/model,
+                                 the probabilities of each model are saved to '{ofile_path}_ensemble.tsv'
+            aggregation (str): overrides the aggregation of the ensemble ('mean' or 'vote')
+            explain_predictions (bool): whether to save the contribution of each feature to the prediction
+                                        of each protein sequence (see ´explain.explain´), the sequences are
+                                        then processed in batches on a single core
+            quantized (bool): whether to score the sequences on quantized features with integer
+                              comparisons (see ´quantized.QuantizedModel´), the scores are identical
+                              to those of the float features, the probabilities may differ in the last bits
+            manifest_file (str): if set, only sequences not scored by the previous run recorded in this
+                                 manifest are scored (see ´manifest.incremental_predict´), the manifest
+                                 is then updated, the sequences are processed on a single core
+            database_file (str): if set, the predictions are additionally inserted into this SQLite
+                                 database (see ´results_store.ResultsStore´)
+            dump_directory (str): if set, the identifiers, features and probabilities are saved in chunks
+                                  to this directory (see ´feature_dump.dump_features´), the sequences
+                                  are then processed in batches on a single core
+            backend (str): 'serial', 'thread' or 'process' execution (see ´execution.execute´),
+                           chosen by the cost model if None
+            max_memory (int): if set, the sequences are streamed from the fasta-file in chunks and the chunk size,
+                              the number of workers and the output buffer are chosen such that the peak memory
+                              stays below this number of bytes (see ´predict_within_budget´)
+            telemetry (Telemetry): if set, the progress of the scoring is reported (see ´telemetry.Telemetry´),
+                                   the batch modes report only their completion
+            cascade (Tuple[int, ...]): if set, the sequences are scored on quantized features by a cascade
+                                       checking after these numbers of trees whether their labels are decided
+                                       (see ´cascade.CascadeModel´), the labels are those of the full model,
+                                       sequences decided early get the probability of the deciding bound
 
         Returns:
             None
     """
+    # Modes processing the sequences in batches on a single core
+    batch_modes = [mode for mode, enabled in (("the explanation of the predictions", explain_predictions),
+                                              ("incremental scoring", manifest_file is not None),
+                                              ("the feature dump", dump_directory is not None)) if enabled]
+    if ensemble_file is not None and (quantized or cascade is not None or len(batch_modes) != 0):
+        raise ValueError(" and ".join(["quantized scoring"] * quantized + ["cascade scoring"] * (cascade is not None)
+                                      + batch_modes).capitalize() + " is not available for ensembles")
+    if cascade is not None and len(batch_modes) != 0:
+        raise ValueError("Cascade scoring can not be combined with " + " and ".join(batch_modes))
+    if len(batch_modes) > 1:
+        raise ValueError(" and ".join(batch_modes).capitalize() + " can not be combined")
+    if max_memory is not None and (len(batch_modes) != 0 or database_file is not None):
+        raise ValueError(" and ".join(batch_modes + ["the results database"] * (database_file is not None)).capitalize()
+                         + " can not be combined with a memory budget")
+    buffer_lines = OUTPUT_BUFFER_LINES
     # Read in data
-    fastas = read_fasta.read_fasta(fasta_file)
-    # Split data into ´num_cores´-folds and run on ´num_cores´ cores
-    if len(fastas) > PARALLELIZATION_THRESHOLD and len(fastas) > num_cores and num_cores > 1:
-        data_splits = list()
-        size = len(fastas) // num_cores
-        for i in range(num_cores-1):
-            data_splits.append(fastas[i*size:(i+1)*size])
-        data_splits.append(fastas[(i+1)*size:])
-        # Encode protein sequences into numerical features
-        predict_args = [seq_range]
-        # Run processes in parallel
-        probabilities = parallelize(
-            predict, predict_args, data_splits, num_cores)
-    # run on a single core
+    fastas = read_fasta.read_records(fasta_file) if max_memory is None else None
+    if telemetry is not None and fastas is not None:
+        telemetry.begin("predict", total=len(fastas))
+    if max_memory is not None:
+        probabilities, buffer_lines = predict_within_budget(fasta_file, max_memory, seq_range, quantized, ensemble_file,
+                                                            aggregation, num_cores, backend, telemetry, cascade)
+    elif explain_predictions:
+        probabilities = explain(fastas, load_encoder(seq_range), load_model(), ofile_path)
+    elif manifest_file is not None:
+        probabilities, stats = incremental_predict(fastas, load_encoder(seq_range), load_model(),
+                                                   manifest_file, quantized=quantized)
+        print(f"Scored {len(fastas) - stats['reused']} of {len(fastas)} sequences ({stats['new']} new, "
+              f"{stats['changed']} changed, {stats['context']} with changed context or model)")
+    elif dump_directory is not None:
+        probabilities = dump_features(fastas, load_encoder(seq_range), load_model(), dump_directory, quantized=quantized)
+    elif ensemble_file is not None:
+        probabilities = predict_ensemble(fastas, ensemble_file, aggregation, num_cores, backend, telemetry)
     else:
-        probabilities = predict(fastas, seq_range)
+        probabilities = predict(fastas, seq_range, quantized, num_cores, backend, telemetry, cascade)
+    if telemetry is not None and len(batch_modes) != 0:
+        telemetry.advance(len(fastas))
+    if ensemble_file is not None:
+        # Last column contains the aggregated probabilities of the ensemble
+        probabilities = np.array(probabilities)
+        write_ensemble_results(ofile_path, member_names(ensemble_file), probabilities)
+        probabilities = probabilities[:, -1:]
     # Write results to file
     true_labels = None
     if true_labels_file_name is not None:
         with open(true_labels_file_name, 'r') as ifile:
             true_labels = [int(l) for l in ifile.read().split(",")]
     # Write results to file
-    write_results(ofile_path, np.array(probabilities), true_labels=true_labels)
+    write_results(ofile_path, np.array(probabilities), true_labels=true_labels, buffer_lines=buffer_lines)
+    if database_file is not None:
+        store = ResultsStore(database_file)
+        store.insert(fastas.names, np.array(probabilities), model_version(seq_range, ensemble_file, aggregation), fasta_file)
+        store.close()
 
 
-def parallelize(worker: Callable, args: List,
-                data_split: List[np.ndarray], num_cores: int) -> List:
+def predict(fastas: Union[np.ndarray, SequenceRecords], seq_range: Tuple[int, int], quantized: bool = False,
+            num_cores: int = 1, backend: str = None, telemetry: Telemetry = None,
+            cascade: Tuple[int, ...] = None) -> np.ndarray:
     """
-        Parallelizes the execution of a task on several data splits, such
-        that they can run on several cpu cores
+        Encodes protein sequences and computes the prediction probability
 
-        Args:
-            worker (Callable): the task to be executed on each different cpu process
-            args (List): list of arguments passed to the worker in the Process
-            data_split (List[np.ndarray]): the data splits to be executed on different cpu cores
-            num_cores (int): number of parallel tasks to execute
+        Args: 
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            seq_range (Tuple[int, int]): the sequence range to use for prediction, if None then
+                                         the range of the feature specification of the model is chosen
+            quantized (bool): whether to score quantized features (see ´quantized.QuantizedModel´)
+            num_cores (int): maximal number of cores to use (see ´execution_plan´)
+            backend (str): 'serial', 'thread' or 'process', chosen by the cost model if None
+            telemetry (Telemetry): if set, advanced by the number of scored sequences (see ´execution.execute´)
+            cascade (Tuple[int, ...]): if set, the stages of cascade scoring (see ´cascade.CascadeModel´)
 
         Returns:
-            List containing the concatenated results of each
-            tasks in the original order they were input in
+            np.ndarray: n x 1 probabilities of the positive label, i.e. secreted protein
     """
-    with Manager() as manager:
-        # Dictionary containing the result of each process
-        results_processes = manager.dict()
+    encoders, score, finalizers, scorer = model_scoring(seq_range, quantized, cascade)
+    plan = execution_plan(fastas, encoders, num_cores, backend=backend)
+    probabilities = execute(fastas, encoders, score, plan.backend, plan.num_workers, plan.chunk_size,
+                            finalizers=finalizers, telemetry=telemetry)
+    if isinstance(scorer, CascadeModel):
+        print(scorer.summary())
+    return probabilities
+
 
-        process_ids = [uuid.uuid4() for _ in range(num_cores)]
-        processes = list()
-        for pid, split in zip(process_ids, data_split):
-            p = Process(target=worker, args=tuple(
-                [split] + args + [results_processes, pid]))
-            processes.append(p)
-            p.start()
+def model_scoring(seq_range: Tuple[int, int] = None, quantized: bool = False,
+                  cascade: Tuple[int, ...] = None) -> Tuple[List[CompiledEncoder], Callable, List[Callable], QuantizedModel]:
+    """
+        Encoder, scoring function (n x 1 probabilities of the positive label), finalizers and quantized
+        scorer (None for float features) of the model in src/model for ´execution.execute´.
+    """
+    encoder = load_encoder(seq_range)
 
-        # Ensure processes complete before continuing execution
-        for p in processes:
-            p.join()
+    model = load_model()
 
-        # Join the results preserving the original order
-        output = list()
-        for pid in process_ids:
-            output += list(results_processes.get(pid))
-    # Return accumulated result from
-    return output
+    # Probability for positive label, i.e. secreted protein
+    if quantized or cascade is not None:
+        scorer = QuantizedModel(model, encoder) if cascade is None else CascadeModel(model, encoder, cascade)
+        return ([encoder], lambda bins: scorer.probabilities(bins[0])[:, 1][:, None], [scorer.quantize_counts],
+                scorer)
+    return [encoder], lambda features: model.predict_proba(features[0])[:, 1][:, None], None, None
 
 
-def predict(fastas: np.ndarray, seq_range: Tuple[int, int],
-            results_dict: dict = None, process_id: str = None) -> List[float]:
+def predict_ensemble(fastas: Union[np.ndarray, SequenceRecords], ensemble_file: str, aggregation: str = None,
+                     num_cores: int = 1, backend: str = None, telemetry: Telemetry = None) -> np.ndarray:
     """
-        Encodes protein sequences, computes the prediction probability
-        and determines the ensemble prediction for all chosen models
+        Encodes protein sequences once and computes the prediction probability under each model of an ensemble
 
-        Args: 
-            fastas (np.ndarray): array containing the protein sequences
-            seq_range (Tuple[int, int]): the sequence range to use for prediction
-            results_dict (dict): the dictionary the results from the
-                                 multiple processes are written to
-            process_id (str): uuid of the process, to concatenate the results in the right order
+        Args:
+            fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+            ensemble_file (str): json-file defining the ensemble (see ´ensemble.Ensemble.load´)
+            aggregation (str): overrides the aggregation of the ensemble ('mean' or 'vote')
+            num_cores (int): maximal number of cores to use (see ´execution_plan´)
+            backend (str): 'serial', 'thread' or 'process', chosen by the cost model if None
+            telemetry (Telemetry): if set, advanced by the number of scored sequences (see ´execution.execute´)
 
         Returns:
-            None
+            np.ndarray: n x (number of models + 1) matrix, the probabilities of each model
+            and the aggregated probability in the last column
     """
-    names, features = encode(fastas, seq_range)
+    encoders, score, num_models = ensemble_scoring(ensemble_file, aggregation)
+    plan = execution_plan(fastas, encoders, num_cores, num_models=num_models, backend=backend)
+    return execute(fastas, encoders, score, plan.backend, plan.num_workers, plan.chunk_size, telemetry=telemetry)
 
-    model = load_model()
 
-    # Probability for positive label, i.e. secreted protein
-    probas = model.predict_proba(features)[:, 1][:, None]
+def ensemble_scoring(ensemble_file: str, aggregation: str = None) -> Tuple[List[CompiledEncoder], Callable, int]:
+    """
+        Encoders, scoring function (n x (number of models + 1) probabilities, see ´predict_ensemble´)
+        and number of models of an ensemble for ´execution.execute´.
+    """
+    ensemble = Ensemble.load(ensemble_file, aggregation)
+
+    def score(features: List[np.ndarray]) -> np.ndarray:
+        probas = ensemble.score(features)
+        return np.hstack((probas, ensemble.aggregate(probas)[:, None]))
+
+    return [encoder for encoder, _ in ensemble.encoders], score, len(ensemble.models)
 
-    if results_dict is not None and process_id is not None:
-        results_dict[process_id] = probas
 
-    return probas
+def predict_within_budget(fasta_file: str, max_memory: int, seq_range: Tuple[int, int] = None, quantized: bool = False,
+                          ensemble_file: str = None, aggregation: str = None, num_cores: int = 1,
+                          backend: str = None, telemetry: Telemetry = None,
+                          cascade: Tuple[int, ...] = None) -> Tuple[np.ndarray, int]:
+    """
+        Encodes and scores the protein sequences of a fasta-file streamed in chunks, such that the peak
+        memory stays below a budget: the memory per sequence is measured on the first sequences, the number
+        of sequences is estimated from the size of the file and the chunk size and the number of workers of
+        the execution plan are reduced to fit (see ´memory_budget.fit_to_budget´).
+
+        Args:
+            fasta_file (str): input fasta file containing the protein sequences
+            max_memory (int): memory budget in bytes
+            seq_range (Tuple[int, int]): overrides the sequence range of the feature specification of the model
+            quantized (bool): whether to score quantized features (see ´quantized.QuantizedModel´)
+            ensemble_file (str): if set, the sequences are scored by this ensemble (see ´predict_ensemble´)
+            aggregation (str): overrides the aggregation of the ensemble ('mean' or 'vote')
+            num_cores (int): maximal number of cores to use (see ´execution_plan´)
+            backend (str): 'serial', 'thread' or 'process', chosen by the cost model if None
+            telemetry (Telemetry): if set, the progress is reported against the estimated number of sequences
+            cascade (Tuple[int, ...]): if set, the stages of cascade scoring (see ´cascade.CascadeModel´)
+
+        Returns:
+            Tuple[np.ndarray, int]: the probabilities as returned by ´predict´ or ´predict_ensemble´
+            and the number of result lines to buffer when writing them
+    """
+    finalizers, scorer, num_models = None, None, 1
+    if ensemble_file is not None:
+        encoders, score, num_models = ensemble_scoring(ensemble_file, aggregation)
+    else:
+        encoders, score, finalizers, scorer = model_scoring(seq_range, quantized, cascade)
+    sample, num_sequences, num_residues = estimate_input(fasta_file, encoders)
+    per_sequence = bytes_per_sequence(sample, encoders, score, finalizers)
+    if isinstance(scorer, CascadeModel):
+        # The sample is scored again with the file
+        scorer.reset_counts()
+    plan = execution_plan(sample, encoders, num_cores, num_models=num_models, backend=backend,
+                          size=(num_sequences, num_residues))
+    memory_plan = fit_to_budget(plan, max_memory, current_rss(), per_sequence, num_sequences,
+                                num_outputs=num_models + 1 if ensemble_file is not None else 1)
+    print("Memory plan:", memory_plan)
+    if telemetry is not None:
+        telemetry.begin("predict", total=num_sequences)
+    chunk_size = memory_plan.plan.chunk_size
+    probabilities = execute(read_fasta.read_batches(fasta_file, chunk_size), encoders, score, memory_plan.plan.backend,
+                            memory_plan.plan.num_workers, chunk_size, finalizers=finalizers, telemetry=telemetry)
+    if isinstance(scorer, CascadeModel):
+        print(scorer.summary())
+    return probabilities, memory_plan.output_buffer
+
+
+def execution_plan(fastas: SequenceRecords, encoders: List[CompiledEncoder], num_cores: int,
+                   num_models: int = 1, backend: str = None, size: Tuple[int, int] = None) -> ExecutionPlan:
+    """
+        Choose serial, thread or process execution (or only the number of workers and the chunk size of
+        the given ´backend´) with the cost model of this machine (calibrated on the first use, see
+        ´cost_model.load_costs´) and print the decision. A single core always means serial execution.
+        ´size´ (number of sequences, number of residues) replaces the size of ´fastas´, e.g. by estimates.
+    """
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose one of: " + ", ".join(BACKENDS))
+    num_sequences = len(fastas) if size is None else size[0]
+    if num_cores <= 1 or backend == "serial":
+        if backend not in (None, "serial"):
+            print(f"A single core, falling back to serial execution instead of {backend}")
+        return ExecutionPlan("serial", 1, num_sequences, dict())
+    costs = load_costs(load_encoder(), load_model())
+    num_residues = sum(int(encoder.windows(fastas).lengths.sum()) for encoder in encoders) if size is None else size[1]
+    plan = plan_execution(num_sequences, num_residues, num_cores, costs,
+                          num_encoders=len(encoders), num_models=num_models,
+                          backends=BACKENDS if backend is None else (backend,))
+    print("Execution plan:", plan)
+    return plan
 
 
 def load_model() -> object:
@@ -150,7 +302,39 @@ def load_model() -> object:
     return model
 
 
-def write_results(ofile_path: str, probabilities: np.ndarray, true_labels: List[int] = None) -> None:
+def load_encoder(seq_range: Tuple[int, int] = None) -> CompiledEncoder:
+    """
+        Compile the feature specification saved with the model, i.e. the features the
+        model was trained on (the 85 features of Effective T3 if no specification is present)
+
+        Args:
+            seq_range (Tuple[int, int]): overrides the sequence range of the feature specification
+
+        Returns:
+            CompiledEncoder: the encoder computing the features of the model
+    """
+    spec = None
+    spec_path = os.path.join("src", "model", "feature_spec.json")
+    if os.path.exists(spec_path):
+        spec = load_feature_spec(spec_path)
+    encoder = compile_spec(spec)
+    if seq_range is not None:
+        encoder = compile_spec(dict(encoder.spec, seq_range=list(seq_range)))
+    return encoder
+
+
+def model_version(seq_range: Tuple[int, int] = None, ensemble_file: str = None, aggregation: str = None) -> str:
+    """
+        Version of Effective T3 and fingerprint of the model (see ´manifest.model_fingerprint´),
+        or the name of the ensemble file and the aggregation.
+    """
+    if ensemble_file is not None:
+        return f"{__version__}:ensemble:{os.path.basename(ensemble_file)}:{aggregation or 'default'}"
+    return f"{__version__}:{model_fingerprint(load_model(), load_encoder(seq_range))}"
+
+
+def write_results(ofile_path: str, probabilities: np.ndarray, true_labels: List[int] = None,
+                  buffer_lines: int = OUTPUT_BUFFER_LINES) -> None:
     """
         Write prediction results to output file (either .json or .txt depending 
         on the file extension in the provided file name)
@@ -162,6 +346,7 @@ def write_results(ofile_path: str, probabilities: np.ndarray, true_labels: List[
             ofile_path (str): path of the output file containing the prediction results
             probabilities (np.ndarray): probabilities of protein being secreted
             true_labels (List[int]): list containing the true labels of the input protein sequences
+            buffer_lines (int): number of lines of the .txt-file written at once
 
         Returns:
             None
@@ -175,8 +360,7 @@ def write_results(ofile_path: str, probabilities: np.ndarray, true_labels: List[
     # If true labels are present then compute all kinds of evaluation metrics
     try:
         if true_labels is not None:
-            evaluation_metrics(file_path, y_pred=labels.astype(int).tolist(),
-                               y_true=true_labels, y_probas=probabilities)
+            evaluation_metrics(file_path, y_true=true_labels, y_probas=probabilities)
     except Exception as e:
         print("\n\nThere seems to be an error with your file containing the comma-separated labels")
         print("The evaluation metrics therefore could not be computed!")
@@ -201,50 +385,52 @@ def write_results(ofile_path: str, probabilities: np.ndarray, true_labels: List[
                 f" % positives\n{dashes}\n\n"
             results += "sequence number, prediction by " + \
                 "Effective T3" + f", probability\n{dashes}\n"
+            # Written in blocks of lines, the last line break is omitted
+            lines = [results]
             for seqNo, lab, proba in zip(range(len(labels)), labels, probabilities):
-                results += f"> {str(seqNo)} , {bool(lab)} , {str(round(proba, 3))} \n"
-            ofile.write(results[:-1])
+                lines.append(f"> {str(seqNo)} , {bool(lab)} , {str(round(proba, 3))} \n")
+                if len(lines) > buffer_lines:
+                    ofile.write("".join(lines[:-1]))
+                    lines = lines[-1:]
+            ofile.write("".join(lines)[:-1])
+
+
+def write_ensemble_results(ofile_path: str, names: List[str], probabilities: np.ndarray) -> None:
+    """
+        Write the probabilities of each model of an ensemble and the aggregated probability
+        to a tab-separated file '{ofile_path without extension}_ensemble.tsv'
+
+        Args:
+            ofile_path (str): path of the output file containing the prediction results
+            names (List[str]): names of the models of the ensemble
+            probabilities (np.ndarray): n x (number of models + 1) matrix as returned by ´predict_ensemble´
+    """
+    with open(os.path.splitext(ofile_path)[0] + "_ensemble.tsv", 'w') as ofile:
+        ofile.write("\t".join(["sequence number"] + list(names) + ["ensemble"]) + "\n")
+        for seqNo, row in enumerate(probabilities):
+            ofile.write("\t".join([str(seqNo)] + [f"{proba:.6f}" for proba in row]) + "\n")
 
 
-def evaluation_metrics(file_path: str, y_pred: List[int], y_true: List[int], y_probas: List[float]) -> None:
+def evaluation_metrics(file_path: str, y_true: List[int], y_probas: List[float]) -> None:
     """
-        Compute all kinds of metrics and save them to .json-file
+        Compute all kinds of metrics and save them to .json-file, the ROC- and
+        precision-recall curves are saved to '{file_path}_curves.npz'. The threshold dependent
+        metrics are computed from the probabilities at DECISION_THRESHOLD.
 
         Args:
             file_path (str): path where to save metrics file
-            y_pred (List[int]): predicted labels
             y_true (List[int]): true labels
             y_probas (List[float]): probabilities instead of actual labels
 
         Returns:
             None
     """
-    # Compute metrics
-    metrics_dict = {
-        'accuracy': metrics.accuracy_score(y_true, y_pred),
-        'precision': metrics.precision_score(y_true, y_pred),
-        'recall': metrics.recall_score(y_true, y_pred),
-        'f1_score': metrics.f1_score(y_true, y_pred),
-        'roc_auc': metrics.roc_auc_score(y_true, y_pred),
-        'log_loss': metrics.log_loss(y_true, y_pred),
-        'confusion_matrix': metrics.confusion_matrix(y_true, y_pred).tolist(),
-        'balanced_accuracy': metrics.balanced_accuracy_score(y_true, y_pred),
-        'f1_weighted': metrics.f1_score(y_true, y_pred, average='weighted'),
-        'f1_macro': metrics.f1_score(y_true, y_pred, average='macro'),
-        'f1_micro': metrics.f1_score(y_true, y_pred, average='micro'),
-        'precision_weighted': metrics.precision_score(y_true, y_pred, average='weighted'),
-    }
-
-    # Compute ROC curve
-    fpr, tpr, _ = metrics.roc_curve(y_true, y_probas)
-    roc_curve_dict = {'fpr': fpr.tolist(), 'tpr': tpr.tolist()}
-    metrics_dict['roc_curve'] = roc_curve_dict
-
-    # Compute Precision-Recall curve
-    precision, recall, _ = metrics.precision_recall_curve(y_true, y_probas)
-    pr_curve_dict = {'precision': precision.tolist(),
-                     'recall': recall.tolist()}
-    metrics_dict['precision_recall_curve'] = pr_curve_dict
+    # Compute all metrics and curves from a single sort of the probabilities
+    metrics_dict, curves = compute_metrics(y_true, y_probas, threshold=DECISION_THRESHOLD)
+
+    # Save curves in binary format
+    save_curves(file_path + '_curves.npz', curves)
+    metrics_dict['curves_file'] = os.path.basename(file_path) + '_curves.npz'
 
     # Save metrics to a JSON file
     with open(file_path + '_metrics.json', 'w') as ofile:
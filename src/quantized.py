@@ -0,0 +1,228 @@
+import numpy as np
+from typing import List, Union
+
+from .sequtils.records import SequenceRecords
+from .encoders import kernels
+from .encoders.feature_spec import CompiledEncoder, ratio_values
+
+
+# Number of protein sequences encoded and scored at once
+QUANTIZED_BATCH_SIZE: int = 100000
+# Maximal distance in units in the last place of the probabilities from those of LightGBM,
+# the scores are identical but np.exp may differ from the exp of the C library
+SIGMOID_MAX_ULP: int = 4
+
+
+class QuantizedModel(object):
+    """
+        Scores protein sequences with a trained LightGBM model on quantized features.
+
+        Every split of the model compares a feature with a threshold (x <= t). The sorted distinct
+        thresholds T of a feature divide its values into at most len(T) + 1 bins, the bin of x is the
+        number of thresholds smaller than x. Hence x <= T[k] if and only if bin(x) <= k, i.e. the
+        trees are evaluated on uint8 bins with integer comparisons and take the same decisions as
+        on the float features.
+
+        The features of AAC, CTDC, CTDT and AaPropPatterns are ratios of a count and a denominator
+        that are both bounded by the length of the sequence region. Their bins are precomputed in the
+        count domain (lookup table: count x denominator -> bin), such that these features are never
+        computed as floats. DPC-features are no ratios of counts (the dipeptide compositions are carried
+        from one sequence to the next, see ´kernels.dpc_recurrence´), they are binned from the exact
+        carried compositions. Sequences encoded without a sequence range are binned from the float features.
+    """
+
+    def __init__(self, model: object, encoder: CompiledEncoder) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                model (object): the trained LGBMClassifier (binary objective, numerical splits only)
+                encoder (CompiledEncoder): encoder computing the features of the model
+        """
+        dump = model.booster_.dump_model()
+        if not dump["objective"].startswith("binary") or dump["num_tree_per_iteration"] != 1:
+            raise ValueError(f"Quantized scoring requires a binary classifier, got objective '{dump['objective']}'")
+        if dump["max_feature_idx"] + 1 != encoder.num_features:
+            raise ValueError(f"The model expects {dump['max_feature_idx'] + 1} features, "
+                             f"the encoder computes {encoder.num_features}")
+        self.encoder = encoder
+        self.sigmoid = float(dump["objective"].split("sigmoid:")[1]) if "sigmoid:" in dump["objective"] else 1.0
+        self.init_tree_arrays([tree["tree_structure"] for tree in dump["tree_info"]])
+        self.init_tables()
+
+    def init_tree_arrays(self, trees: List[dict]) -> None:
+        """
+            Flatten the trees into arrays of nodes, children are indices of nodes
+            or, if negative, ~(index of the leaf).
+        """
+        splits, leaves, self.roots = list(), list(), list()
+
+        def flatten(node: dict) -> int:
+            if "leaf_value" in node:
+                leaves.append(node["leaf_value"])
+                return ~(len(leaves) - 1)
+            if node["decision_type"] != "<=" or node["missing_type"] != "None":
+                raise ValueError("Quantized scoring supports numerical splits (<=) without missing value "
+                                 f"handling only, got '{node['decision_type']}' (missing type '{node['missing_type']}')")
+            index = len(splits)
+            splits.append([node["split_feature"], node["threshold"], 0, 0])
+            splits[index][2] = flatten(node["left_child"])
+            splits[index][3] = flatten(node["right_child"])
+            return index
+
+        # Index of the first leaf of each tree, the leaves of a tree are contiguous
+        self.leaf_offsets = list()
+        for tree in trees:
+            self.leaf_offsets.append(len(leaves))
+            self.roots.append(flatten(tree))
+        self.leaf_offsets = np.array(self.leaf_offsets + [len(leaves)], dtype=np.int64)
+        self.roots = np.array(self.roots, dtype=np.int64)
+        self.leaf_values = np.array(leaves, dtype=np.float64)
+        splits = np.array(splits, dtype=object).reshape(-1, 4)
+        self.split_features = splits[:, 0].astype(np.int64)
+        thresholds = splits[:, 1].astype(np.float64)
+        self.left_children = splits[:, 2].astype(np.int64)
+        self.right_children = splits[:, 3].astype(np.int64)
+        # Sorted distinct thresholds of each feature and the index of the threshold of each split
+        self.thresholds = [np.unique(thresholds[self.split_features == feature])
+                           for feature in range(self.encoder.num_features)]
+        self.threshold_indices = np.array([np.searchsorted(self.thresholds[feature], threshold)
+                                           for feature, threshold in zip(self.split_features, thresholds)], dtype=np.int64)
+        max_bins = max(len(thresholds) for thresholds in self.thresholds) + 1
+        self.bin_dtype = np.uint8 if max_bins <= 256 else np.uint16
+
+    def bins(self, feature: int, values: np.ndarray) -> np.ndarray:
+        """
+            Bins of the float values of a feature, missing values (nan) are
+            treated as 0 as LightGBM does for splits without missing value handling.
+        """
+        values = np.where(np.isnan(values), 0.0, values)
+        return np.searchsorted(self.thresholds[feature], values, side='left').astype(self.bin_dtype)
+
+    def init_tables(self) -> None:
+        """
+            Lookup tables count x (denominator + 1) -> bin of the ratio features, the counts and the
+            denominators (-1 for CTDT and DPC of empty sequences) are at most the length of the sequence region.
+        """
+        self.tables = dict()
+        if self.encoder.seq_range is None:
+            return
+        start, end = self.encoder.seq_range
+        self.max_length = max(end - start, end - 1)
+        counts, denominators = np.meshgrid(np.arange(self.max_length + 1), np.arange(-1, self.max_length + 1), indexing='ij')
+        for encoder in ("AAC", "CTDC", "CTDT", "AaPropPatterns"):
+            for position in self.encoder.positions[encoder]:
+                if len(self.thresholds[position]) == 0:
+                    continue
+                self.tables[position] = self.bins(position, ratio_values(encoder, counts, denominators))
+
+    def quantize_features(self, features: np.ndarray) -> np.ndarray:
+        """
+            Bins of already computed float features (n x ´num_features´).
+        """
+        bins = np.zeros(features.shape, dtype=self.bin_dtype)
+        for feature in range(self.encoder.num_features):
+            if len(self.thresholds[feature]) != 0:
+                bins[:, feature] = self.bins(feature, features[:, feature])
+        return bins
+
+    def quantize(self, fastas: Union[np.ndarray, SequenceRecords], dpc_state: np.ndarray = None) -> tuple:
+        """
+            Encode protein sequences into the bins of the features.
+
+            Args:
+                fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+                dpc_state (np.ndarray): dipeptide compositions of the sequence preceding
+                                        the sequences, None for a new batch
+
+            Returns:
+                tuple: n x ´num_features´ uint8 bins (features without splits are 0) and
+                the dipeptide compositions of the last sequence (state for the next batch)
+        """
+        if self.encoder.seq_range is None:
+            features, dpc_state = self.encoder.encode_sequences(fastas, dpc_state)
+            return self.quantize_features(features), dpc_state
+        return self.quantize_counts(*self.encoder.count_sequences(fastas), dpc_state=dpc_state)
+
+    def quantize_counts(self, counts: np.ndarray, lengths: np.ndarray, clean_lengths: np.ndarray,
+                        dpc_state: np.ndarray = None) -> tuple:
+        """
+            Bins of the features from the counts of ´CompiledEncoder.count_sequences´, see ´quantize´.
+        """
+        if self.encoder.seq_range is None:
+            features, dpc_state = self.encoder.finalize(counts, lengths, clean_lengths, dpc_state)
+            return self.quantize_features(features), dpc_state
+        # Denominators per row, not per feature (see ´CompiledEncoder.denominator_columns´)
+        denominators, columns = self.encoder.denominator_columns(lengths, clean_lengths)
+        bins = np.zeros(counts.shape, dtype=self.bin_dtype)
+        for position, table in self.tables.items():
+            bins[:, position] = table[counts[:, position], denominators[:, columns[position]] + 1]
+        dpc_positions = self.encoder.positions["DPC"]
+        if len(dpc_positions) != 0:
+            features, dpc_state = kernels.dpc_recurrence(counts[:, dpc_positions], clean_lengths - 1, dpc_state)
+            for column, position in enumerate(dpc_positions):
+                if len(self.thresholds[position]) != 0:
+                    bins[:, position] = self.bins(position, features[:, column])
+        return bins, dpc_state
+
+    def tree_values(self, bins: np.ndarray, tree: int) -> np.ndarray:
+        """
+            Values of the leaves the quantized features reach in a tree (one per row of ´bins´).
+
+            The tree is evaluated node by node on all rows at once: each split compares one column
+            of the bins with its threshold index and selects between the values of its subtrees.
+        """
+        def value(node: int) -> Union[float, np.ndarray]:
+            if node < 0:
+                return self.leaf_values[~node]
+            go_right = bins[:, self.split_features[node]] > self.threshold_indices[node]
+            return np.where(go_right, value(self.right_children[node]), value(self.left_children[node]))
+
+        # A tree of a single leaf has a single value
+        return np.broadcast_to(value(self.roots[tree]), (len(bins),))
+
+    def raw_scores(self, bins: np.ndarray) -> np.ndarray:
+        """
+            Sum of the leaf values of all trees (log-odds) for quantized features.
+        """
+        # Sum up tree by tree (as LightGBM does), such that the scores equal those of LightGBM bit by bit
+        scores = np.zeros(len(bins), dtype=np.float64)
+        for tree in range(len(self.roots)):
+            scores += self.tree_values(bins, tree)
+        return scores
+
+    def sigmoid_probabilities(self, scores: np.ndarray) -> np.ndarray:
+        """
+            n x 2 probabilities of the negative and positive label for raw scores.
+        """
+        # np.exp may differ from the exp of the C library (used by LightGBM) in the last bits, see SIGMOID_MAX_ULP
+        positive = 1.0 / (1.0 + np.exp(-self.sigmoid * scores))
+        return np.column_stack((1.0 - positive, positive))
+
+    def probabilities(self, bins: np.ndarray) -> np.ndarray:
+        """
+            n x 2 probabilities of the negative and positive label for quantized features.
+        """
+        return self.sigmoid_probabilities(self.raw_scores(bins))
+
+    def predict_proba(self, fastas: Union[np.ndarray, SequenceRecords],
+                      batch_size: int = QUANTIZED_BATCH_SIZE) -> np.ndarray:
+        """
+            Computes the prediction probabilities of protein sequences in batches.
+
+            Args:
+                fastas (Union[np.ndarray, SequenceRecords]): the protein sequences
+                batch_size (int): number of sequences per batch
+
+            Returns:
+                np.ndarray: n x 2 probabilities of the negative and positive label (as ´LGBMClassifier.predict_proba´)
+        """
+        if not isinstance(fastas, SequenceRecords):
+            fastas = SequenceRecords.from_pairs(fastas)
+        probas = np.empty((len(fastas), 2), dtype=np.float64)
+        # Dipeptide compositions are carried from batch to batch (see ´kernels.dpc_recurrence´)
+        dpc_state = None
+        for start in range(0, len(fastas), batch_size):
+            bins, dpc_state = self.quantize(fastas[start:start+batch_size], dpc_state)
+            probas[start:start+len(bins)] = self.probabilities(bins)
+        return probas
@@ -0,0 +1,118 @@
+import os
+import glob
+import json
+import sqlite3
+import numpy as np
+from typing import List, Dict
+
+from .metrics import DECISION_THRESHOLD
+
+
+# Directory of the json-files mapping protein identifiers to organisms
+SPECIES_INFO_DIR: str = os.path.join("protein_sequences", "bacterial_species_info")
+# Number of rows inserted per transaction
+STORE_BATCH_SIZE: int = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    identifier TEXT NOT NULL,
+    sequence_number INTEGER NOT NULL,
+    probability REAL NOT NULL,
+    label INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    organism TEXT
+);
+-- Scoring a fasta-file again with the same model replaces its rows (see ´ResultsStore.insert´)
+CREATE UNIQUE INDEX IF NOT EXISTS predictions_unique ON predictions (identifier, source_file, model_version);
+CREATE INDEX IF NOT EXISTS predictions_identifier ON predictions (identifier);
+CREATE INDEX IF NOT EXISTS predictions_probability ON predictions (probability);
+CREATE INDEX IF NOT EXISTS predictions_organism ON predictions (organism);
+"""
+
+
+def load_organisms(directory: str = SPECIES_INFO_DIR) -> Dict[str, str]:
+    """
+        Map of protein identifiers to organisms from the json-files of ´directory´ of the
+        form {identifier: {"definition": ..., "organism": ...}}, other json-files are skipped.
+    """
+    organisms = dict()
+    for file_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(file_path, 'r') as ifile:
+            info = json.load(ifile)
+        for identifier, entry in info.items():
+            if isinstance(entry, dict) and "organism" in entry:
+                organisms.setdefault(identifier, entry["organism"])
+    return organisms
+
+
+def organism_of(identifier: str, organisms: Dict[str, str]) -> str:
+    """
+        Organism of a protein, the identifier is looked up as a whole and by its
+        '|'-separated parts (e.g. 'tr|Q8VPK4|Q8VPK4_PSEFL' -> 'Q8VPK4'), None if unknown.
+    """
+    if identifier in organisms:
+        return organisms[identifier]
+    for part in identifier.split("|"):
+        if part in organisms:
+            return organisms[part]
+    return None
+
+
+class ResultsStore(object):
+    """
+        SQLite database collecting the predictions of many runs, one row per protein sequence with
+        the identifier, the probability, the label, the model version, the source fasta-file and the
+        organism. The rows are inserted in batched transactions, the identifiers, probabilities and
+        organisms are indexed. An identifier has one row per source file and model version, e.g.
+
+            SELECT identifier, organism, probability FROM predictions
+            WHERE label = 1 ORDER BY probability DESC LIMIT 100;
+    """
+
+    def __init__(self, file_path: str, species_info_dir: str = SPECIES_INFO_DIR) -> None:
+        """
+            Creates new instance, the database is created if it does not exist.
+
+            Args:
+                file_path (str): path of the SQLite database
+                species_info_dir (str): directory of the json-files mapping identifiers to organisms
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        self.connection.executescript(SCHEMA)
+        self.organisms = load_organisms(species_info_dir) if os.path.isdir(species_info_dir) else dict()
+
+    def insert(self, identifiers: List[str], probabilities: np.ndarray, model_version: str,
+               source_file: str, batch_size: int = STORE_BATCH_SIZE) -> int:
+        """
+            Insert the predictions of a run. Rows of the same identifier, source file and model version
+            (e.g. of a previous run on the same file) are replaced, of an identifier given several times
+            in the file the last one is kept.
+
+            Args:
+                identifiers (List[str]): identifiers of the protein sequences
+                probabilities (np.ndarray): probabilities of the proteins being secreted
+                model_version (str): version of the model the probabilities were computed with
+                source_file (str): fasta-file the protein sequences were read from
+                batch_size (int): number of rows per transaction
+
+            Returns:
+                int: number of inserted or replaced rows
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64).ravel()
+        if len(identifiers) != len(probabilities):
+            raise ValueError(f"Number of identifiers ({len(identifiers)}) and probabilities ({len(probabilities)}) differ")
+        source_file = os.path.abspath(source_file)
+        for start in range(0, len(probabilities), batch_size):
+            rows = [(str(identifier), start + idx, float(proba), int(proba >= DECISION_THRESHOLD), model_version,
+                     source_file, organism_of(str(identifier), self.organisms))
+                    for idx, (identifier, proba) in enumerate(zip(identifiers[start:start+batch_size],
+                                                                  probabilities[start:start+batch_size]))]
+            # One transaction per batch
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(probabilities)
+
+    def close(self) -> None:
+        self.connection.close()
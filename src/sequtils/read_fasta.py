@@ -1,6 +1,8 @@
 import re, os, sys
 import numpy as np
-from typing import List
+from typing import List, Iterator, Iterable, Generator, Tuple
+
+from .records import SequenceRecords, RecordsBuilder
 
 def read_fasta(file: str) -> np.ndarray:
     """
@@ -14,6 +16,34 @@ def read_fasta(file: str) -> np.ndarray:
             of protein sequences and m being 2 for 2-sized list
             containing the protein identifier (str) and sequence (str)
     """
+    myFasta = list()
+    for name, sequence in parse_fasta(file):
+        myFasta.append([name, sequence])
+    return np.array(myFasta)
+
+
+def read_records(file: str) -> SequenceRecords:
+    """
+        Parses input fasta file into a compact ´SequenceRecords´ container,
+        the records are the same as returned by ´read_fasta´.
+
+        Args:
+            file (str): input fasta-file name
+
+        Returns:
+            SequenceRecords: the protein identifiers and sequences
+    """
+    builder = RecordsBuilder()
+    for name, sequence in parse_fasta(file):
+        builder.append(name, sequence)
+    return builder.build()
+
+
+def parse_fasta(file: str) -> Iterator[Tuple[str, str]]:
+    """
+        Yields the protein identifier and the sequence of each record of a fasta file,
+        characters other than the 20 amino acids are replaced by '-'.
+    """
     if os.path.exists(file) == False:
         print('Error: "' + file + '" does not exist.')
         sys.exit(1)
@@ -26,9 +56,60 @@ def read_fasta(file: str) -> np.ndarray:
         sys.exit(1)
 
     records = records.split('>')[1:]
-    myFasta = list()
     for fasta in records:
         array = fasta.split('\n')
         name, sequence = array[0], re.sub('[^ARNDCQEGHILKMFPSTWYV-]', '-', ''.join(array[1:]).upper())
-        myFasta.append([name, sequence])
-    return np.array(myFasta)
\ No newline at end of file
+        yield name, sequence
+
+
+def iter_fasta(file: str) -> Iterator[Tuple[str, str]]:
+    """
+        Yields the same records as ´parse_fasta´, but reads the file line by line
+        instead of at once, e.g. for fasta-files of whole proteomes.
+    """
+    if os.path.exists(file) == False:
+        print('Error: "' + file + '" does not exist.')
+        sys.exit(1)
+
+    with open(file, 'r') as ifile:
+        num_records = yield from fasta_records(ifile)
+
+    if num_records == 0:
+        print('The input file is not in a valid fasta format.')
+        sys.exit(1)
+
+
+def fasta_records(lines: Iterable[str]) -> Generator[Tuple[str, str], None, int]:
+    """
+        Yields the records of the lines of a fasta file (e.g. an open file or a stream)
+        as ´parse_fasta´ and returns the number of records.
+    """
+    name, sequence, num_records = None, list(), 0
+    for line in lines:
+        # Every '>' starts a record, as the split of ´parse_fasta´
+        parts = line[:-1].split('>') if line.endswith('\n') else line.split('>')
+        if name is not None:
+            sequence.append(parts[0])
+        for part in parts[1:]:
+            if name is not None:
+                yield name, re.sub('[^ARNDCQEGHILKMFPSTWYV-]', '-', ''.join(sequence).upper())
+                num_records += 1
+            name, sequence = part, list()
+    if name is not None:
+        yield name, re.sub('[^ARNDCQEGHILKMFPSTWYV-]', '-', ''.join(sequence).upper())
+        num_records += 1
+    return num_records
+
+
+def read_batches(file: str, batch_size: int) -> Iterator[SequenceRecords]:
+    """
+        Streams a fasta file in ´SequenceRecords´ batches of ´batch_size´ records (see ´iter_fasta´).
+    """
+    builder = RecordsBuilder()
+    for name, sequence in iter_fasta(file):
+        builder.append(name, sequence)
+        if len(builder.seq_ends) == batch_size:
+            yield builder.build()
+            builder = RecordsBuilder()
+    if len(builder.seq_ends) != 0:
+        yield builder.build()
@@ -0,0 +1,189 @@
+import numpy as np
+from typing import List, Tuple, Iterator, Union
+
+
+class SequenceRecords(object):
+    """
+        Compact container of protein records (identifier, sequence).
+
+        All sequences are stored in one contiguous byte buffer (one byte per residue)
+        and all identifiers in another one, the records refer to them by start and end
+        offsets. Slicing a container and extracting the sequence region (´window´) only
+        creates new offset arrays, the buffers are shared. In contrast to the n x 2 unicode
+        array returned by ´read_fasta.read_fasta´, the memory is proportional to the number
+        of residues instead of the number of records times the longest sequence.
+
+        Iterating over the container yields [identifier, sequence] pairs, hence it can be
+        passed to the functions of the encoders module like the unicode array.
+    """
+
+    def __init__(self, sequences: np.ndarray, seq_starts: np.ndarray, seq_ends: np.ndarray,
+                 identifiers: np.ndarray, id_starts: np.ndarray, id_ends: np.ndarray) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                sequences (np.ndarray): uint8 buffer of the (ascii) sequences
+                seq_starts (np.ndarray): start offset of each sequence in the buffer
+                seq_ends (np.ndarray): end offset of each sequence in the buffer
+                identifiers (np.ndarray): uint8 buffer of the (utf-8 encoded) identifiers
+                id_starts (np.ndarray): start offset of each identifier in the buffer
+                id_ends (np.ndarray): end offset of each identifier in the buffer
+        """
+        self.sequences = sequences
+        self.seq_starts = seq_starts
+        self.seq_ends = seq_ends
+        self.identifiers = identifiers
+        self.id_starts = id_starts
+        self.id_ends = id_ends
+
+    @classmethod
+    def from_pairs(cls, records: Union[List[List[str]], np.ndarray]) -> 'SequenceRecords':
+        """
+            Create the container from [identifier, sequence] pairs (e.g. the array of ´read_fasta.read_fasta´).
+        """
+        builder = RecordsBuilder()
+        for name, sequence in records:
+            builder.append(str(name), str(sequence))
+        return builder.build()
+
+    @classmethod
+    def concatenate(cls, parts: List['SequenceRecords']) -> 'SequenceRecords':
+        """
+            Concatenate several containers, replaces ´np.vstack´ of unicode arrays.
+            No containers give an empty container.
+        """
+        parts = [part.compact() for part in parts]
+        if len(parts) == 0:
+            return cls.from_pairs([])
+        seq_shift = np.cumsum([0] + [len(part.sequences) for part in parts[:-1]])
+        id_shift = np.cumsum([0] + [len(part.identifiers) for part in parts[:-1]])
+        return cls(np.concatenate([part.sequences for part in parts]),
+                   np.concatenate([part.seq_starts + shift for part, shift in zip(parts, seq_shift)]),
+                   np.concatenate([part.seq_ends + shift for part, shift in zip(parts, seq_shift)]),
+                   np.concatenate([part.identifiers for part in parts]),
+                   np.concatenate([part.id_starts + shift for part, shift in zip(parts, id_shift)]),
+                   np.concatenate([part.id_ends + shift for part, shift in zip(parts, id_shift)]))
+
+    def __len__(self) -> int:
+        return len(self.seq_starts)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.seq_ends - self.seq_starts
+
+    def name(self, idx: int) -> str:
+        return self.identifiers[self.id_starts[idx]:self.id_ends[idx]].tobytes().decode("utf-8")
+
+    def sequence(self, idx: int) -> str:
+        return self.sequences[self.seq_starts[idx]:self.seq_ends[idx]].tobytes().decode("ascii")
+
+    @property
+    def names(self) -> np.ndarray:
+        return np.array([self.name(idx) for idx in range(len(self))])
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray]) -> Union[List[str], 'SequenceRecords']:
+        """
+            An integer returns the [identifier, sequence] pair of a record, a slice or an index
+            array returns a container sharing the buffers with this one.
+        """
+        if isinstance(key, (int, np.integer)):
+            return [self.name(key), self.sequence(key)]
+        return SequenceRecords(self.sequences, self.seq_starts[key], self.seq_ends[key],
+                               self.identifiers, self.id_starts[key], self.id_ends[key])
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def window(self, seq_range: Tuple[int, int] = None) -> 'SequenceRecords':
+        """
+            Extract the sequence region ´seq[seq_range[0]:seq_range[1]]´ of each sequence longer
+            than ´seq_range[1]-1´ (shorter sequences are kept as they are), as the encoders do.
+            Only the offsets are adjusted, the buffers are shared.
+        """
+        if seq_range is None:
+            return self
+        start, end = seq_range
+        if start < 0 or end < 0:
+            raise ValueError("The sequence range must not contain negative positions: " + str(seq_range))
+        lengths = self.lengths
+        extract = lengths > end-1
+        seq_starts = np.where(extract, self.seq_starts + start, self.seq_starts)
+        seq_ends = np.where(extract, self.seq_starts + end, self.seq_ends)
+        # Empty region if the start lies behind the end
+        seq_starts = np.minimum(seq_starts, seq_ends)
+        return SequenceRecords(self.sequences, seq_starts, seq_ends,
+                               self.identifiers, self.id_starts, self.id_ends)
+
+    def residues(self) -> np.ndarray:
+        """
+            Residues of all records concatenated into one uint8 array.
+        """
+        lengths = self.lengths
+        if len(self) == 0 or lengths.sum() == 0:
+            return np.zeros(0, dtype=np.uint8)
+        # Offset of each residue within its record plus the start of the record
+        row_starts = np.repeat(self.seq_starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return self.sequences[row_starts + np.arange(lengths.sum())]
+
+    def compact(self) -> 'SequenceRecords':
+        """
+            Copy of the container holding only the residues and identifiers it refers to,
+            e.g. before sending a slice or window to another process.
+        """
+        lengths, id_lengths = self.lengths, self.id_ends - self.id_starts
+        if len(self) != 0 and self.seq_starts[0] == 0 and np.array_equal(self.seq_starts[1:], self.seq_ends[:-1]) \
+                and self.seq_ends[-1] == len(self.sequences) and self.id_starts[0] == 0 \
+                and np.array_equal(self.id_starts[1:], self.id_ends[:-1]) and self.id_ends[-1] == len(self.identifiers):
+            return self
+        id_view = SequenceRecords(self.identifiers, self.id_starts, self.id_ends,
+                                  self.identifiers, self.id_starts, self.id_ends)
+        seq_ends, id_ends = np.cumsum(lengths), np.cumsum(id_lengths)
+        return SequenceRecords(self.residues(), seq_ends - lengths, seq_ends,
+                               id_view.residues(), id_ends - id_lengths, id_ends)
+
+    def __getstate__(self) -> dict:
+        # Only pickle the part of the buffers the container refers to
+        return self.compact().__dict__.copy()
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+
+    def to_array(self) -> np.ndarray:
+        """
+            n x 2 unicode array of [identifier, sequence] pairs as returned by ´read_fasta.read_fasta´.
+        """
+        return np.array([self[idx] for idx in range(len(self))])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.__dict__.values())
+
+
+class RecordsBuilder(object):
+    """
+        Appends records to growing byte buffers and builds a ´SequenceRecords´ container.
+    """
+
+    def __init__(self) -> None:
+        self.sequences = bytearray()
+        self.identifiers = bytearray()
+        self.seq_ends = list()
+        self.id_ends = list()
+
+    def append(self, name: str, sequence: str) -> None:
+        self.identifiers += name.encode("utf-8")
+        self.sequences += sequence.encode("ascii", errors="replace")
+        self.id_ends.append(len(self.identifiers))
+        self.seq_ends.append(len(self.sequences))
+
+    def build(self) -> SequenceRecords:
+        seq_ends = np.array(self.seq_ends, dtype=np.int64)
+        id_ends = np.array(self.id_ends, dtype=np.int64)
+        return SequenceRecords(np.frombuffer(bytes(self.sequences), dtype=np.uint8),
+                               np.concatenate(([0], seq_ends[:-1])).astype(np.int64) if len(seq_ends) else seq_ends,
+                               seq_ends,
+                               np.frombuffer(bytes(self.identifiers), dtype=np.uint8),
+                               np.concatenate(([0], id_ends[:-1])).astype(np.int64) if len(id_ends) else id_ends,
+                               id_ends)
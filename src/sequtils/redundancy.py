@@ -0,0 +1,194 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+from .records import SequenceRecords
+
+
+# Codes of the 20 amino acids, k-mers containing other residues (e.g. '-') are skipped
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+KMER_CODES = np.full(256, -1, dtype=np.int64)
+for _code, _aa in enumerate(AMINO_ACIDS):
+    KMER_CODES[ord(_aa)] = _code
+# Below this sequence identity shared k-mers are no reliable evidence of homology (cd-hit needs
+# psi-cd-hit, i.e. alignments, for such thresholds as well)
+MIN_IDENTITY: float = 0.5
+# Number of hash functions of the MinHash sketches
+NUM_PERMUTATIONS: int = 128
+# Multiply-shift hashing of 64-bit k-mer codes
+_HASH_SEED: int = 20230417
+
+
+def default_kmer_size(identity: float) -> int:
+    """
+        k-mer size for a sequence identity threshold, in the spirit of the word sizes of cd-hit
+        (5 for >= 0.7, 4 for >= 0.5 and 3 below).
+    """
+    if identity >= 0.7:
+        return 5
+    if identity >= 0.5:
+        return 4
+    return 3
+
+
+def kmer_sets(records: SequenceRecords, k: int) -> List[np.ndarray]:
+    """
+        Sorted distinct k-mer codes of each sequence (k-mers of the 20 amino acids only).
+    """
+    codes = KMER_CODES[records.residues()]
+    lengths = records.lengths
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64) if len(lengths) else np.zeros(0, dtype=np.int64)
+    num_kmers = np.maximum(lengths - k + 1, 0)
+    # Positions of the first residue of each k-mer within the concatenated residues
+    kmer_rows = np.repeat(np.arange(len(records)), num_kmers)
+    positions = np.repeat(starts, num_kmers) + np.arange(num_kmers.sum()) \
+        - np.repeat(np.concatenate(([0], np.cumsum(num_kmers)[:-1])).astype(np.int64), num_kmers)
+    values = np.zeros(len(positions), dtype=np.int64)
+    valid = np.ones(len(positions), dtype=bool)
+    for offset in range(k):
+        residue = codes[positions + offset]
+        valid &= residue >= 0
+        values = values * len(AMINO_ACIDS) + np.maximum(residue, 0)
+    # Sort by sequence, then by k-mer, and drop duplicates within a sequence
+    kmer_rows, values = kmer_rows[valid], values[valid]
+    order = np.lexsort((values, kmer_rows))
+    kmer_rows, values = kmer_rows[order], values[order]
+    distinct = np.ones(len(values), dtype=bool)
+    distinct[1:] = (values[1:] != values[:-1]) | (kmer_rows[1:] != kmer_rows[:-1])
+    kmer_rows, values = kmer_rows[distinct], values[distinct]
+    bounds = np.searchsorted(kmer_rows, np.arange(len(records) + 1))
+    return [values[bounds[idx]:bounds[idx+1]] for idx in range(len(records))]
+
+
+def minhash_sketches(kmers: List[np.ndarray], num_permutations: int = NUM_PERMUTATIONS) -> np.ndarray:
+    """
+        MinHash sketch of each k-mer set (n x ´num_permutations´ uint64), sequences without
+        k-mers get the maximal value in every position, i.e. they match no other sequence.
+    """
+    rng = np.random.default_rng(_HASH_SEED)
+    multipliers = rng.integers(1, 2**63, num_permutations, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2**63, num_permutations, dtype=np.uint64)
+    sizes = np.array([len(values) for values in kmers], dtype=np.int64)
+    values = np.concatenate(kmers).astype(np.uint64) if len(kmers) else np.zeros(0, dtype=np.uint64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    sketches = np.full((len(kmers), num_permutations), np.iinfo(np.uint64).max, dtype=np.uint64)
+    nonempty = sizes > 0
+    if len(values) == 0:
+        return sketches
+    for perm in range(num_permutations):
+        # Wrap-around multiplication is the intended hash function
+        hashes = values * multipliers[perm] + offsets[perm]
+        sketches[nonempty, perm] = np.minimum.reduceat(hashes, starts[nonempty])
+    return sketches
+
+
+def lsh_bands(threshold: float, num_permutations: int = NUM_PERMUTATIONS) -> Tuple[int, int]:
+    """
+        Number of bands and rows per band of the LSH index such that pairs with a Jaccard similarity
+        of ´threshold´ become candidates with high probability: the most rows per band (fewest
+        candidates) whose S-curve threshold (1/bands)^(1/rows) stays below 0.7 * ´threshold´.
+    """
+    best = (num_permutations, 1)
+    for rows in range(1, num_permutations + 1):
+        bands = num_permutations // rows
+        if (1.0 / bands) ** (1.0 / rows) <= 0.7 * threshold:
+            best = (bands, rows)
+    return best
+
+
+def containment(shared: np.ndarray, query_size: int, reference_sizes: np.ndarray, k: int) -> np.ndarray:
+    """
+        Fraction of the k-mers of a query contained in references given the numbers of shared k-mers,
+        corrected for the k-mers shared by chance: (c - q) / (1 - q) with q = |reference| / 20^k.
+    """
+    chance = np.minimum(reference_sizes / float(len(AMINO_ACIDS) ** k), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(chance < 1.0, (shared / max(query_size, 1) - chance) / (1.0 - chance), 0.0)
+
+
+def cluster(records: SequenceRecords, identity: float, k: int = None,
+            num_permutations: int = NUM_PERMUTATIONS) -> np.ndarray:
+    """
+        Greedy incremental clustering as done by cd-hit: the sequences are processed from the longest to the
+        shortest, a sequence joins the cluster of the most similar representative (as cd-hit -g 1) or becomes
+        the representative of a new cluster. A sequence is similar to a representative if the fraction of its
+        k-mers contained in the representative (corrected for chance) is at least identity^k, the expected
+        fraction of conserved k-mers at this sequence identity.
+
+        Candidate representatives are looked up in an LSH index over the MinHash sketches of the representatives
+        and verified on the exact k-mer sets. At low thresholds LSH would need single-row bands, i.e. any shared
+        hash value makes a candidate; the shared k-mers with all representatives are then counted exactly with an
+        inverted k-mer index instead (the short word filter of cd-hit).
+
+        Args:
+            records (SequenceRecords): the protein sequences
+            identity (float): sequence identity threshold, e.g. 0.9
+            k (int): k-mer size, see ´default_kmer_size´ if None
+            num_permutations (int): number of hash functions of the MinHash sketches
+
+        Returns:
+            np.ndarray: index of the representative of each sequence (its own index for representatives)
+    """
+    k = default_kmer_size(identity) if k is None else k
+    threshold = identity ** k
+    kmers = kmer_sets(records, k)
+    sizes = np.array([len(values) for values in kmers], dtype=np.int64)
+    # A contained fraction c of a set of size a in a set of size b >= a means Jaccard >= c*a / (a+b-c*a),
+    # the index finds pairs down to a Jaccard similarity of threshold / 2 (sizes up to about twice the query)
+    bands, rows = lsh_bands(max(threshold / 2, 1.0 / num_permutations), num_permutations)
+    use_lsh = rows > 1
+    if use_lsh:
+        sketches = minhash_sketches(kmers, num_permutations)
+        lsh_index: List[Dict[bytes, List[int]]] = [dict() for _ in range(bands)]
+    else:
+        kmer_index: Dict[int, List[int]] = dict()
+    representatives = np.arange(len(records))
+    # Longest first, ties in the order of the input
+    for idx in np.argsort(-records.lengths, kind="mergesort"):
+        candidates, shared = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if use_lsh:
+            keys = [sketches[idx, band*rows:(band+1)*rows].tobytes() for band in range(bands)]
+            hits = [lsh_index[band][key] for band, key in enumerate(keys) if key in lsh_index[band]]
+            if sizes[idx] != 0 and len(hits) != 0:
+                candidates = np.unique(np.concatenate(hits))
+                shared = np.array([np.count_nonzero(np.isin(kmers[idx], kmers[candidate], assume_unique=True))
+                                   for candidate in candidates], dtype=np.int64)
+        else:
+            hits = [kmer_index[kmer] for kmer in kmers[idx].tolist() if kmer in kmer_index]
+            if len(hits) != 0:
+                candidates, shared = np.unique(np.concatenate(hits), return_counts=True)
+        values = containment(shared, sizes[idx], sizes[candidates], k)
+        if len(values) != 0 and values.max() >= threshold:
+            representatives[idx] = candidates[int(np.argmax(values))]
+        elif use_lsh:
+            for band, key in enumerate(keys):
+                lsh_index[band].setdefault(key, list()).append(idx)
+        else:
+            for kmer in kmers[idx].tolist():
+                kmer_index.setdefault(kmer, list()).append(idx)
+    return representatives
+
+
+def reduce_redundancy(records: SequenceRecords, identities: List[float], k: int = None,
+                      num_permutations: int = NUM_PERMUTATIONS) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+        Cluster the sequences at decreasing identity thresholds, each step clusters the
+        representatives of the previous one (as the cd-hit / psi-cd-hit cascade 90% -> 60% -> 30%).
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: for each threshold the indices of the representatives
+            and the index of the representative of every input sequence
+    """
+    if min(identities) < MIN_IDENTITY or max(identities) > 1:
+        raise ValueError(f"The identity thresholds must be between {MIN_IDENTITY} and 1, k-mer similarity does not "
+                         + "approximate lower sequence identities (use alignment based tools such as psi-cd-hit)")
+    current = np.arange(len(records))
+    assignment = np.arange(len(records))
+    results = list()
+    for identity in sorted(identities, reverse=True):
+        representatives = cluster(records[current], identity, k, num_permutations)
+        # Map the representatives of the subset back to the input, members follow their representative
+        mapping = dict(zip(current, current[representatives]))
+        assignment = np.array([mapping[rep] for rep in assignment], dtype=np.int64)
+        current = current[np.unique(representatives)]
+        results.append((current, assignment.copy()))
+    return results
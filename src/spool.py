@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+import numpy as np
+from concurrent.futures import Executor
+from typing import Dict, List, Tuple
+
+from .sequtils.read_fasta import fasta_records
+from .sequtils.records import SequenceRecords, RecordsBuilder
+from .execution import execute, make_pool, BACKENDS
+from .cost_model import load_costs, plan_execution
+from .predictor import model_scoring, model_version, load_encoder, load_model
+from .cascade import CascadeModel
+from .metrics import DECISION_THRESHOLD
+from .pipe import open_input
+from .telemetry import Telemetry
+
+
+# Fasta-files of the inbox that are scored, optionally gzip compressed ('.gz' appended)
+SPOOL_EXTENSIONS: Tuple[str, ...] = (".fasta", ".fa", ".faa", ".fas", ".fna")
+# Seconds between two scans of the inbox when it is empty
+SPOOL_POLL_INTERVAL: float = 0.5
+# Files modified less than this many seconds ago are not claimed, they may still be written
+SPOOL_SETTLE_SECONDS: float = 1.0
+# Hidden subdirectories of the inbox (on the same file system, such that moving files is atomic)
+CLAIMED_FOLDER = ".claimed"
+DONE_FOLDER = ".done"
+FAILED_FOLDER = ".failed"
+# Files written to the outbox for an input file '{name}'
+RESULTS_SUFFIX = ".results.tsv"
+DONE_SUFFIX = ".done"
+ERROR_SUFFIX = ".error"
+
+
+def is_spooled(file_name: str) -> bool:
+    """
+        Whether a file of the inbox is a fasta-file to score, hidden and temporary files are ignored.
+    """
+    name = file_name.lower()
+    name = name[:-3] if name.endswith(".gz") else name
+    return not file_name.startswith(".") and name.endswith(SPOOL_EXTENSIONS)
+
+
+def sha256(file: str) -> str:
+    digest = hashlib.sha256()
+    with open(file, 'rb') as ifile:
+        for block in iter(lambda: ifile.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_spooled(file: str) -> SequenceRecords:
+    """
+        Records of a fasta-file, gzip compressed or not (see ´pipe.open_input´).
+    """
+    builder = RecordsBuilder()
+    with open(file, 'rb') as ifile:
+        for name, sequence in fasta_records(open_input(ifile)):
+            builder.append(name, sequence)
+    if len(builder.seq_ends) == 0:
+        raise ValueError("The input file is not in a valid fasta format")
+    return builder.build()
+
+
+def write_atomically(file: str, text: str) -> None:
+    with open(file + ".tmp", 'w') as ofile:
+        ofile.write(text)
+    os.replace(file + ".tmp", file)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by another user
+        return True
+    return True
+
+
+class SpoolDaemon(object):
+    """
+        Watches an inbox directory for fasta-files (e.g. proteomes dropped by a sequencing pipeline) and
+        scores them one by one with the model loaded once and pools of workers kept warm between the files,
+        i.e. the overhead per file is a few milliseconds instead of the startup of a new process.
+
+        A file is claimed by renaming it into the hidden folder '.claimed' of the inbox, the name gets the
+        host and the process id of the daemon. Renaming is atomic, hence several daemons (on one or more
+        hosts) can watch the same inbox and every file is claimed by exactly one of them. The results
+        ('{name}.results.tsv': identifier, probability, prediction) and then the done marker ('{name}.done',
+        json: hash of the file, model version, number of sequences and positives, seconds) are written
+        atomically to the outbox, finally the file is moved to '.done' of the inbox (or deleted). Files
+        that can not be scored are moved to '.failed' and get an error marker ('{name}.error').
+
+        On startup and whenever the inbox is empty, claims of daemons of this host that are no longer
+        running (e.g. killed during a file) are moved back to the inbox. A claimed file whose done marker
+        has the same hash and model version is not scored again (e.g. the daemon stopped after the marker
+        was written), hence restarts never duplicate finished work.
+    """
+
+    def __init__(self, inbox: str, outbox: str = None, num_cores: int = 1, backend: str = None,
+                 quantized: bool = False, cascade: Tuple[int, ...] = None, delete_inputs: bool = False,
+                 poll_interval: float = SPOOL_POLL_INTERVAL, settle_seconds: float = SPOOL_SETTLE_SECONDS,
+                 telemetry: Telemetry = None) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                inbox (str): directory watched for fasta-files
+                outbox (str): directory the results and the markers are written to, '{inbox}/results' if None
+                num_cores (int): maximal number of workers of the pools, the execution of each file (serial,
+                                 thread or process and the number of workers) is chosen by the cost model
+                backend (str): 'serial', 'thread' or 'process', chosen per file by the cost model if None
+                quantized (bool): whether to score quantized features (see ´quantized.QuantizedModel´)
+                cascade (Tuple[int, ...]): if set, the stages of cascade scoring (see ´cascade.CascadeModel´)
+                delete_inputs (bool): whether to delete scored files instead of moving them to '.done'
+                poll_interval (float): seconds between two scans of an empty inbox
+                settle_seconds (float): files modified more recently are not claimed yet
+                telemetry (Telemetry): if set, the scored sequences and the files waiting in the inbox are reported
+        """
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', choose one of: " + ", ".join(BACKENDS))
+        self.inbox = inbox
+        self.outbox = outbox if outbox is not None else os.path.join(inbox, "results")
+        self.num_cores = max(int(num_cores), 1)
+        self.backend = backend
+        self.delete_inputs = delete_inputs
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.telemetry = telemetry
+        self.owner = f"{socket.gethostname()}.{os.getpid()}"
+        for folder in (self.outbox, *(os.path.join(inbox, name) for name in (CLAIMED_FOLDER, DONE_FOLDER, FAILED_FOLDER))):
+            os.makedirs(folder, exist_ok=True)
+        # Model, encoder and scoring function stay loaded for all files
+        self.encoders, self.score, self.finalizers, self.scorer = model_scoring(None, quantized, cascade)
+        self.model_version = model_version()
+        self.costs = load_costs(load_encoder(), load_model()) if self.num_cores > 1 and backend != "serial" else None
+        # Backend -> warm pool, started on first use
+        self.pools: Dict[str, Executor] = dict()
+        self.stopped = threading.Event()
+        self.num_files = 0
+
+    def claimed_path(self, name: str) -> str:
+        return os.path.join(self.inbox, CLAIMED_FOLDER, f"{name}@{self.owner}")
+
+    def recover(self) -> List[str]:
+        """
+            Move the files claimed by daemons of this host that are no longer running back to the inbox.
+        """
+        host, recovered = socket.gethostname(), list()
+        claimed_folder = os.path.join(self.inbox, CLAIMED_FOLDER)
+        for claim in sorted(os.listdir(claimed_folder)):
+            name, _, owner = claim.rpartition("@")
+            claim_host, _, pid = owner.rpartition(".")
+            if name == "" or claim_host != host or not pid.isdigit() or pid_alive(int(pid)):
+                continue
+            try:
+                os.rename(os.path.join(claimed_folder, claim), os.path.join(self.inbox, name))
+                recovered.append(name)
+            except FileNotFoundError:
+                # Recovered by another daemon
+                continue
+        return recovered
+
+    def report_recovered(self) -> None:
+        for name in self.recover():
+            print(f"{name}: claim of a stopped daemon moved back to the inbox")
+
+    def pending(self) -> List[str]:
+        """
+            Fasta-files of the inbox that are ready to be claimed, oldest first.
+        """
+        now, files = time.time(), list()
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if not is_spooled(entry.name) or not entry.is_file():
+                    continue
+                try:
+                    modified = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if now - modified >= self.settle_seconds:
+                    files.append((modified, entry.name))
+        return [name for _, name in sorted(files)]
+
+    def claim(self) -> str:
+        """
+            Claim the oldest file of the inbox, its name or None if there is none (or others claimed them).
+        """
+        pending = self.pending()
+        if self.telemetry is not None:
+            self.telemetry.set_queue_depth("inbox", len(pending))
+        for name in pending:
+            try:
+                os.rename(os.path.join(self.inbox, name), self.claimed_path(name))
+                return name
+            except FileNotFoundError:
+                # Claimed by another daemon
+                continue
+        return None
+
+    def is_done(self, name: str, digest: str) -> bool:
+        marker = os.path.join(self.outbox, name + DONE_SUFFIX)
+        try:
+            with open(marker, 'r') as ifile:
+                done = json.load(ifile)
+        except (OSError, ValueError):
+            return False
+        return done.get("sha256") == digest and done.get("model_version") == self.model_version
+
+    def release(self, name: str, folder: str) -> None:
+        """
+            Move a claimed file to a folder of the inbox ('.done' or '.failed'), or delete it once done.
+        """
+        if folder == DONE_FOLDER and self.delete_inputs:
+            os.remove(self.claimed_path(name))
+        else:
+            os.replace(self.claimed_path(name), os.path.join(self.inbox, folder, name))
+
+    def predict(self, records: SequenceRecords) -> np.ndarray:
+        """
+            Probabilities of the positive label, with the execution chosen by the cost model on the warm pools.
+        """
+        backend, num_workers, chunk_size = "serial", 1, len(records)
+        if self.costs is not None:
+            num_residues = sum(int(encoder.windows(records).lengths.sum()) for encoder in self.encoders)
+            plan = plan_execution(len(records), num_residues, self.num_cores, self.costs, num_encoders=len(self.encoders),
+                                  backends=BACKENDS if self.backend is None else (self.backend,))
+            backend, num_workers, chunk_size = plan.backend, plan.num_workers, plan.chunk_size
+        executor = None
+        if backend != "serial":
+            if backend not in self.pools:
+                self.pools[backend] = make_pool(backend, self.num_cores, self.encoders)
+            executor = self.pools[backend]
+        return execute(records, self.encoders, self.score, backend, num_workers, chunk_size,
+                       finalizers=self.finalizers, telemetry=self.telemetry, executor=executor)[:, 0]
+
+    def process(self, name: str) -> dict:
+        """
+            Score a claimed file, write its results and done marker and release it.
+
+            Returns:
+                dict: the done marker, or the error marker if the file could not be scored
+        """
+        start = time.perf_counter()
+        path = self.claimed_path(name)
+        digest = sha256(path)
+        if self.is_done(name, digest):
+            self.release(name, DONE_FOLDER)
+            print(f"{name}: already scored, see {os.path.join(self.outbox, name + DONE_SUFFIX)}")
+            return None
+        try:
+            records = read_spooled(path)
+            if isinstance(self.scorer, CascadeModel):
+                self.scorer.reset_counts()
+            probabilities = self.predict(records)
+            write_atomically(os.path.join(self.outbox, name + RESULTS_SUFFIX),
+                             "".join(f"{identifier}\t{proba:.6f}\t{proba >= DECISION_THRESHOLD}\n"
+                                     for identifier, proba in zip(records.names, probabilities)))
+        except Exception as e:
+            error = {"input": name, "sha256": digest, "error": f"{type(e).__name__}: {e}",
+                     "model_version": self.model_version, "owner": self.owner, "finished": time.time()}
+            write_atomically(os.path.join(self.outbox, name + ERROR_SUFFIX), json.dumps(error, indent=4))
+            self.release(name, FAILED_FOLDER)
+            print(f"{name}: FAILED ({error['error']}), moved to {os.path.join(self.inbox, FAILED_FOLDER)}")
+            return error
+        done = {"input": name, "sha256": digest, "results": name + RESULTS_SUFFIX, "num_sequences": len(records),
+                "num_positives": int(np.count_nonzero(probabilities >= DECISION_THRESHOLD)),
+                "model_version": self.model_version, "owner": self.owner,
+                "seconds": time.perf_counter() - start, "finished": time.time()}
+        # The marker is written last, a file without marker is scored again after a restart
+        write_atomically(os.path.join(self.outbox, name + DONE_SUFFIX), json.dumps(done, indent=4))
+        self.release(name, DONE_FOLDER)
+        self.num_files += 1
+        print(f"{name}: {done['num_sequences']} sequences, {done['num_positives']} positives "
+              f"in {done['seconds'] * 1000:.1f} ms" + (f" ({self.scorer.summary()})" if isinstance(self.scorer, CascadeModel) else ""))
+        return done
+
+    def run(self, once: bool = False) -> int:
+        """
+            Score the files of the inbox until ´stop´ is called (or, if ´once´, until the inbox is empty).
+
+            Returns:
+                int: number of scored files
+        """
+        if self.telemetry is not None:
+            self.telemetry.begin("spool")
+        try:
+            self.report_recovered()
+            while not self.stopped.is_set():
+                name = self.claim()
+                if name is not None:
+                    self.process(name)
+                elif once:
+                    break
+                else:
+                    # Claims of daemons stopped in the meantime are picked up once the inbox is empty
+                    self.report_recovered()
+                    self.stopped.wait(self.poll_interval)
+        finally:
+            self.close()
+        return self.num_files
+
+    def stop(self) -> None:
+        """
+            Stop after the current file (e.g. from a signal handler).
+        """
+        self.stopped.set()
+
+    def close(self) -> None:
+        # Pending chunks were cancelled by ´execution.execute´ (shutdown(cancel_futures=True) needs Python 3.9)
+        for executor in self.pools.values():
+            executor.shutdown()
+        self.pools = dict()
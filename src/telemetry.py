@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import threading
+from typing import Dict, TextIO
+
+
+# Seconds between two progress lines and between two writes of the metrics file
+PROGRESS_INTERVAL: float = 2.0
+METRICS_INTERVAL: float = 10.0
+METRICS_PREFIX: str = "effectivet3"
+
+
+def format_duration(seconds: float) -> str:
+    if seconds is None:
+        return "--:--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class Telemetry(object):
+    """
+        Progress and throughput of a long run: the number of processed items (e.g. sequences or
+        candidate evaluations) of the current phase, items per second, ETA, the depth of the queue
+        in front of each stage and the utilization of each stage, i.e. the time its workers were
+        busy relative to the elapsed time and the number of workers.
+
+        A background thread prints a progress line every PROGRESS_INTERVAL seconds (to stderr) and
+        writes the metrics every METRICS_INTERVAL seconds to a file, in the Prometheus text format
+        if the file ends with '.prom' (e.g. for the textfile collector of the node exporter), as json
+        otherwise. The file is replaced atomically. All methods are thread-safe.
+    """
+
+    def __init__(self, job: str, show_progress: bool = True, metrics_file: str = None,
+                 progress_interval: float = PROGRESS_INTERVAL, metrics_interval: float = METRICS_INTERVAL,
+                 stream: TextIO = None) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                job (str): name of the run, e.g. 'effectivet3'
+                show_progress (bool): whether to print the progress line
+                metrics_file (str): file the metrics are written to, none if None
+                progress_interval (float): seconds between two progress lines
+                metrics_interval (float): seconds between two writes of the metrics file
+                stream (TextIO): stream the progress line is printed to, stderr if None
+        """
+        self.job = job
+        self.show_progress = show_progress
+        self.metrics_file = metrics_file
+        self.progress_interval = progress_interval
+        self.metrics_interval = metrics_interval
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start_time = time.monotonic()
+        self.begin("run")
+
+    def begin(self, phase: str, total: int = None, unit: str = "sequences") -> None:
+        """
+            Start a new phase of the run, the counters are reset.
+
+            Args:
+                phase (str): name of the phase, e.g. 'predict' or 'genetic algorithm'
+                total (int): number of items of the phase if known (or estimated), for the ETA
+                unit (str): what the items are
+        """
+        with self.lock:
+            self.phase, self.total, self.unit = phase, total, unit
+            self.processed = 0
+            self.phase_start = time.monotonic()
+            # stage -> [busy seconds, number of workers], stage -> queue depth
+            self.busy: Dict[str, list] = dict()
+            self.queues: Dict[str, int] = dict()
+
+    def advance(self, num_items: int = 1) -> None:
+        with self.lock:
+            self.processed += num_items
+
+    def record_busy(self, stage: str, seconds: float, num_workers: int = 1) -> None:
+        """
+            Add the time a worker of a stage was busy.
+        """
+        with self.lock:
+            busy = self.busy.setdefault(stage, [0.0, num_workers])
+            busy[0] += seconds
+            busy[1] = num_workers
+
+    def set_queue_depth(self, stage: str, depth: int) -> None:
+        with self.lock:
+            self.queues[stage] = depth
+
+    def snapshot(self) -> dict:
+        """
+            Current metrics of the phase.
+        """
+        with self.lock:
+            now = time.monotonic()
+            elapsed = max(now - self.phase_start, 1e-9)
+            rate = self.processed / elapsed
+            eta = None
+            if self.total is not None and rate > 0:
+                eta = max(self.total - self.processed, 0) / rate
+            return {
+                "job": self.job,
+                "phase": self.phase,
+                "unit": self.unit,
+                "processed": self.processed,
+                "total": self.total,
+                "elapsed_seconds": elapsed,
+                "run_seconds": now - self.start_time,
+                "rate": rate,
+                "eta_seconds": eta,
+                "queue_depth": dict(self.queues),
+                "utilization": {stage: min(seconds / (elapsed * max(workers, 1)), 1.0)
+                                for stage, (seconds, workers) in self.busy.items()},
+                "timestamp": time.time(),
+            }
+
+    def progress_line(self, metrics: dict) -> str:
+        total = f"/{metrics['total']}" if metrics["total"] is not None else ""
+        percent = f" ({min(metrics['processed'] / metrics['total'], 1.0):.1%})" if metrics["total"] else ""
+        line = (f"[{metrics['job']}] {metrics['phase']}: {metrics['processed']}{total} {metrics['unit']}{percent}, "
+                f"{metrics['rate']:.1f} {metrics['unit']}/s, ETA {format_duration(metrics['eta_seconds'])}")
+        if len(metrics["queue_depth"]) != 0:
+            line += " | queued " + " ".join(f"{stage} {depth}" for stage, depth in metrics["queue_depth"].items())
+        if len(metrics["utilization"]) != 0:
+            line += " | busy " + " ".join(f"{stage} {util:.0%}" for stage, util in metrics["utilization"].items())
+        return line
+
+    def prometheus(self, metrics: dict) -> str:
+        """
+            Metrics in the Prometheus text exposition format.
+        """
+        labels = f'job="{metrics["job"]}",phase="{metrics["phase"]}",unit="{metrics["unit"]}"'
+        gauges = [("processed", "Processed items of the current phase", metrics["processed"]),
+                  ("total", "Items of the current phase (estimated), -1 if unknown",
+                   metrics["total"] if metrics["total"] is not None else -1),
+                  ("rate", "Processed items per second", metrics["rate"]),
+                  ("eta_seconds", "Estimated seconds until the current phase is done, -1 if unknown",
+                   metrics["eta_seconds"] if metrics["eta_seconds"] is not None else -1),
+                  ("elapsed_seconds", "Seconds since the start of the current phase", metrics["elapsed_seconds"]),
+                  ("last_update_timestamp_seconds", "Unix time of the last update", metrics["timestamp"])]
+        lines = list()
+        for name, description, value in gauges:
+            lines += [f"# HELP {METRICS_PREFIX}_{name} {description}", f"# TYPE {METRICS_PREFIX}_{name} gauge",
+                      f"{METRICS_PREFIX}_{name}{{{labels}}} {value}"]
+        for name, description, values in (("queue_depth", "Items waiting in front of a stage", metrics["queue_depth"]),
+                                          ("utilization", "Busy time of the workers of a stage relative to the elapsed time",
+                                           metrics["utilization"])):
+            lines += [f"# HELP {METRICS_PREFIX}_{name} {description}", f"# TYPE {METRICS_PREFIX}_{name} gauge"]
+            lines += [f'{METRICS_PREFIX}_{name}{{{labels},stage="{stage}"}} {value}' for stage, value in values.items()]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, metrics: dict = None) -> None:
+        if self.metrics_file is None:
+            return
+        metrics = self.snapshot() if metrics is None else metrics
+        with open(self.metrics_file + ".tmp", 'w') as ofile:
+            if self.metrics_file.endswith(".prom"):
+                ofile.write(self.prometheus(metrics))
+            else:
+                json.dump(metrics, ofile, indent=4)
+        os.replace(self.metrics_file + ".tmp", self.metrics_file)
+
+    def report(self, write: bool = True) -> None:
+        metrics = self.snapshot()
+        if self.show_progress:
+            stream = self.stream if self.stream is not None else sys.stderr
+            stream.write(self.progress_line(metrics) + "\n")
+            stream.flush()
+        if write:
+            self.write_metrics(metrics)
+
+    def _run(self) -> None:
+        last_write = time.monotonic()
+        while not self.stopped.wait(self.progress_interval):
+            write = time.monotonic() - last_write >= self.metrics_interval
+            if write:
+                last_write = time.monotonic()
+            self.report(write=write)
+
+    def start(self) -> 'Telemetry':
+        """
+            Start reporting in the background.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+            Stop reporting and report the final state.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.report()
+
+    def __enter__(self) -> 'Telemetry':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,20 +1,30 @@
 # Standard packages
 import os
 import json
-from typing import Tuple
+import time
+from typing import Tuple, Any, List
 
 # External packages / libraries
 import yaml  # used to load configurations in 'training_config.yaml' for training model
 import numpy as np
 import lightgbm as lgbm  # classifier
-from sklearn_genetic import GASearchCV  # heuristic optimization
 from sklearn_genetic.space import Categorical, Integer, Continuous
 # deterministic optimization
-from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, StratifiedShuffleSplit
 
 # Own package imports
 from .sequtils import read_fasta
-from .encoders.encode import encode
+from .sequtils.records import SequenceRecords
+from .encoders.feature_spec import compile_spec, CompiledEncoder, DEFAULT_FEATURE_SPEC
+from .training.fitness_cache import FitnessCache, CachedGASearchCV, PARENT_CACHE_ARGS  # heuristic optimization
+from .training.evaluation import fold_metrics, METRICS
+from .training.hard_negatives import mine_hard_negatives, MINING_BATCH_SIZE
+from .execution import encode_parallel
+from .telemetry import Telemetry
+
+
+# Continue boosting the trees of the existing model or refit it with its hyperparameters
+WARM_START_MODES = ("continue", "refit")
 
 
 class Trainer(object):
@@ -29,11 +39,19 @@ class Trainer(object):
     # Neg. : pos. class ratio
     scale_pos_weight: float = None
     # A list of protein sequences and their identifiers
-    protein_sequences: np.ndarray = None
+    protein_sequences: SequenceRecords = None
     # The true labels
     labels: np.ndarray = None
     # encoded features of the protein sequences
     features: np.ndarray = None
+    # Encoder compiled from the feature specification
+    encoder: CompiledEncoder = None
+    # Optional executor distributing the candidate evaluations to workers
+    executor: Any = None
+    # Optional progress and throughput reporting of the phases of the training
+    telemetry: Telemetry = None
+    # Maximal number of processes encoding the protein sequences
+    num_cores: int = 1
     # Training parameters / configuration
     TRAINING_CONFIG: dict = dict()
     try:
@@ -46,14 +64,45 @@ class Trainer(object):
         print("ERROR MESSAGE: ", str(e))
 
     def __init__(self, pos_fasta_file: str, neg_fasta_file: str,
-                 seq_range: Tuple[int, int] = None) -> None:
+                 seq_range: Tuple[int, int] = None, executor: Any = None,
+                 feature_spec: dict = None, telemetry: Telemetry = None, num_cores: int = 1) -> None:
         """
             Creates new instance.
+
+            Args:
+                pos_fasta_file (str): fasta-file containing the positive protein sequences
+                neg_fasta_file (str): fasta-file containing the negative protein sequences
+                seq_range (Tuple[int, int]): the sequence region to use for prediction
+                executor (DistributedExecutor): if set, the cross validation of the candidate
+                                                parameters is distributed to its workers
+                feature_spec (dict): features to train on (see ´encoders.feature_spec´),
+                                     if None then the 85 features of Effective T3 are used
+                telemetry (Telemetry): if set, the progress of the encoding, of the optimization steps
+                                       and of the hard-negative mining is reported
+                num_cores (int): maximal number of processes encoding the protein sequences in chunks
+                                 (see ´execution.encode_parallel´)
         """
-        positive_sequences = read_fasta.read_fasta(pos_fasta_file)
-        negative_sequences = read_fasta.read_fasta(neg_fasta_file)
+        positive_sequences = read_fasta.read_records(pos_fasta_file)
+        negative_sequences = read_fasta.read_records(neg_fasta_file)
 
-        self.protein_sequences = np.vstack((
+        # Sequence region to use for prediction
+        self.seq_range = seq_range
+        # The hyperparameter space to optimize over
+        with open('src/training/hyperparameter_space.json', 'r') as ifile:
+            self.hyperparameter_space = json.load(ifile)
+        # The sequence region given here takes precedence over the one of the feature specification
+        feature_spec = DEFAULT_FEATURE_SPEC if feature_spec is None else feature_spec
+        self.encoder = compile_spec(dict(feature_spec, seq_range=list(seq_range) if seq_range is not None else None))
+        self.telemetry = telemetry
+        self.num_cores = num_cores
+        self.__set_sequences(positive_sequences, negative_sequences)
+        self.executor = executor
+
+    def __set_sequences(self, positive_sequences: SequenceRecords, negative_sequences: SequenceRecords) -> None:
+        """
+            Set the training sequences and compute their encodings.
+        """
+        self.protein_sequences = SequenceRecords.concatenate((
             positive_sequences,
             negative_sequences
         ))
@@ -61,13 +110,10 @@ class Trainer(object):
             np.ones(len(positive_sequences)),
             np.zeros(len(negative_sequences))
         ))
-        # Sequence region to use for prediction
-        self.seq_range = seq_range
-        # The hyperparameter space to optimize over
-        with open('src/training/hyperparameter_space.json', 'r') as ifile:
-            self.hyperparameter_space = json.load(ifile)
         # Compute protein encodings
-        self.features = encode(self.protein_sequences, seq_range)[1]
+        if self.telemetry is not None:
+            self.telemetry.begin("encoding", total=len(self.protein_sequences))
+        self.features = encode_parallel(self.protein_sequences, self.encoder, self.num_cores, telemetry=self.telemetry)
         # Weight the positive class based on the actual neg. : pos. class ratio
         y = self.labels
         # neg count divided by pos count
@@ -83,17 +129,136 @@ class Trainer(object):
             Returns:
                 Tuple[lgbm.LGBMClassifier, dict]: the optimized classifier and the optimized hyperparameters
         """
-        print("\nOne-by-one parameter optimization ...")
-        optimized_parameters = self.__one_by_one_parameter_optimization(
-            **self.__collect_params_from_config_file(step_two=False)
-        )
-        print("\nHeuristic optimization of one-by-one optimized parameters ...")
-        final_classifier, optimized_hyperparameters = self.__heuristic_optimization(
-            initial_params=optimized_parameters,
-            **self.__collect_params_from_config_file(step_two=True)
-        )
+        if self.executor is not None:
+            self.executor.start(self.features, self.labels)
+        try:
+            print("\nOne-by-one parameter optimization ...")
+            optimized_parameters = self.__one_by_one_parameter_optimization(
+                **self.__collect_params_from_config_file(step_two=False)
+            )
+            print("\nHeuristic optimization of one-by-one optimized parameters ...")
+            final_classifier, optimized_hyperparameters = self.__heuristic_optimization(
+                initial_params=optimized_parameters,
+                **self.__collect_params_from_config_file(step_two=True)
+            )
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
         return final_classifier, optimized_hyperparameters
 
+    def retrain(self, model: lgbm.LGBMClassifier, parameters: dict = None, mode: str = "continue",
+                num_rounds: int = 10, holdout: float = 0.2,
+                seed: int = 0) -> Tuple[lgbm.LGBMClassifier, dict, dict]:
+        """
+            Warm-start training from an existing model instead of optimizing the hyperparameters again,
+            e.g. after adding a few newly verified effectors to the training data.
+
+            'continue' boosts ´num_rounds´ further trees on top of the trees of the existing model
+            (LightGBM ´init_model´), 'refit' fits a new model with the frozen hyperparameters.
+            The quality is compared on a stratified held-out split: the retrained candidate is fit
+            on the remaining sequences only, the existing model is scored as it is (it may have been
+            trained on some of the held-out sequences, which favors it). The returned model is fit
+            on all sequences.
+
+            Args:
+                model (lgbm.LGBMClassifier): the existing model, trained on the features of ´self.encoder´
+                parameters (dict): saved hyperparameters, take precedence over those of the model
+                mode (str): 'continue' or 'refit'
+                num_rounds (int): number of trees added by 'continue'
+                holdout (float): fraction of the sequences held out to compare the models
+                seed (int): seed of the held-out split and of the light gradient boosting machine
+
+            Returns:
+                Tuple[lgbm.LGBMClassifier, dict, dict]: the retrained classifier, the (frozen) hyperparameters and
+                the report with the metrics of both models on the held-out split and their difference
+        """
+        if mode not in WARM_START_MODES:
+            raise ValueError(f"Unknown warm-start mode '{mode}', choose one of: " + ", ".join(WARM_START_MODES))
+        if model.n_features_in_ != self.features.shape[1]:
+            raise ValueError(f"The model expects {model.n_features_in_} features, but {self.features.shape[1]} "
+                             + "features were computed, use the feature specification the model was trained on")
+        parameters = dict() if parameters is None else dict(parameters)
+        model_params = dict(model.get_params(), **parameters, scale_pos_weight=self.scale_pos_weight)
+        if model_params.get("random_state") is None:
+            model_params["random_state"] = seed
+
+        def fit(indices: np.ndarray) -> lgbm.LGBMClassifier:
+            if mode == "continue":
+                classifier = lgbm.LGBMClassifier(**dict(model_params, n_estimators=num_rounds))
+                return classifier.fit(self.features[indices], self.labels[indices], init_model=model.booster_)
+            return lgbm.LGBMClassifier(**model_params).fit(self.features[indices], self.labels[indices])
+
+        if self.telemetry is not None:
+            self.telemetry.begin("warm start", total=2, unit="models")
+        split = StratifiedShuffleSplit(n_splits=1, test_size=holdout, random_state=seed)
+        train_idx, test_idx = next(split.split(self.features, self.labels))
+        existing = fold_metrics(self.labels[test_idx], model.predict_proba(self.features[test_idx])[:, 1])
+        candidate = fit(train_idx)
+        if self.telemetry is not None:
+            self.telemetry.advance()
+        retrained = fold_metrics(self.labels[test_idx], candidate.predict_proba(self.features[test_idx])[:, 1])
+        report = {
+            "mode": mode,
+            "num_rounds": num_rounds if mode == "continue" else None,
+            "holdout": holdout,
+            "seed": seed,
+            "num_train": len(train_idx),
+            "num_holdout": len(test_idx),
+            "existing": existing,
+            "retrained": retrained,
+            "delta": {metric: retrained[metric] - existing[metric] for metric in METRICS}
+        }
+        model = fit(np.arange(len(self.labels)))
+        if self.telemetry is not None:
+            self.telemetry.advance()
+        return model, parameters, report
+
+    def mine_negatives(self, pool_file: str, parameters: dict, iterations: int = 3, num_hard: int = 2000,
+                       num_random: int = 2000, batch_size: int = MINING_BATCH_SIZE,
+                       seed: int = 0) -> Tuple[lgbm.LGBMClassifier, List[dict]]:
+        """
+            Hard-negative mining: train on the positives and a bounded working set of negatives selected
+            from a (large) pool with the current model, i.e. the negatives it scores highest plus a random
+            sample (see ´training.hard_negatives.mine_hard_negatives´), and repeat with the new model.
+            The first model is trained on the negatives given to the constructor. The hyperparameters are
+            kept fixed, the pool is streamed, hence the memory depends on the working set only.
+
+            Args:
+                pool_file (str): fasta-file of negative protein sequences, e.g. whole proteomes
+                parameters (dict): hyperparameters of the LGBMClassifier (e.g. the optimized hyperparameters)
+                iterations (int): number of mining rounds
+                num_hard (int): number of hard negatives of the working set
+                num_random (int): number of randomly sampled negatives of the working set
+                batch_size (int): number of pool sequences read, encoded and scored at once
+                seed (int): seed of the random samples and of the light gradient boosting machine
+
+            Returns:
+                Tuple[lgbm.LGBMClassifier, List[dict]]: the classifier trained on the last working set
+                and the statistics of the pool in each round
+        """
+        positives = self.protein_sequences[np.flatnonzero(self.labels == 1)]
+        n_estimators = self.__collect_params_from_config_file(step_two=False)["n_estimators"]
+
+        def fit() -> lgbm.LGBMClassifier:
+            model = lgbm.LGBMClassifier(**dict(dict(n_jobs=-1, verbose=-1, n_estimators=n_estimators, random_state=seed),
+                                               **parameters, scale_pos_weight=self.scale_pos_weight))
+            return model.fit(self.features, self.labels)
+
+        model = fit()
+        rounds = list()
+        for iteration in range(iterations):
+            if self.telemetry is not None:
+                self.telemetry.begin(f"mining round {iteration + 1}/{iterations}")
+            negatives, stats = mine_hard_negatives(pool_file, self.encoder, model, num_hard, num_random,
+                                                   batch_size=batch_size, seed=seed + iteration,
+                                                   telemetry=self.telemetry)
+            print(f"Round {iteration + 1}: {stats['num_false_positives']} of {stats['num_scored']} pool sequences "
+                  + f"scored as secreted, {stats['num_selected']} negatives selected")
+            self.__set_sequences(positives, negatives)
+            model = fit()
+            rounds.append(dict(stats, iteration=iteration + 1))
+        return model, rounds
+
     def __collect_params_from_config_file(self, step_two: bool) -> dict:
         """
             Collect the parameters from the training_config.yaml file.
@@ -140,6 +305,12 @@ class Trainer(object):
                 parameters['generations'] = 7
                 missingParams.append('generations')
 
+            if self.TRAINING_CONFIG["params"].get("fitness_cache_digits") is not None:
+                parameters['fitness_cache_digits'] = self.TRAINING_CONFIG["params"]["fitness_cache_digits"]
+            else:
+                parameters['fitness_cache_digits'] = 0
+                missingParams.append('fitness_cache_digits')
+
         # If any parameters are missing inform the user
         if len(missingParams) != 0:
             print("The following parameters from the config filed could not be found or are missspelled: ",
@@ -151,7 +322,8 @@ class Trainer(object):
 
     def __heuristic_optimization(self, initial_params: dict, population_size: int = 30,
                                  generations: int = 7, n_estimators: int = 30, k_fold: int = 4,
-                                 evaluation_metric: str = 'roc_auc') -> Tuple[lgbm.LGBMClassifier, dict]:
+                                 evaluation_metric: str = 'roc_auc',
+                                 fitness_cache_digits: int = 0) -> Tuple[lgbm.LGBMClassifier, dict]:
         """
             Performs heuristic parameter optimization using genetic algorithm.
 
@@ -161,6 +333,8 @@ class Trainer(object):
                 generations (int): how many generations to optimize over
                 n_estimators (int): number of estimators to use in boosting machine
                 k_fold (int): fold of the cross-validation
+                fitness_cache_digits (int): significant digits continuous parameters are rounded to
+                                            when looking up already evaluated individuals (0 -> exact match)
 
             Returns:
                 lgbm.LGBMClassifier: the optimized/trained classifier
@@ -171,12 +345,22 @@ class Trainer(object):
                                     verbose=-1,
                                     scale_pos_weight=self.scale_pos_weight).set_params(**initial_params)
 
+        # Split once, such that all individuals are evaluated on the same folds
+        # and the fitness of already evaluated individuals can be reused
         sk_fold = StratifiedKFold(n_splits=k_fold, shuffle=True)
-        clf_GA = GASearchCV(model, cv=sk_fold, param_grid=param_grid, scoring=evaluation_metric,
-                            n_jobs=-1, population_size=population_size,
-                            generations=generations,
-                            verbose=2, error_score='raise')
+        folds = list(sk_fold.split(self.features, self.labels))
+        clf_GA = CachedGASearchCV(model, cv=folds, param_grid=param_grid, scoring=evaluation_metric,
+                                  n_jobs=-1, population_size=population_size,
+                                  generations=generations,
+                                  verbose=2, error_score='raise', **PARENT_CACHE_ARGS)
+        clf_GA.fitness_memo = FitnessCache(significant_digits=fitness_cache_digits)
+        clf_GA.executor = self.executor
+        clf_GA.telemetry = self.telemetry
+        if self.telemetry is not None:
+            # The initial population and 2 x population_size offspring per generation (eaMuPlusLambda)
+            self.telemetry.begin("genetic algorithm", total=population_size * (2 * generations + 1), unit="evaluations")
         clf_GA.fit(self.features, self.labels)
+        print(clf_GA.fitness_memo.summary())
 
         # Optimize again but over all protein sequences, because the best estimator
         # was only optimized over 'k_fold'-1 folds but not all folds due to cross-validation step
@@ -198,23 +382,58 @@ class Trainer(object):
                 dict: the optimized parameters
         """
         best_params = dict()
+        if self.telemetry is not None:
+            self.telemetry.begin("one-by-one optimization", total=len(self.hyperparameter_space), unit="parameters")
         for key in self.hyperparameter_space:
             if "boosting_type" in best_params and best_params["boosting_type"] == "goss":
                 if key in ["subsample", "subsample_freq"]:
+                    if self.telemetry is not None:
+                        self.telemetry.advance()
                     continue
             print("Optimization with respect to " + key.upper() + ':', end=" ")
+            start = time.perf_counter()
             model = lgbm.LGBMClassifier(n_jobs=-1,
                                         n_estimators=n_estimators,
                                         verbose=-1,
                                         scale_pos_weight=self.scale_pos_weight).set_params(**best_params)
             sk_fold = StratifiedKFold(n_splits=k_fold, shuffle=True)
-            clf = GridSearchCV(model, {key: self.hyperparameter_space[key]}, n_jobs=-1,
-                               cv=sk_fold, scoring=evaluation_metric, error_score='raise')
-            clf.fit(self.features, self.labels)
-            best_params.update(clf.best_params_)
+            if self.executor is not None:
+                best_params.update(self.__distributed_grid_search(
+                    model, key, list(sk_fold.split(self.features, self.labels)), evaluation_metric))
+            else:
+                clf = GridSearchCV(model, {key: self.hyperparameter_space[key]}, n_jobs=-1,
+                                   cv=sk_fold, scoring=evaluation_metric, error_score='raise')
+                clf.fit(self.features, self.labels)
+                best_params.update(clf.best_params_)
+            if self.telemetry is not None:
+                self.telemetry.record_busy("cross validation", time.perf_counter() - start)
+                self.telemetry.advance()
             print("Done!")
         return best_params
 
+    def __distributed_grid_search(self, model: lgbm.LGBMClassifier, key: str,
+                                  folds: list, evaluation_metric: str) -> dict:
+        """
+            Grid search over the values of a single hyperparameter, with the candidates
+            evaluated by the workers of the executor.
+
+            Args:
+                model (lgbm.LGBMClassifier): classifier holding the already optimized parameters
+                key (str): name of the hyperparameter to optimize
+                folds (list): train and test indices of each fold
+                evaluation_metric (str): scoring used for the cross validation
+
+            Returns:
+                dict: the best value for the hyperparameter (same choice as GridSearchCV)
+        """
+        base_params = model.get_params()
+        values = self.hyperparameter_space[key]
+        cv_results = self.executor.evaluate([dict(base_params, **{key: val}) for val in values],
+                                            folds=folds, scoring=evaluation_metric)
+        mean_scores = [np.mean(result["test_score"]) for result in cv_results]
+        # First best candidate, as GridSearchCV ranks equal scores equally
+        return {key: values[int(np.argmax(mean_scores))]}
+
     def __parameter_grid(self, params: dict) -> dict:
         """
             Turns the optimized parameters from ´__one_by_one_parameter_optimization´
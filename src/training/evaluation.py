@@ -0,0 +1,115 @@
+import time
+import numpy as np
+import lightgbm as lgbm
+from multiprocessing import Pool
+from typing import Tuple, List
+from sklearn.model_selection import StratifiedKFold
+
+from ..metrics import compute_metrics, DECISION_THRESHOLD
+
+
+# Metrics computed on the test fold of each split
+METRICS = ("accuracy", "balanced_accuracy", "precision", "recall", "f1_score",
+           "matthews_corrcoef", "roc_auc", "average_precision", "log_loss")
+
+# Feature matrix and labels shared by the processes of the pool, set once per process
+# by ´init_process´ instead of being sent along with every fold
+_features: np.ndarray = None
+_labels: np.ndarray = None
+
+
+def init_process(features: np.ndarray, labels: np.ndarray) -> None:
+    global _features, _labels
+    _features, _labels = features, labels
+
+
+def fold_metrics(y_true: np.ndarray, y_probas: np.ndarray) -> dict:
+    metrics_dict, _ = compute_metrics(y_true, y_probas, threshold=DECISION_THRESHOLD)
+    return {metric: metrics_dict[metric] for metric in METRICS}
+
+
+def evaluate_fold(args: Tuple[int, int, np.ndarray, np.ndarray, dict]) -> dict:
+    """
+        Fit a model on the training indices of a fold and evaluate it on the test indices.
+
+        Args:
+            args (Tuple[int, int, np.ndarray, np.ndarray, dict]): seed, number of the fold,
+                                                                   training and test indices and
+                                                                   the parameters of the LGBMClassifier
+
+        Returns:
+            dict: seed, fold, metrics, fit and score time of the fold
+    """
+    seed, fold, train_idx, test_idx, params = args
+    start = time.time()
+    model = lgbm.LGBMClassifier(**dict(params, random_state=seed))
+    model.fit(_features[train_idx], _labels[train_idx])
+    fit_end = time.time()
+    probas = model.predict_proba(_features[test_idx])[:, 1]
+    score_time = time.time() - fit_end
+    return dict(seed=seed, fold=fold, fit_time=fit_end - start, score_time=score_time,
+                **fold_metrics(_labels[test_idx], probas))
+
+
+def summarize(values: List[float]) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    return {"mean": float(values.mean()), "variance": float(values.var(ddof=1)) if len(values) > 1 else 0.0,
+            "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            "min": float(values.min()), "max": float(values.max())}
+
+
+def cross_validate(features: np.ndarray, labels: np.ndarray, parameters: dict, k_fold: int = 4,
+                   seeds: List[int] = (0,), num_cores: int = 1) -> dict:
+    """
+        Repeated stratified k-fold cross validation, one repetition per seed. The seed
+        determines the folds and the random state of the light gradient boosting machine.
+        All folds of all repetitions are evaluated by a process pool on the same feature matrix.
+
+        Args:
+            features (np.ndarray): the precomputed features of all protein sequences
+            labels (np.ndarray): the true labels
+            parameters (dict): parameters of the LGBMClassifier (including n_estimators)
+            k_fold (int): number of folds
+            seeds (List[int]): one repetition of the k-fold cross validation per seed
+            num_cores (int): number of processes evaluating the folds in parallel
+
+        Returns:
+            dict: mean, variance, std, min and max of each metric over all folds ("folds") and over the
+            means of the repetitions ("seeds", the stability of the estimate), the metrics of each
+            repetition and the metrics and timings of each fold
+    """
+    tasks = list()
+    for seed in seeds:
+        sk_fold = StratifiedKFold(n_splits=k_fold, shuffle=True, random_state=seed)
+        for fold, (train_idx, test_idx) in enumerate(sk_fold.split(features, labels)):
+            tasks.append((seed, fold, train_idx, test_idx))
+
+    num_processes = max(1, min(num_cores, len(tasks)))
+    # Threads used by LightGBM inside each process
+    parameters = dict(parameters, n_jobs=max(1, num_cores // num_processes))
+    tasks = [task + (parameters,) for task in tasks]
+    start = time.time()
+    if num_processes > 1:
+        with Pool(num_processes, initializer=init_process, initargs=(features, labels)) as pool:
+            folds = pool.map(evaluate_fold, tasks)
+    else:
+        init_process(features, labels)
+        folds = [evaluate_fold(task) for task in tasks]
+    wall_time = time.time() - start
+
+    repetitions = {str(seed): {metric: float(np.mean([f[metric] for f in folds if f["seed"] == seed]))
+                               for metric in METRICS} for seed in seeds}
+    return {
+        "k_fold": k_fold,
+        "seeds": list(seeds),
+        "num_processes": num_processes,
+        "wall_time": wall_time,
+        "metrics": {
+            "folds": {metric: summarize([f[metric] for f in folds]) for metric in METRICS},
+            "seeds": {metric: summarize([rep[metric] for rep in repetitions.values()]) for metric in METRICS}
+        },
+        "timing": {key: summarize([f[key] for f in folds]) for key in ("fit_time", "score_time")},
+        "repetitions": repetitions,
+        "folds": [{key: float(val) if isinstance(val, (float, np.floating)) else val for key, val in f.items()}
+                  for f in folds]
+    }
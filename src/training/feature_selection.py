@@ -0,0 +1,157 @@
+import os
+import re
+import pickle
+import numpy as np
+import lightgbm as lgbm
+from multiprocessing import Pool
+from typing import Tuple, List
+from sklearn.metrics import balanced_accuracy_score
+
+from ..sequtils import read_fasta
+from ..sequtils.records import SequenceRecords
+from ..encoders.encode import FULL_FEATURE_NAMES
+from ..encoders.feature_spec import compile_spec, full_spec, spec_from_feature_names, save_feature_spec
+
+
+def split_numbers(splits_folder: str) -> List[int]:
+    """
+        Numbers of the train/test splits contained in the folder, a split
+        consists of the files {pos|neg}_{train|test}_{number}.fasta
+    """
+    numbers = list()
+    for file_name in os.listdir(splits_folder):
+        match = re.fullmatch(r"pos_train_(\d+)\.fasta", file_name)
+        if match is not None:
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+def encode_split(args: Tuple[str, int, Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Compute the full encoding of the training and the test set of a split.
+
+        Args:
+            args (Tuple[str, int, Tuple[int, int]]): folder of the splits, number of the split
+                                                     and the sequence range to encode
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: training features, training labels,
+                                                                   test features and test labels
+    """
+    splits_folder, number, seq_range = args
+    encoder = compile_spec(full_spec(seq_range))
+    encoded = list()
+    for subset in ("train", "test"):
+        positive_sequences = read_fasta.read_records(os.path.join(splits_folder, f"pos_{subset}_{number}.fasta"))
+        negative_sequences = read_fasta.read_records(os.path.join(splits_folder, f"neg_{subset}_{number}.fasta"))
+        features = encoder.encode(SequenceRecords.concatenate((positive_sequences, negative_sequences)))[1]
+        labels = np.hstack((np.ones(len(positive_sequences)), np.zeros(len(negative_sequences))))
+        encoded += [features, labels]
+    return tuple(encoded)
+
+
+def fit_model(features: np.ndarray, labels: np.ndarray, parameters: dict,
+              n_estimators: int, n_jobs: int = -1) -> lgbm.LGBMClassifier:
+    model = lgbm.LGBMClassifier(n_jobs=n_jobs,
+                                n_estimators=n_estimators,
+                                verbose=-1,
+                                scale_pos_weight=(len(labels)-sum(labels)) / sum(labels)).set_params(**parameters)
+    return model.fit(features, labels)
+
+
+def split_shap_values(args: Tuple) -> Tuple[lgbm.LGBMClassifier, np.ndarray]:
+    """
+        Fit a model on the training set of a split and compute the mean absolute
+        SHAP-value of each feature on the test set of the split. The SHAP-values are
+        computed by LightGBM natively (TreeSHAP, ´pred_contrib´).
+
+        Returns:
+            Tuple[lgbm.LGBMClassifier, np.ndarray]: the fitted model and the mean absolute SHAP-values
+    """
+    (X_train, y_train, X_test, _), parameters, n_estimators, n_jobs = args
+    model = fit_model(X_train, y_train, parameters, n_estimators, n_jobs)
+    # Last column contains the expected value (bias) of the model
+    contributions = model.booster_.predict(X_test, pred_contrib=True)[:, :-1]
+    return model, np.abs(contributions).mean(axis=0)
+
+
+def balanced_accuracy_curve(args: Tuple) -> np.ndarray:
+    """
+        Balanced accuracy on the test set of a split of models fit on the
+        1, 2, ..., ´max_features´ most important features.
+    """
+    (X_train, y_train, X_test, y_test), sorted_idxs, parameters, n_estimators, max_features, n_jobs = args
+    scores = list()
+    for num_features in range(1, max_features+1):
+        columns = sorted_idxs[:num_features]
+        model = fit_model(X_train[:, columns], y_train, parameters, n_estimators, n_jobs)
+        scores.append(balanced_accuracy_score(y_test, model.predict(X_test[:, columns])))
+    return np.array(scores)
+
+
+def select_features(splits_folder: str, ofolder: str, parameters: dict, seq_range: Tuple[int, int] = None,
+                    n_estimators: int = 30, num_features: int = 85, num_cores: int = 1,
+                    compute_curve: bool = False) -> dict:
+    """
+        Feature selection using the mean absolute SHAP-values of models fit on the
+        full encoding of several train/test splits.
+
+        Args:
+            splits_folder (str): folder containing the train/test splits
+            ofolder (str): folder to save the feature specification and the intermediate results to
+            parameters (dict): hyperparameters of the light gradient boosting machine
+            seq_range (Tuple[int, int]): sequence range to encode
+            n_estimators (int): number of estimators of the light gradient boosting machine
+            num_features (int): number of features to select, if 0 (or None) then the number
+                                of features with the highest mean balanced accuracy curve is chosen
+            num_cores (int): number of processes used to encode and evaluate the splits in parallel
+            compute_curve (bool): whether to compute the balanced accuracy of models fit on
+                                  the most important features for each number of features
+
+        Returns:
+            dict: the feature specification of the selected features (see ´encoders.feature_spec´)
+    """
+    numbers = split_numbers(splits_folder)
+    if len(numbers) == 0:
+        raise ValueError("No train/test splits {pos|neg}_{train|test}_{number}.fasta found in " + splits_folder)
+    if not num_features:
+        compute_curve = True
+    os.makedirs(ofolder, exist_ok=True)
+    num_processes = max(1, min(num_cores, len(numbers)))
+    # Threads used by LightGBM inside each process
+    n_jobs = max(1, num_cores // num_processes)
+
+    with Pool(num_processes) as pool:
+        print("Encoding the full feature space of", len(numbers), "splits ...")
+        splits = pool.map(encode_split, [(splits_folder, number, seq_range) for number in numbers])
+        print("Computing SHAP-values ...")
+        results = pool.map(split_shap_values, [(split, parameters, n_estimators, n_jobs) for split in splits])
+        shap_value_mean = np.mean([shap_values for _, shap_values in results], axis=0)
+        # Stable sort, such that features with equal importance keep their order
+        sorted_idxs = np.argsort(-shap_value_mean, kind="stable")
+        curves = None
+        if compute_curve:
+            print("Computing balanced accuracy curves ...")
+            max_features = int(np.count_nonzero(shap_value_mean)) if not num_features else num_features
+            curves = pool.map(balanced_accuracy_curve, [(split, sorted_idxs, parameters, n_estimators,
+                                                         max_features, n_jobs) for split in splits])
+
+    if not num_features:
+        num_features = int(np.argmax(np.mean(curves, axis=0))) + 1
+
+    # Save intermediate results
+    np.save(os.path.join(ofolder, "feat_names.npy"), np.array(FULL_FEATURE_NAMES))
+    # Named after the first and last split as the shipped 'shap_value_mean_d1Tod6.npy'
+    np.save(os.path.join(ofolder, f"shap_value_mean_d{numbers[0]}Tod{numbers[-1]}.npy"), shap_value_mean)
+    np.save(os.path.join(ofolder, "sorted_idxs_highToLowImp.npy"), sorted_idxs)
+    for number, (model, _) in zip(numbers, results):
+        with open(os.path.join(ofolder, f"model_d{number}.bin"), 'wb') as ofile:
+            pickle.dump(model, ofile)
+    if curves is not None:
+        for number, curve in zip(numbers, curves):
+            np.save(os.path.join(ofolder, f"bacc_scores_d{number}.npy"), curve)
+
+    feature_spec = spec_from_feature_names([FULL_FEATURE_NAMES[idx] for idx in sorted_idxs[:num_features]],
+                                           seq_range)
+    save_feature_spec(feature_spec, os.path.join(ofolder, "feature_spec.json"))
+    return feature_spec
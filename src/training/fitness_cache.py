@@ -0,0 +1,203 @@
+import time
+import inspect
+import numpy as np
+from typing import Tuple, List, Any, Callable
+from sklearn_genetic import GASearchCV  # heuristic optimization
+try:
+    # Newer versions of sklearn-genetic-opt add the novelty of an individual to its fitness
+    from sklearn_genetic.genetic_search import novelty_scorer
+except ImportError:
+    novelty_scorer = None
+
+from ..telemetry import Telemetry
+
+
+# GASearchCV memoizes identical individuals itself since sklearn-genetic 0.11 (use_cache, on by default),
+# it is switched off for ´CachedGASearchCV´, whose ´FitnessCache´ covers them as well
+PARENT_CACHE_ARGS = {"use_cache": False} if "use_cache" in inspect.signature(GASearchCV.__init__).parameters else dict()
+
+
+class FitnessCache(object):
+    """
+        Memoizes the fitness of individuals evaluated by the genetic algorithm.
+
+        Individuals are keyed by their canonicalized parameter set, such that
+        individuals which were already evaluated in a previous generation
+        (or which only differ by less than the rounding precision of the
+        continuous parameters) skip the whole k-fold cross validation.
+    """
+
+    def __init__(self, significant_digits: int = None) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                significant_digits (int): number of significant digits continuous
+                                          parameters are rounded to before building the key,
+                                          if None (or 0) then only identical individuals are matched
+        """
+        self.significant_digits = significant_digits if significant_digits else None
+        # canonical key -> (fitness, logbook record)
+        self.entries = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def canonicalize(self, params: dict) -> dict:
+        """
+            Bring a parameter set into a canonical form, i.e. numpy scalars are converted
+            to python types and continuous parameters are rounded to the configured precision.
+
+            Args:
+                params (dict): the hyperparameters of an individual
+
+            Returns:
+                dict: the canonicalized hyperparameters
+        """
+        canonical = dict()
+        for key, val in params.items():
+            if isinstance(val, (bool, np.bool_)):
+                val = bool(val)
+            elif isinstance(val, (int, np.integer)):
+                val = int(val)
+            elif isinstance(val, (float, np.floating)):
+                val = float(val)
+                if self.significant_digits is not None:
+                    val = float(f"{val:.{self.significant_digits}g}")
+            canonical[key] = val
+        return canonical
+
+    def key(self, params: dict) -> Tuple:
+        return tuple(sorted(self.canonicalize(params).items()))
+
+    def __contains__(self, key: Tuple) -> bool:
+        return key in self.entries
+
+    def get(self, key: Tuple, count_hit: bool = True) -> Tuple[List[float], dict]:
+        if count_hit:
+            self.hits += 1
+        return self.entries[key]
+
+    def store(self, key: Tuple, fitness: List[float], record: dict) -> None:
+        self.misses += 1
+        self.entries[key] = (list(fitness), record)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        return (f"{self.hits} of {total} evaluations served from the fitness cache "
+                + f"({len(self.entries)} distinct individuals)")
+
+
+class CachedGASearchCV(GASearchCV):
+    """
+        GASearchCV whose fitness evaluation is memoized by a ´FitnessCache´.
+
+        GASearchCV memoizes identical individuals itself (use_cache), create the instance with
+        ´PARENT_CACHE_ARGS´ to switch that cache off. Beyond it, the ´FitnessCache´ rounds continuous
+        parameters (´fitness_cache_digits´ of the training configuration), such that individuals
+        differing by less than the rounding share their fitness, and it can be kept across searches
+        (assign the same cache). The individuals of a generation can also be evaluated in one batch on a
+        ´DistributedExecutor´.
+
+        The cache (and optionally a ´DistributedExecutor´ and a ´Telemetry´) is assigned to the
+        attribute ´fitness_memo´ (´executor´, ´telemetry´) after creating the instance, because
+        scikit-learn only allows the parameters of the constructor of GASearchCV in the signature.
+    """
+    fitness_memo: FitnessCache = None
+    executor: Any = None
+    # Advanced by each evaluated individual, cached or not
+    telemetry: Telemetry = None
+    # Keys of individuals evaluated by the executor which were not looked up yet
+    _prefetched: set = None
+
+    def _register(self):
+        super()._register()
+        if self.executor is not None:
+            self.toolbox.register("map", self.distributed_map)
+
+    def distributed_map(self, evaluate: Callable, individuals: List[Any]) -> List[List[float]]:
+        """
+            Replaces the map of the DEAP toolbox: the individuals of a generation which
+            are not cached yet are evaluated on the workers of the executor in one batch.
+        """
+        if self.fitness_memo is None:
+            self.fitness_memo = FitnessCache()
+        if self._prefetched is None:
+            self._prefetched = set()
+        individuals = list(individuals)
+        candidates = dict()
+        for individual in individuals:
+            params = self.individual_params(individual)
+            key = self.fitness_memo.key(params)
+            if key not in self.fitness_memo and key not in candidates:
+                candidates[key] = (individual, params)
+        base_params = self.estimator.get_params()
+        folds = self.cv if isinstance(self.cv, list) else list(self.cv.split(self.X_, self.y_))
+        if self.telemetry is not None:
+            self.telemetry.set_queue_depth("workers", len(candidates))
+        start = time.perf_counter()
+        cv_results = self.executor.evaluate([dict(base_params, **params) for _, params in candidates.values()],
+                                            folds=folds, scoring=self.scoring,
+                                            return_train_score=bool(self.return_train_score))
+        if self.telemetry is not None:
+            self.telemetry.set_queue_depth("workers", 0)
+            self.telemetry.record_busy("cross validation", time.perf_counter() - start)
+        for (key, (individual, params)), result in zip(candidates.items(), cv_results):
+            self.__store_remote_result(key, individual, params, result)
+        return [evaluate(individual) for individual in individuals]
+
+    def __store_remote_result(self, key: Tuple, individual: Any, params: dict, cv_results: dict) -> None:
+        """
+            Create the logbook record and fitness of a candidate evaluated by a worker
+            the same way GASearchCV.evaluate does and store them in the cache.
+        """
+        score = np.mean(cv_results["test_score"])
+        record = dict(index=None, **params, score=score, cv_scores=cv_results["test_score"],
+                      fit_time=cv_results["fit_time"], score_time=cv_results["score_time"],
+                      test_score=cv_results["test_score"])
+        if "train_score" in cv_results:
+            record["train_score"] = cv_results["train_score"]
+        fitness = [score]
+        if novelty_scorer is not None:
+            fitness.append(novelty_scorer(individual, self._pop))
+        self.fitness_memo.store(key, fitness, record)
+        self._prefetched.add(key)
+
+    def individual_params(self, individual: Any) -> dict:
+        """
+            Dictionary representation of an individual -> hyperparameter name: value
+        """
+        return {key: individual[n] for n, key in enumerate(self.space.parameters)}
+
+    def evaluate(self, individual: Any) -> List[float]:
+        """
+            Returns the cached fitness of the individual if an equivalent individual
+            was evaluated before, otherwise runs the cross validation of GASearchCV.
+
+            Args:
+                individual (Individual): the set of hyperparameters to evaluate
+
+            Returns:
+                List[float]: the fitness of the individual
+        """
+        if self.fitness_memo is None:
+            self.fitness_memo = FitnessCache()
+        key = self.fitness_memo.key(self.individual_params(individual))
+        if key in self.fitness_memo:
+            fitness, record = self.fitness_memo.get(
+                key, count_hit=self._prefetched is None or key not in self._prefetched)
+            if self._prefetched is not None:
+                self._prefetched.discard(key)
+            # Record the individual again, such that cv_results_ still contains
+            # one entry per evaluation as for an uncached search
+            self.logbook.record(parameters=dict(
+                record, index=len(self.logbook.chapters["parameters"])))
+            if self.telemetry is not None:
+                self.telemetry.advance()
+            return list(fitness)
+        start = time.perf_counter()
+        fitness = super().evaluate(individual)
+        self.fitness_memo.store(key, fitness, self.logbook.chapters["parameters"][-1])
+        if self.telemetry is not None:
+            self.telemetry.record_busy("cross validation", time.perf_counter() - start)
+            self.telemetry.advance()
+        return fitness
@@ -0,0 +1,121 @@
+import time
+import numpy as np
+from typing import Tuple
+
+from ..sequtils.read_fasta import read_batches
+from ..sequtils.records import SequenceRecords
+from ..encoders.feature_spec import CompiledEncoder
+from ..metrics import DECISION_THRESHOLD
+from ..telemetry import Telemetry
+
+
+# Number of protein sequences of the negative pool read, encoded and scored at once
+MINING_BATCH_SIZE: int = 50000
+
+
+class NegativeReservoir(object):
+    """
+        Bounded working set of negatives selected from a stream of scored protein sequences:
+        the ´num_hard´ sequences with the highest scores (hard negatives, i.e. the most likely
+        false positives) and a uniform random sample of ´num_random´ sequences. The random sample
+        keeps the sequences with the smallest of independent uniform random keys, which is a uniform
+        sample without replacement of all sequences seen so far. Both parts keep the order of the stream.
+    """
+
+    def __init__(self, num_hard: int, num_random: int, seed: int = 0) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                num_hard (int): number of hard negatives kept
+                num_random (int): number of randomly sampled negatives kept
+                seed (int): seed of the random sample
+        """
+        self.num_hard = num_hard
+        self.num_random = num_random
+        self.rng = np.random.default_rng(seed)
+        # Number of sequences seen so far
+        self.num_seen = 0
+        empty = SequenceRecords.from_pairs([])
+        # Records, scores (hard) or random keys (sample) and position in the stream
+        self.hard = (empty, np.zeros(0), np.zeros(0, dtype=np.int64))
+        self.sample = (empty, np.zeros(0), np.zeros(0, dtype=np.int64))
+
+    @staticmethod
+    def _keep(part: Tuple[SequenceRecords, np.ndarray, np.ndarray], records: SequenceRecords, values: np.ndarray,
+              positions: np.ndarray, size: int, largest: bool) -> Tuple[SequenceRecords, np.ndarray, np.ndarray]:
+        records = SequenceRecords.concatenate((part[0], records))
+        values = np.concatenate((part[1], values))
+        positions = np.concatenate((part[2], positions))
+        if len(values) > size:
+            # Ties are broken by the position in the stream
+            order = np.lexsort((positions, -values if largest else values))
+            keep = np.sort(order[:size])
+            records, values, positions = records[keep].compact(), values[keep], positions[keep]
+        return records, values, positions
+
+    def add(self, records: SequenceRecords, scores: np.ndarray) -> None:
+        """
+            Offer the next batch of the stream and its scores.
+        """
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        positions = self.num_seen + np.arange(len(records), dtype=np.int64)
+        self.num_seen += len(records)
+        self.hard = self._keep(self.hard, records, scores, positions, self.num_hard, largest=True)
+        self.sample = self._keep(self.sample, records, self.rng.random(len(records)), positions,
+                                 self.num_random, largest=False)
+
+    def records(self) -> SequenceRecords:
+        """
+            Hard negatives and random sample in the order of the stream, sequences in both only once.
+        """
+        positions = np.concatenate((self.hard[2], self.sample[2]))
+        records = SequenceRecords.concatenate((self.hard[0], self.sample[0]))
+        _, first = np.unique(positions, return_index=True)
+        return records[first].compact()
+
+
+def mine_hard_negatives(pool_file: str, encoder: CompiledEncoder, model: object, num_hard: int, num_random: int,
+                        batch_size: int = MINING_BATCH_SIZE, seed: int = 0,
+                        telemetry: Telemetry = None) -> Tuple[SequenceRecords, dict]:
+    """
+        Stream a (large) pool of negative protein sequences, score it with the current model and
+        select a bounded working set of hard negatives plus a random sample (see ´NegativeReservoir´).
+        Only one batch of the pool and the working set are held in memory.
+
+        Args:
+            pool_file (str): fasta-file of negative protein sequences, e.g. whole proteomes
+            encoder (CompiledEncoder): encoder computing the features of the model
+            model (object): the current classifier (with ´predict_proba´)
+            num_hard (int): number of hard negatives kept
+            num_random (int): number of randomly sampled negatives kept
+            batch_size (int): number of sequences read, encoded and scored at once
+            seed (int): seed of the random sample
+            telemetry (Telemetry): if set, advanced by the number of scored pool sequences
+
+        Returns:
+            Tuple[SequenceRecords, dict]: the selected negatives and statistics of the pool: the number of
+            scored sequences, of false positives at the decision threshold, and the scores of the hard negatives
+    """
+    reservoir = NegativeReservoir(num_hard, num_random, seed=seed)
+    num_false_positives = 0
+    # Dipeptide compositions are carried from batch to batch (see ´kernels.dpc_recurrence´)
+    dpc_state = None
+    for batch in read_batches(pool_file, batch_size):
+        start = time.perf_counter()
+        features, dpc_state = encoder.encode_sequences(batch, dpc_state)
+        scores = model.predict_proba(features)[:, 1]
+        num_false_positives += int(np.count_nonzero(scores >= DECISION_THRESHOLD))
+        reservoir.add(batch, scores)
+        if telemetry is not None:
+            telemetry.record_busy("score", time.perf_counter() - start)
+            telemetry.advance(len(batch))
+    hard_scores = reservoir.hard[1]
+    negatives = reservoir.records()
+    return negatives, {
+        "num_scored": reservoir.num_seen,
+        "num_false_positives": num_false_positives,
+        "num_selected": len(negatives),
+        "hard_score_min": float(hard_scores.min()) if len(hard_scores) else None,
+        "hard_score_mean": float(hard_scores.mean()) if len(hard_scores) else None,
+    }
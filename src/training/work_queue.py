@@ -0,0 +1,357 @@
+import os
+import time
+import uuid
+import pickle
+import socket
+import traceback
+import numpy as np
+import lightgbm as lgbm
+from multiprocessing import Process, cpu_count
+from typing import List, Tuple, Optional
+from sklearn.metrics import get_scorer
+
+
+# Sub-directories of the queue directory
+PENDING, CLAIMED, DONE = "pending", "claimed", "done"
+# File telling the workers to shut down, contains the id of the run that requested the stop
+STOP_FILE = "STOP"
+# Claimed tasks whose claim file was not touched for this many seconds
+# are put back into the queue (e.g. the worker host crashed)
+STALE_AFTER: float = 600.0
+# Waiting for results fails after this many seconds in which pending tasks
+# were not held by any worker (e.g. no worker was started)
+CLAIM_TIMEOUT: float = 600.0
+
+
+class FileWorkQueue(object):
+    """
+        Work queue living in a directory of a (shared) file system.
+
+        Tasks are pickled into ´pending/´, workers claim a task by atomically renaming
+        it into ´claimed/´ (as '{task id}.{token}', the token identifies the claim) and write
+        the result into ´done/´. The feature matrix and the labels are published once as
+        .npy-files, which the workers load memory-mapped.
+    """
+
+    def __init__(self, queue_dir: str) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                queue_dir (str): directory holding the queue, must be reachable by all workers
+        """
+        self.queue_dir = queue_dir
+        for sub_dir in (PENDING, CLAIMED, DONE):
+            os.makedirs(os.path.join(queue_dir, sub_dir), exist_ok=True)
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.queue_dir, *parts)
+
+    def publish_dataset(self, features: np.ndarray, labels: np.ndarray) -> str:
+        """
+            Save features and labels such that workers can memory-map them.
+
+            Returns:
+                str: id of the dataset, tasks refer to it to make sure they are evaluated on the right data
+        """
+        dataset_id = uuid.uuid4().hex
+        for name, array in (("features", features), ("labels", labels)):
+            tmp_path = self.path(f".{name}_{dataset_id}.npy")
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, self.path(f"{name}_{dataset_id}.npy"))
+        return dataset_id
+
+    def load_dataset(self, dataset_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        return (np.load(self.path(f"features_{dataset_id}.npy"), mmap_mode='r'),
+                np.load(self.path(f"labels_{dataset_id}.npy"), mmap_mode='r'))
+
+    def remove_dataset(self, dataset_id: str) -> None:
+        for name in ("features", "labels"):
+            if os.path.exists(self.path(f"{name}_{dataset_id}.npy")):
+                os.remove(self.path(f"{name}_{dataset_id}.npy"))
+
+    def submit(self, task: dict) -> str:
+        task_id = uuid.uuid4().hex
+        self.__write(self.path(PENDING, task_id), task)
+        return task_id
+
+    def claim(self) -> Optional[Tuple[str, dict]]:
+        """
+            Claim the oldest pending task.
+
+            Returns:
+                Tuple[str, dict]: claim id ('{task id}.{token}') and task, None if the queue is empty
+        """
+        pending = [(entry.stat().st_mtime, entry.name)
+                   for entry in os.scandir(self.path(PENDING)) if not entry.name.startswith(".")]
+        for _, task_id in sorted(pending):
+            claim_id = f"{task_id}.{uuid.uuid4().hex}"
+            claimed_path = self.path(CLAIMED, claim_id)
+            try:
+                # Only one worker succeeds in renaming the file
+                os.rename(self.path(PENDING, task_id), claimed_path)
+            except OSError:
+                continue
+            # Touch the claim, such that it is not requeued as stale right away
+            os.utime(claimed_path)
+            with open(claimed_path, 'rb') as ifile:
+                return claim_id, pickle.load(ifile)
+        return None
+
+    @staticmethod
+    def task_id(claim_id: str) -> str:
+        return claim_id.split(".")[0]
+
+    def heartbeat(self, claim_id: str) -> None:
+        if os.path.exists(self.path(CLAIMED, claim_id)):
+            os.utime(self.path(CLAIMED, claim_id))
+
+    def complete(self, claim_id: str, result: dict) -> None:
+        """
+            Save the result of a claimed task and release the claim. A claim that was put back into
+            the queue as stale (and possibly claimed again by another worker) is no longer removed.
+        """
+        self.__write(self.path(DONE, self.task_id(claim_id)), result)
+        try:
+            os.remove(self.path(CLAIMED, claim_id))
+        except FileNotFoundError:
+            pass
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER) -> None:
+        now = time.time()
+        for entry in os.scandir(self.path(CLAIMED)):
+            if not entry.name.startswith(".") and now - entry.stat().st_mtime > stale_after:
+                try:
+                    os.rename(entry.path, self.path(PENDING, self.task_id(entry.name)))
+                except OSError:
+                    continue
+
+    def collect(self, task_ids: List[str], poll_interval: float = 0.2,
+                stale_after: float = STALE_AFTER, claim_timeout: Optional[float] = CLAIM_TIMEOUT) -> List[dict]:
+        """
+            Wait for the results of the given tasks.
+
+            Args:
+                task_ids (List[str]): ids of the submitted tasks
+                poll_interval (float): seconds to wait before checking for results again
+                stale_after (float): claims not touched for this many seconds are put back into the queue
+                claim_timeout (float): raise a TimeoutError once tasks were pending for this many seconds
+                                       without any worker holding one of the tasks, None -> wait forever
+
+            Returns:
+                List[dict]: the results in the same order as the task ids
+        """
+        results = dict()
+        idle_since = time.time()
+        while len(results) < len(task_ids):
+            for task_id in task_ids:
+                done_path = self.path(DONE, task_id)
+                if task_id not in results and os.path.exists(done_path):
+                    with open(done_path, 'rb') as ifile:
+                        results[task_id] = pickle.load(ifile)
+                    os.remove(done_path)
+                    idle_since = time.time()
+            if len(results) < len(task_ids):
+                self.requeue_stale(stale_after)
+                claimed = {self.task_id(entry.name) for entry in os.scandir(self.path(CLAIMED))}
+                if any(task_id in claimed for task_id in task_ids if task_id not in results):
+                    idle_since = time.time()
+                elif claim_timeout is not None and time.time() - idle_since > claim_timeout:
+                    # Withdraw the tasks, such that workers started later do not evaluate them
+                    for task_id in task_ids:
+                        if os.path.exists(self.path(PENDING, task_id)):
+                            os.remove(self.path(PENDING, task_id))
+                    raise TimeoutError(f"No worker claimed any of the {len(task_ids) - len(results)} pending tasks in "
+                                       + f"'{self.path(PENDING)}' within {claim_timeout:g} seconds, start workers with "
+                                       + f"'effectiveWorker --queue {self.queue_dir}' or set --workers")
+                time.sleep(poll_interval)
+        return [results[task_id] for task_id in task_ids]
+
+    def stop_id(self) -> Optional[str]:
+        """
+            Id of the run that requested the workers to stop, None if no stop was requested.
+        """
+        try:
+            with open(self.path(STOP_FILE), 'r') as ifile:
+                return ifile.read()
+        except FileNotFoundError:
+            return None
+
+    def stop_requested(self, stale_stop_id: str = None) -> bool:
+        """
+            Whether a stop was requested, a stop of the run ´stale_stop_id´ (e.g. left behind
+            by a previous run when the worker started) is ignored.
+        """
+        stop_id = self.stop_id()
+        return stop_id is not None and stop_id != stale_stop_id
+
+    def request_stop(self, run_id: str) -> None:
+        tmp_path = self.path("." + STOP_FILE)
+        with open(tmp_path, 'w') as ofile:
+            ofile.write(run_id)
+        os.replace(tmp_path, self.path(STOP_FILE))
+
+    def clear_stop(self) -> None:
+        try:
+            os.remove(self.path(STOP_FILE))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __write(file_path: str, obj: object) -> None:
+        # Write to a hidden temporary file first, such that readers never see partial files
+        tmp_path = os.path.join(os.path.dirname(file_path), "." + os.path.basename(file_path))
+        with open(tmp_path, 'wb') as ofile:
+            pickle.dump(obj, ofile)
+        os.replace(tmp_path, file_path)
+
+
+def evaluate_candidate(queue: FileWorkQueue, claim_id: str, task: dict,
+                       features: np.ndarray, labels: np.ndarray, n_jobs: int = None) -> dict:
+    """
+        Cross validate one candidate parameter set.
+
+        Args:
+            queue (FileWorkQueue): the queue the task was claimed from
+            claim_id (str): id of the claim of the task
+            task (dict): estimator parameters, folds, scoring and whether to return
+                         the training scores of the candidate
+            features (np.ndarray): the (memory-mapped) feature matrix
+            labels (np.ndarray): the (memory-mapped) labels
+            n_jobs (int): number of threads of LightGBM, overrides the one of the parameters if set
+
+        Returns:
+            dict: test (and train) scores, fit and score times of each fold
+    """
+    scorer = get_scorer(task["scoring"])
+    params = task["params"] if n_jobs is None else dict(task["params"], n_jobs=n_jobs)
+    result = {"test_score": list(), "fit_time": list(), "score_time": list()}
+    if task.get("return_train_score"):
+        result["train_score"] = list()
+    for train_idx, test_idx in task["folds"]:
+        start = time.time()
+        model = lgbm.LGBMClassifier(**params)
+        model.fit(features[train_idx], labels[train_idx])
+        fit_end = time.time()
+        result["test_score"].append(scorer(model, features[test_idx], labels[test_idx]))
+        result["fit_time"].append(fit_end - start)
+        result["score_time"].append(time.time() - fit_end)
+        if task.get("return_train_score"):
+            result["train_score"].append(scorer(model, features[train_idx], labels[train_idx]))
+        queue.heartbeat(claim_id)
+    return {key: np.array(val) for key, val in result.items()}
+
+
+def run_worker(queue_dir: str, poll_interval: float = 0.5, idle_timeout: float = None, n_jobs: int = None) -> None:
+    """
+        Claim and evaluate tasks until a stop is requested or the worker was idle for too long.
+
+        Args:
+            queue_dir (str): directory holding the queue
+            poll_interval (float): seconds to wait before polling an empty queue again
+            idle_timeout (float): shut down after being idle for this many seconds, None -> never
+            n_jobs (int): number of threads of LightGBM, None -> as set by the trainer (all cores)
+    """
+    queue = FileWorkQueue(queue_dir)
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    dataset_id, features, labels = None, None, None
+    idle_since = time.time()
+    # A stop left behind by a previous run does not stop the worker
+    stale_stop_id = queue.stop_id()
+    while not queue.stop_requested(stale_stop_id):
+        claimed = queue.claim()
+        if claimed is None:
+            if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        claim_id, task = claimed
+        try:
+            if task["dataset_id"] != dataset_id:
+                dataset_id = task["dataset_id"]
+                features, labels = queue.load_dataset(dataset_id)
+            result = evaluate_candidate(queue, claim_id, task, features, labels, n_jobs)
+        except Exception:
+            result = {"error": traceback.format_exc(), "worker": worker_name}
+        queue.complete(claim_id, result)
+        idle_since = time.time()
+
+
+class DistributedExecutor(object):
+    """
+        Distributes the cross validation of candidate parameter sets of both
+        training stages to worker processes polling a ´FileWorkQueue´.
+
+        Workers on other hosts are started with ´effectiveWorker --queue {queue_dir}´,
+        additionally ´local_workers´ worker processes are started on this machine.
+    """
+
+    def __init__(self, queue_dir: str, local_workers: int = 0, claim_timeout: Optional[float] = CLAIM_TIMEOUT,
+                 n_jobs: int = None) -> None:
+        """
+            Creates new instance.
+
+            Args:
+                queue_dir (str): directory holding the queue, must be reachable by all workers
+                local_workers (int): number of worker processes to start on this machine
+                claim_timeout (float): fail once submitted candidates were not claimed by any
+                                       worker for this many seconds, None -> wait forever
+                n_jobs (int): number of threads of LightGBM in each local worker, None -> the
+                              cores of this machine divided by the number of local workers
+        """
+        self.queue = FileWorkQueue(queue_dir)
+        self.local_workers = local_workers
+        self.claim_timeout = claim_timeout
+        self.n_jobs = n_jobs if n_jobs is not None else max(1, cpu_count() // max(1, local_workers))
+        self.processes = list()
+        self.dataset_id = None
+        self.run_id = None
+
+    def start(self, features: np.ndarray, labels: np.ndarray) -> None:
+        """
+            Publish the training data and start the local workers.
+        """
+        # Clear the stop of a previous run before any task is published
+        self.queue.clear_stop()
+        self.run_id = uuid.uuid4().hex
+        self.dataset_id = self.queue.publish_dataset(features, labels)
+        for _ in range(self.local_workers):
+            p = Process(target=run_worker, args=(self.queue.queue_dir,), kwargs=dict(n_jobs=self.n_jobs))
+            p.start()
+            self.processes.append(p)
+
+    def evaluate(self, candidates: List[dict], folds: List[Tuple[np.ndarray, np.ndarray]],
+                 scoring: str, return_train_score: bool = False) -> List[dict]:
+        """
+            Cross validate all candidates on the workers.
+
+            Args:
+                candidates (List[dict]): full parameter sets of the LGBMClassifier to evaluate
+                folds (List[Tuple[np.ndarray, np.ndarray]]): train and test indices of each fold
+                scoring (str): name of the scikit-learn scoring function
+                return_train_score (bool): whether to score the candidates on the training folds as well
+
+            Returns:
+                List[dict]: test (and train) scores, fit and score times of each fold for each candidate
+        """
+        task_ids = [self.queue.submit(dict(dataset_id=self.dataset_id, params=params, folds=folds,
+                                           scoring=scoring, return_train_score=return_train_score))
+                    for params in candidates]
+        results = self.queue.collect(task_ids, claim_timeout=self.claim_timeout)
+        for result in results:
+            if "error" in result:
+                raise RuntimeError("Evaluation of a candidate failed on worker "
+                                   + result["worker"] + ":\n" + result["error"])
+        return results
+
+    def shutdown(self) -> None:
+        """
+            Stop the workers and remove the published training data.
+        """
+        self.queue.request_stop(self.run_id)
+        for p in self.processes:
+            p.join()
+        self.processes = list()
+        if self.dataset_id is not None:
+            self.queue.remove_dataset(self.dataset_id)
+            self.dataset_id = None